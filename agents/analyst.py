@@ -8,28 +8,27 @@
 # Then saves everything into:  outputs/analysis.json
 # agents/analyst.py
 import logging
+from utils.llm_cache import CachedChatClient
+from utils.ollama_client import get_client
+from utils.prompt_packer import BUDGETS, pack_text
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-try:
-    from ollama import Ollama
-    _OLLAMA_AVAILABLE = True
-except Exception:
-    _OLLAMA_AVAILABLE = False
-    class Ollama:
-        def __init__(self, *a, **k): pass
-        def chat(self, *a, **k):
-            class R: pass
-            r = R()
-            r.content = "Basic analysis completed."
-            return r
+# Offline stand-in used when the ollama package is not installed
+class Ollama:
+    def __init__(self, *a, **k): pass
+    def chat(self, *a, **k):
+        class R: pass
+        r = R()
+        r.content = "Basic analysis completed."
+        return r
 
 MODEL = "llama3.2:1b"
 
 class Analyst:
-    def __init__(self, model_name: str = MODEL, client=None):
-        self.client = client or (Ollama() if _OLLAMA_AVAILABLE else Ollama())
+    def __init__(self, model_name: str = MODEL, client=None, use_cache: bool = True):
+        self.client = CachedChatClient(client or get_client() or Ollama(), enabled=use_cache)
         self.model = model_name
 
     def run(self, research_data: dict) -> dict:
@@ -47,9 +46,10 @@ class Analyst:
             }
         
         # Simple prompt
+        research_text = pack_text(raw_research, BUDGETS["analyst"], query=topic, model=self.model)
         user_content = f"""Analyze this research on "{topic}":
 
-{raw_research[:800]}
+{research_text}
 
 Provide:
 1. Main themes (2-3 points)
@@ -3,35 +3,58 @@
 # providing constructive feedback, deciding whether the report passes a minimum quality threshold,
 # and saving the evaluation results. It acts as a “critic agent” that reviews the report’s clarity, 
 # structure,and completeness, and can fall back to heuristic scoring if the model response fails.
-
-from tools.file_tool import save_json
+# In tiered mode a cheap structural pre-check runs first: obvious fails (and, if configured,
+# clear passes) are decided without a model call and only borderline reports reach the LLM.
+
+from tools.artifact_store import SHARED_STORE
+from utils.llm_cache import CachedChatClient
+from utils.ollama_client import get_client
+from utils.prompt_packer import BUDGETS, pack_text
+from agents.writer import REPORT_SECTIONS, canonical_section, split_sections
 import logging
+import threading
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-try:
-    from ollama import Ollama
-    _OLLAMA_AVAILABLE = True
-except Exception:
-    _OLLAMA_AVAILABLE = False
-    class Ollama:
-        def __init__(self, *a, **k): 
+# Offline stand-in used when the ollama package is not installed
+class Ollama:
+    def __init__(self, *a, **k): 
+        pass
+    def chat(self, *a, **k):
+        class R: 
             pass
-        def chat(self, *a, **k):
-            class R: 
-                pass
-            r = R()
-            r.content = "Score: 75\nFeedback: Good report."
-            return r
+        r = R()
+        r.content = "Score: 75\nFeedback: Good report."
+        return r
 
 MODEL = "llama3.2:1b"
 
+MISSING_SECTION_PENALTY = 8  # Structural score lost per missing required section
+
+# How many critiques each tier decided (process-wide, for tuning)
+_tier_counts = {"heuristic_fail": 0, "heuristic_pass": 0, "llm": 0}
+_tier_lock = threading.Lock()
+
 class Critic:
-    def __init__(self, model_name: str = MODEL, client=None):
-        self.client = client or (Ollama() if _OLLAMA_AVAILABLE else Ollama())
+    def __init__(self, model_name: str = MODEL, client=None, use_cache: bool = True,
+                 tiered: bool = False, fail_below: int = 55, pass_above: int = None,
+                 store=None):
+        """
+        Args:
+            tiered: Run the structural pre-check before the model
+            fail_below: Structural scores below this fail without a model call
+            pass_above: Structural scores at or above this (with all sections
+                present) pass without a model call; None disables fast passes
+            store: ArtifactStore for critique.json (default: shared outputs/)
+        """
+        self.client = CachedChatClient(client or get_client() or Ollama(), enabled=use_cache)
         self.model = model_name
         self.threshold = 70  # Minimum acceptable score
+        self.tiered = tiered
+        self.fail_below = fail_below
+        self.pass_above = pass_above
+        self.store = store or SHARED_STORE
 
     def run(self, markdown_text: str) -> dict:
         """
@@ -42,24 +65,40 @@ class Critic:
             - score: int (0-100)
             - feedback: str (improvement suggestions)
             - passed: bool (True if score >= threshold)
+            - tier: which tier decided ("heuristic_fail", "heuristic_pass" or "llm")
         """
         logger.info("Starting report critique...")
 
         if not markdown_text or len(markdown_text) < 50:
             logger.warning("Report too short to critique properly")
+            if self.tiered:
+                _count_tier("heuristic_fail")
             return {
                 "score": 40,
                 "feedback": "The report is too short and needs more details.",
-                "passed": False
+                "passed": False,
+                "tier": "heuristic_fail" if self.tiered else None
             }
 
-        # Ask model to critique
+        if self.tiered:
+            result = self._fast_path(markdown_text)
+            if result is not None:
+                _count_tier(result["tier"])
+                self.store.save_json(result, "critique")
+                logger.info(f"Score: {result['score']}/100 | Passed: {result['passed']} | Tier: {result['tier']}")
+                return result
+
+        # Ask model to critique: every heading plus the most relevant
+        # paragraphs of each section, so the whole structure is visible
+        title = next((line.lstrip("#").strip() for line in markdown_text.splitlines() if line.startswith("# ")), "")
+        preview = pack_text(markdown_text, BUDGETS["critic"], query=title, model=self.model,
+                            unit="paragraph", pin_headings=True)
         user_content = f"""Evaluate this report and provide:
 1. Score (0-100)
 2. Specific feedback for improvement
 
 Report preview:
-{markdown_text[:1500]}
+{preview}
 
 Respond in this format:
 Score: [number]
@@ -97,19 +136,68 @@ Be specific and constructive.
             feedback = self._generate_heuristic_feedback(markdown_text, score)
 
         passed = score >= self.threshold
+        if self.tiered:
+            _count_tier("llm")
 
         critique_result = {
             "score": score,
             "feedback": feedback,
             "passed": passed,
             "threshold": self.threshold,
-            "report_length": len(markdown_text)
+            "report_length": len(markdown_text),
+            "tier": "llm"
         }
-        save_json(critique_result, "critique")
+        self.store.save_json(critique_result, "critique")
 
         logger.info(f"Score: {score}/100 | Passed: {passed}")
         return critique_result
 
+    def _fast_path(self, markdown_text: str):
+        """Decide clear fails/passes from structure alone, or return None"""
+        score, missing = self._structural_check(markdown_text)
+
+        if score < self.fail_below:
+            tier = "heuristic_fail"
+        elif self.pass_above is not None and score >= self.pass_above and not missing:
+            tier = "heuristic_pass"
+        else:
+            return None
+
+        feedback = self._generate_heuristic_feedback(markdown_text, score)
+        if missing:
+            if not feedback.startswith("Suggested Improvements:"):
+                feedback = "Suggested Improvements:"
+            feedback += "\n" + "\n".join(f"- Add the {name} section." for name in missing)
+
+        return {
+            "score": score,
+            "feedback": feedback,
+            "passed": tier == "heuristic_pass" and score >= self.threshold,
+            "threshold": self.threshold,
+            "report_length": len(markdown_text),
+            "tier": tier,
+            "missing_sections": missing
+        }
+
+    def _structural_check(self, markdown: str):
+        """Heuristic score minus a penalty per missing required section"""
+        present = {canonical_section(h) for h, _ in split_sections(markdown) if h}
+        missing = [name for name in REPORT_SECTIONS if name not in present]
+        score = self._calculate_heuristic_score(markdown) - MISSING_SECTION_PENALTY * len(missing)
+        return max(0, score), missing
+
+    @staticmethod
+    def tier_stats() -> dict:
+        """Counts and fractions of critiques decided by each tier (tiered critics only)"""
+        with _tier_lock:
+            counts = dict(_tier_counts)
+        total = sum(counts.values())
+        return {
+            "total": total,
+            "counts": counts,
+            "fractions": {k: (v / total if total else 0.0) for k, v in counts.items()}
+        }
+
     def _parse_critique(self, text: str):
         """Extract score and feedback from model response"""
         score = None
@@ -178,3 +266,8 @@ Be specific and constructive.
         """Update passing threshold"""
         self.threshold = max(0, min(100, threshold))
         logger.info(f"Threshold updated to {self.threshold}")
+
+
+def _count_tier(tier: str):
+    with _tier_lock:
+        _tier_counts[tier] += 1
@@ -4,11 +4,20 @@
 # Send them to an LLM model (like Ollama)
 # Get the model’s analysis
 # Save everything to a JSON file
+# In local-first mode, hits come from the local index of past research
+# (tools/local_index.py) when it covers the topic well enough.
+# Placeholder hits (search backend unavailable) are returned with
+# source "fallback" without a model call and are not saved.
 
-from tools.search_tool import search_web
+from tools.search_tool import is_fallback, search_web
 from utils.prompts import RESEARCH_PROMPT
 from tools.file_tool import save_json
-from typing import Dict
+from tools.artifact_store import safe_filename
+from tools.local_index import get_local_index
+from utils.llm_cache import CachedChatClient
+from utils.ollama_client import get_client
+from utils.prompt_packer import BUDGETS, pack_fields
+from typing import Dict, List
 from datetime import datetime
 import json
 import logging
@@ -16,33 +25,52 @@ import logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-# Ollama client fallback wrapper
-try:
-    from ollama import Ollama
-    _OLLAMA_AVAILABLE = True
-except Exception:
-    _OLLAMA_AVAILABLE = False
-    class Ollama:
-        def __init__(self, *a, **k): pass
-        def chat(self, *a, **k):
-            class R: pass
-            r = R()
-            r.content = "[]"
-            return r
+# Offline stand-in used when the ollama package is not installed
+class Ollama:
+    def __init__(self, *a, **k): pass
+    def chat(self, *a, **k):
+        class R: pass
+        r = R()
+        r.content = "[]"
+        return r
 
 MODEL = "llama3.2:1b"
 
 class Researcher:
-    def __init__(self, model_name: str = MODEL, client=None):
-        self.client = client or (Ollama() if _OLLAMA_AVAILABLE else Ollama())
+    def __init__(self, model_name: str = MODEL, client=None, use_cache: bool = True,
+                 local_first: bool = False, min_local_hits: int = 3, min_coverage: float = 0.75):
+        """
+        Args:
+            local_first: Answer from the local index of past research when
+                it has enough relevant hits, and search the web otherwise
+            min_local_hits: Relevant local hits needed to skip the web search
+            min_coverage: Share of the topic's terms a local hit must contain
+                to count as relevant
+        """
+        self.client = CachedChatClient(client or get_client() or Ollama(), enabled=use_cache)
         self.model = model_name
+        self.local_first = local_first
+        self.min_local_hits = min_local_hits
+        self.min_coverage = min_coverage
 
-    def run(self, topic: str, top_k: int = 5) -> Dict:
+    def run(self, topic: str, top_k: int = 5, hits: List[Dict] = None) -> Dict:
+        """
+        Args:
+            hits: Search results to use instead of searching (e.g. the
+                merged hits of a refresh)
+        """
         logger.info(f"🔍 Starting research for topic: {topic}")
         
-        # Get search results
-        hits = search_web(topic, max_results=top_k)
-        logger.info(f" Found {len(hits)} search results")
+        # Get search results (local index first if enabled)
+        source = "web"
+        if hits is None:
+            hits = self._search_local(topic, top_k) if self.local_first else []
+            source = "local" if hits else "web"
+        if not hits:
+            hits = search_web(topic, max_results=top_k, fetch_content=True)
+            if hits and all(h.get("backend") == "local" for h in hits):
+                source = "local"  # The local search backend answered
+        logger.info(f" Found {len(hits)} search results ({source})")
         
         if not hits:
             logger.warning(" No search results found!")
@@ -53,16 +81,32 @@ class Researcher:
                 "raw": "[]",
                 "analysis": "No results found"
             }
+
+        if is_fallback(hits):
+            logger.warning(" Search backend unavailable, skipping the model call")
+            return {
+                "topic": topic,
+                "timestamp": datetime.utcnow().isoformat(),
+                "hits": hits,
+                "raw": "",
+                "analysis": "",
+                "source": "fallback"
+            }
         
         # Prepare SIMPLE prompt for the model
         user_content = f"""Analyze these search results about "{topic}":
 
 """
-        for i, h in enumerate(hits, 1):
+        # Most relevant snippet/page sentences of all hits within the token budget
+        packed = pack_fields(hits, ["snippet", "content"], BUDGETS["researcher"], query=topic, model=self.model)
+        for i, (h, text) in enumerate(zip(hits, packed), 1):
             user_content += f"{i}. {h.get('title')}\n"
             user_content += f"   URL: {h.get('url')}\n"
-            snippet = h.get('snippet', '')[:200]  # Limit snippet length
-            user_content += f"   Info: {snippet}\n\n"
+            if text["snippet"]:
+                user_content += f"   Info: {text['snippet']}\n"
+            if text["content"]:
+                user_content += f"   Page: {text['content']}\n"
+            user_content += "\n"
         
         user_content += "\nProvide 3-5 key insights about this topic in simple bullet points."
         
@@ -100,15 +144,29 @@ class Researcher:
             "timestamp": datetime.utcnow().isoformat(),
             "hits": hits,
             "raw": raw,
-            "analysis": raw  # Add analysis field
+            "analysis": raw,  # Add analysis field
+            "source": source
         }
         
         # Save to file
-        save_json(out, f"research_{topic.replace(' ','_')}")
+        save_json(out, f"research_{safe_filename(topic)}")
         logger.info(" Research saved to JSON")
         
         return out
     
+    def _search_local(self, topic: str, top_k: int):
+        """Relevant hits from the local index, or [] if it does not cover the topic"""
+        try:
+            results = get_local_index().search(topic, top_k)
+        except Exception as e:
+            logger.warning(f" Local index unavailable: {e}")
+            return []
+        relevant = [h for h in results if h["coverage"] >= self.min_coverage]
+        if len(relevant) < min(self.min_local_hits, top_k):
+            logger.info(f" Local index: {len(relevant)} relevant hits, searching the web")
+            return []
+        return [{k: v for k, v in h.items() if k not in ("score", "coverage")} for h in relevant]
+
     def _generate_fallback_analysis(self, hits, topic):
         """Generate basic analysis when model fails"""
         analysis = f"Analysis of '{topic}':\n\n"
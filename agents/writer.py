@@ -1,35 +1,100 @@
 # agents/writer.py (With Feedback Support)
 from utils.prompts import WRITER_PROMPT
-from tools.file_tool import save_text, save_json
+from tools.artifact_store import SHARED_STORE
+from utils.llm_cache import CachedChatClient, iter_chunks
+from utils.ollama_client import get_client
+from utils.prompt_packer import BUDGETS, pack_text
 from datetime import date
+from typing import List, Tuple
 import json
 import logging
+import re
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-try:
-    from ollama import Ollama
-    _OLLAMA_AVAILABLE = True
-except Exception:
-    _OLLAMA_AVAILABLE = False
-    class Ollama:
-        def __init__(self, *a, **k): pass
-        def chat(self, *a, **k):
-            class R: pass
-            r = R()
-            r.content = ""
-            return r
+# Offline stand-in used when the ollama package is not installed
+class Ollama:
+    def __init__(self, *a, **k): pass
+    def chat(self, *a, **k):
+        class R: pass
+        r = R()
+        r.content = ""
+        return r
 
 MODEL = "gemma3:latest"
 
+# The five sections every report is asked to contain, in order
+REPORT_SECTIONS = ["Introduction", "Main Findings", "Detailed Analysis", "Conclusion", "References"]
+
+# Words in a heading or in critic feedback that point at a section
+SECTION_KEYWORDS = {
+    "Introduction": ["introduction", "intro", "opening", "background", "context"],
+    "Main Findings": ["finding", "key point", "bullet", "insight", "highlight"],
+    "Detailed Analysis": ["analysis", "depth", "detail", "evidence", "example", "discussion"],
+    "Conclusion": ["conclusion", "conclude", "summary", "closing", "recommendation"],
+    "References": ["reference", "source", "citation", "cite", "link", "bibliograph"],
+}
+
+
+def split_sections(markdown_text: str) -> List[Tuple[str, str]]:
+    """
+    Split a report at its '## ' headings.
+
+    Returns (heading, text) pairs; the first pair holds everything before
+    the first heading (title, author, date) with heading None. Joining the
+    texts gives back the input unchanged.
+    """
+    parts = re.split(r'(?m)^(?=## )', markdown_text)
+    sections = []
+    for part in parts:
+        if not part:
+            continue
+        if part.startswith("## "):
+            heading = part.split("\n", 1)[0][3:].strip()
+            sections.append((heading, part))
+        else:
+            sections.append((None, part))
+    return sections
+
+
+def canonical_section(heading: str):
+    """Map a heading such as 'Key Findings' to one of REPORT_SECTIONS"""
+    if not heading:
+        return None
+    heading = heading.lower()
+    for name in REPORT_SECTIONS:
+        if name.lower() in heading:
+            return name
+    for name, keywords in SECTION_KEYWORDS.items():
+        if any(k in heading for k in keywords):
+            return name
+    return None
+
+
+def sections_from_feedback(feedback: str) -> List[str]:
+    """Return the report sections a piece of critic feedback talks about"""
+    text = (feedback or "").lower()
+    return [name for name in REPORT_SECTIONS
+            if any(k in text for k in SECTION_KEYWORDS[name])]
+
 class Writer:
-    def __init__(self, model_name: str = MODEL, client=None, author: str = "AutoAgent"):
-        self.client = client or (Ollama() if _OLLAMA_AVAILABLE else Ollama())
+    def __init__(self, model_name: str = MODEL, client=None, author: str = "AutoAgent",
+                 use_cache: bool = True, cache_retries: bool = False, store=None):
+        self.client = CachedChatClient(client or get_client() or Ollama(), enabled=use_cache)
         self.model = model_name
         self.author = author
+        self.cache_retries = cache_retries  # Rewrites at higher temperature skip the cache by default
+        self.store = store or SHARED_STORE  # Where report.md is written
+
+    def run(self, analysis_struct: dict, title: str = None, on_token=None, temperature: float = None):
+        """
+        Write the report.
 
-    def run(self, analysis_struct: dict, title: str = None):
+        If on_token is given, the model is called in streaming mode and
+        on_token(chunk) is called for every piece of text as it arrives.
+        temperature overrides the default (0.5, or 0.7 on rewrites).
+        """
         logger.info(" Starting report writing...")
         
         title = title or analysis_struct.get("topic") or "Automated Report"
@@ -46,13 +111,14 @@ class Writer:
             return self._generate_minimal_report(title, today)
         
         # Build user content
+        summary = pack_text(analysis_text, BUDGETS["writer"], query=title, model=self.model)
         user_content = f"""Write a professional report about: {title}
 
 Author: {self.author}
 Date: {today}
 
 Research Summary:
-{analysis_text[:1000]}
+{summary}
 
 Sources:
 """
@@ -90,13 +156,21 @@ Keep it professional, well-structured, and comprehensive."""
                     {"role": "system", "content": WRITER_PROMPT},
                     {"role": "user", "content": user_content}
                 ],
-                temperature=0.5 if not previous_feedback else 0.7,  # More creative on retry
+                temperature=temperature if temperature is not None else (0.5 if not previous_feedback else 0.7),  # More creative on retry
                 options={
                     "num_predict": 1500 if previous_feedback else 1000,  # Longer on retry
-                }
+                },
+                bypass_cache=bool(previous_feedback) and not self.cache_retries,
+                **({"stream": True} if on_token else {})
             )
             
-            md = getattr(resp, "content", "")
+            if on_token:
+                md = ""
+                for chunk in iter_chunks(resp):
+                    md += chunk
+                    on_token(chunk)
+            else:
+                md = getattr(resp, "content", "")
             logger.info(f" Model response received ({len(md)} chars)")
             
             # Validate response
@@ -109,11 +183,122 @@ Keep it professional, well-structured, and comprehensive."""
             md = self._generate_structured_report(title, today, hits, analysis_text)
         
         # Save outputs
-        save_text(md, "report.md")
+        self.store.save_text(md, "report.md")
         logger.info(" Report saved to report.md")
         
         return md
     
+    def revise(self, markdown_text: str, feedback: str, analysis_struct: dict, title: str = None,
+               sections: List[str] = None):
+        """
+        Rewrite only the sections the critic feedback points at.
+
+        Sections are matched by heading; sections the feedback asks for but
+        the report lacks are generated and inserted in the standard order.
+        Untouched sections are kept byte-identical.
+
+        Args:
+            sections: Sections to rewrite instead of the ones the feedback
+                mentions (names from REPORT_SECTIONS)
+
+        Returns:
+            The revised markdown, or None if the feedback does not map to
+            any section (the caller should then rewrite the whole report)
+        """
+        targets = sections or sections_from_feedback(feedback)
+        if not targets:
+            logger.info(" Feedback does not point at specific sections")
+            return None
+
+        title = title or analysis_struct.get("topic") or "Automated Report"
+        sections = split_sections(markdown_text)
+        logger.info(f" Revising sections: {', '.join(targets)}")
+
+        for name in targets:
+            index = next((i for i, (h, _) in enumerate(sections) if canonical_section(h) == name), None)
+            current = sections[index][1] if index is not None else ""
+            new_text = self._rewrite_section(name, current, feedback, analysis_struct, title)
+            if not new_text:
+                continue
+
+            if index is not None:
+                # Keep the original spacing before the next heading
+                trailing = current[len(current.rstrip()):] or "\n\n"
+                sections[index] = (sections[index][0], new_text.rstrip() + trailing)
+            else:
+                position = self._insert_position(sections, name)
+                prefix = ""
+                if position == len(sections) and sections and not sections[-1][1].endswith("\n\n"):
+                    # Separate from the last section without touching its bytes
+                    prefix = "\n" if sections[-1][1].endswith("\n") else "\n\n"
+                sections.insert(position, (name, prefix + new_text.rstrip() + "\n\n"))
+
+        md = "".join(text for _, text in sections)
+        self.store.save_text(md, "report.md")
+        logger.info(" Revised report saved to report.md")
+        return md
+
+    def _insert_position(self, sections, name):
+        """Index where a missing section goes, following REPORT_SECTIONS order"""
+        order = REPORT_SECTIONS.index(name)
+        for i, (heading, _) in enumerate(sections):
+            other = canonical_section(heading)
+            if other and REPORT_SECTIONS.index(other) > order:
+                return i
+        return len(sections)
+
+    def _rewrite_section(self, name, current, feedback, analysis_struct, title):
+        """Generate one section with a targeted prompt"""
+        hits = analysis_struct.get("hits", [])
+        analysis_text = analysis_struct.get("analysis", analysis_struct.get("raw", ""))
+
+        user_content = f"""You are revising one section of a report about: {title}
+
+Reviewer feedback:
+{feedback}
+
+"""
+        if current.strip():
+            user_content += f"Current version of the section:\n{current.strip()}\n\n"
+        else:
+            user_content += "The report is missing this section.\n\n"
+        if name == "References":
+            user_content += "Sources:\n"
+            for i, h in enumerate(hits[:5], 1):
+                user_content += f"{i}. {h.get('title')} - {h.get('url')}\n"
+        else:
+            summary = pack_text(analysis_text, BUDGETS["section"], query=f"{title} {name}", model=self.model)
+            user_content += f"Research Summary:\n{summary}\n"
+        user_content += f"""
+Write only the "## {name}" section in markdown, starting with the line "## {name}".
+Address the feedback. Do not write any other section."""
+
+        try:
+            resp = self.client.chat(
+                model=self.model,
+                messages=[
+                    {"role": "system", "content": WRITER_PROMPT},
+                    {"role": "user", "content": user_content}
+                ],
+                temperature=0.5,
+                options={"num_predict": 400},
+                bypass_cache=not self.cache_retries
+            )
+            text = getattr(resp, "content", "").strip()
+        except Exception as e:
+            logger.error(f" Section rewrite failed for {name}: {e}")
+            return None
+
+        if len(text) < 30:
+            logger.warning(f" Section rewrite for {name} too short, keeping original")
+            return None
+        if not text.startswith("## "):
+            text = f"## {name}\n\n{text}"
+        elif canonical_section(text.split("\n", 1)[0][3:]) != name:
+            # Keep the section under the heading it replaces
+            text = f"## {name}\n" + (text.split("\n", 1)[1] if "\n" in text else "")
+        return text
+
     def _generate_structured_report(self, title, date, hits, analysis):
         """Generate a proper structured report as fallback"""
         md = f"# {title}\n\n"
@@ -1,17 +1,138 @@
 import streamlit as st
 import os
-from main import run_pipeline
+import time
+from main import warm_up_models
+from jobs import get_job_queue, QUEUED, RUNNING
+from tools.artifact_store import safe_filename
 import json
 
 # ---- Ensure outputs folder exists ----
 os.makedirs("outputs", exist_ok=True)
 
+
+# ---- Load the models once per server process ----
+# Called below st.set_page_config, which must stay the first Streamlit command
+@st.cache_resource(show_spinner=False)
+def _warm_up():
+    return warm_up_models()
+
+
+# ---- One job queue shared by every session ----
+@st.cache_resource
+def _job_queue():
+    return get_job_queue(int(os.getenv("REPORT_WORKERS", 2)))
+
+
+POLL_INTERVAL = 0.3  # Seconds between progress updates
+
+STAGE_LABELS = {
+    "research": "Researching...",
+    "analysis": "Analyzing research...",
+    "writing": "Writing report",
+    "critique": "Reviewing report",
+    "export": "Exporting..."
+}
+
+
+def _status_line(job):
+    """Human-readable description of a job's current phase"""
+    if job["status"] == QUEUED:
+        return "Waiting for a free worker..."
+    label = STAGE_LABELS.get(job["stage"], "Starting...")
+    if job["stage"] in ("writing", "critique") and job["attempt"]:
+        label += f" (attempt {job['attempt']})..."
+    return label
+
+
+def show_result(meta, topic):
+    """Render a finished pipeline result"""
+    if meta.get("success"):
+        st.markdown('<div class="success-box">Report generation completed successfully!</div>', unsafe_allow_html=True)
+        
+        # ---- Show Research Hits ----
+        with st.expander("Research Hits", expanded=True):
+            research_path = meta.get("research_path")
+            if research_path and os.path.exists(research_path):
+                with open(research_path, "r", encoding="utf-8") as f:
+                    research = json.load(f)
+                hits = research.get("hits", [])
+                if hits:
+                    for i, hit in enumerate(hits, 1):
+                        st.markdown(f"**{i}. [{hit['title']}]({hit['url']})**")
+                        st.caption(hit.get("snippet", ""))
+                        st.divider()
+                else:
+                    st.info("No hits found.")
+            else:
+                st.warning("Research JSON not found.")
+        
+        # ---- Show Final Report Preview ----
+        with st.expander("Report Preview", expanded=False):
+            final_md_path = meta.get("final_md_path")
+            if final_md_path and os.path.exists(final_md_path):
+                with open(final_md_path, "r", encoding="utf-8") as f:
+                    md_content = f.read()
+                st.markdown(md_content)
+            else:
+                st.warning("Final report file not found.")
+        
+        # ---- Download Buttons ----
+        st.subheader("Download")
+        col1, col2, col3 = st.columns(3)
+        
+        with col1:
+            # Download HTML (self-contained version when it was exported)
+            html_path = meta.get("standalone_path") or meta.get("html_path")
+            if html_path and os.path.exists(html_path):
+                with open(html_path, "rb") as f:
+                    st.download_button(
+                        "Download HTML",
+                        f,
+                        file_name=f"{safe_filename(topic)}_report.html",
+                        mime="text/html",
+                        use_container_width=True
+                    )
+        
+        with col2:
+            # Download Markdown
+            final_md_path = meta.get("final_md_path")
+            if final_md_path and os.path.exists(final_md_path):
+                with open(final_md_path, "rb") as f:
+                    st.download_button(
+                        "Download Markdown",
+                        f,
+                        file_name=f"{safe_filename(topic)}_report.md",
+                        mime="text/markdown",
+                        use_container_width=True
+                    )
+        
+        with col3:
+            # Download PDF
+            pdf_path = meta.get("pdf_path")
+            if pdf_path and os.path.exists(pdf_path):
+                with open(pdf_path, "rb") as f:
+                    st.download_button(
+                        "Download PDF",
+                        f,
+                        file_name=f"{safe_filename(topic)}_report.pdf",
+                        mime="application/pdf",
+                        use_container_width=True
+                    )
+            else:
+                # Reports in scripts the PDF fonts cannot print (e.g. Arabic) have no PDF
+                st.caption("PDF not available for this report")
+    else:
+        error_msg = meta.get("error", "Unknown error")
+        st.markdown(f'<div class="error-box">Report generation failed: {error_msg}</div>', unsafe_allow_html=True)
+
 # ---- Page configuration ----
 st.set_page_config(
     page_title="AI Multi-Agent Report System",
     layout="centered"
 )
 
+_warm_up()
+
 # ---- Custom CSS (kept here) ----
 st.markdown("""
 <style>
@@ -81,96 +202,50 @@ with st.form(key="pipeline_form"):
     
     submit_button = st.form_submit_button("Generate Report", use_container_width=True)
 
-# ---- Run Pipeline ----
+# ---- Submit Job ----
+# The pipeline runs on the background job queue; this script run only
+# polls it, so reruns from widget interactions never restart the work
+queue = _job_queue()
+
 if submit_button:
     if not topic.strip():
         st.error("Please enter a research topic!")
     else:
-        # Progress indicators
-        progress_bar = st.progress(0)
+        st.session_state["job_id"] = queue.submit(
+            topic,
+            title=title if title.strip() else None,
+            author=author
+        )
+
+# ---- Show Progress / Result ----
+job_id = st.session_state.get("job_id")
+if job_id:
+    job = queue.snapshot(job_id)
+    if job is None:
+        st.warning("This report job is no longer available. Please generate it again.")
+        del st.session_state["job_id"]
+    else:
+        job_topic = job["params"]["topic"]
+        progress_bar = st.progress(job["progress"])
         status_text = st.empty()
+        live_report = st.empty()
         
-        with st.spinner("Processing your request..."):
-            try:
-                # Update progress
-                status_text.text("Researching...")
-                progress_bar.progress(20)
+        try:
+            with st.spinner(f"Processing: {job_topic}"):
+                while job["status"] in (QUEUED, RUNNING):
+                    progress_bar.progress(job["progress"])
+                    status_text.text(_status_line(job))
+                    if job["partial"]:
+                        live_report.markdown(job["partial"])
+                    time.sleep(POLL_INTERVAL)
+                    job = queue.snapshot(job_id)
+            
+            progress_bar.progress(job["progress"])
+            status_text.empty()
+            live_report.empty()
+            show_result(job["result"] or {"error": job["error"]}, job_topic)
                 
-                # Run the pipeline
-                meta = run_pipeline(
-                    topic=topic,
-                    title=title if title.strip() else None,
-                    author=author
-                )
-                
-                progress_bar.progress(100)
-                
-                if meta.get("success"):
-                    status_text.empty()
-                    st.markdown('<div class="success-box">Report generation completed successfully!</div>', unsafe_allow_html=True)
-                    
-                    # ---- Show Research Hits ----
-                    with st.expander("Research Hits", expanded=True):
-                        research_path = meta.get("research_path")
-                        if research_path and os.path.exists(research_path):
-                            with open(research_path, "r", encoding="utf-8") as f:
-                                research = json.load(f)
-                            hits = research.get("hits", [])
-                            if hits:
-                                for i, hit in enumerate(hits, 1):
-                                    st.markdown(f"**{i}. [{hit['title']}]({hit['url']})**")
-                                    st.caption(hit.get("snippet", ""))
-                                    st.divider()
-                            else:
-                                st.info("No hits found.")
-                        else:
-                            st.warning("Research JSON not found.")
-                    
-                    # ---- Show Final Report Preview ----
-                    with st.expander("Report Preview", expanded=False):
-                        final_md_path = meta.get("final_md_path")
-                        if final_md_path and os.path.exists(final_md_path):
-                            with open(final_md_path, "r", encoding="utf-8") as f:
-                                md_content = f.read()
-                            st.markdown(md_content)
-                        else:
-                            st.warning("Final report file not found.")
-                    
-                    # ---- Download Buttons ----
-                    st.subheader("Download")
-                    col1, col2 = st.columns(2)
-                    
-                    with col1:
-                        # Download HTML
-                        html_path = meta.get("pdf_path")
-                        if html_path and os.path.exists(html_path):
-                            with open(html_path, "rb") as f:
-                                st.download_button(
-                                    "Download HTML",
-                                    f,
-                                    file_name=f"{topic}_report.html",
-                                    mime="text/html",
-                                    use_container_width=True
-                                )
-                    
-                    with col2:
-                        # Download Markdown
-                        final_md_path = meta.get("final_md_path")
-                        if final_md_path and os.path.exists(final_md_path):
-                            with open(final_md_path, "rb") as f:
-                                st.download_button(
-                                    "Download Markdown",
-                                    f,
-                                    file_name=f"{topic}_report.md",
-                                    mime="text/markdown",
-                                    use_container_width=True
-                                )
-                else:
-                    status_text.empty()
-                    error_msg = meta.get("error", "Unknown error")
-                    st.markdown(f'<div class="error-box">Report generation failed: {error_msg}</div>', unsafe_allow_html=True)
-                    
-            except Exception as e:
-                status_text.empty()
-                st.markdown(f'<div class="error-box">An error occurred: {str(e)}</div>', unsafe_allow_html=True)
-                st.exception(e)
+        except Exception as e:
+            status_text.empty()
+            st.markdown(f'<div class="error-box">An error occurred: {str(e)}</div>', unsafe_allow_html=True)
+            st.exception(e)
@@ -0,0 +1,259 @@
+# batch.py
+# Run many topics through the pipeline in one process.
+#
+# Usage:
+#   python batch.py topics.jsonl --workers 4 --llm-concurrency 2
+#   python batch.py --retry-failed outputs/batch_results.jsonl
+#
+# Input:
+#   .jsonl  one topic per line, either a JSON string or an object with
+#           "topic" and optional "title" / "author"
+#   .csv    a "topic" column (optional "title" / "author"), or a single
+#           column of topics without a header
+#
+# Output:
+#   One JSON record per topic appended to --output as each run finishes,
+#   followed by aggregate throughput and per-stage latency percentiles.
+#
+# --retry-failed re-runs only the topics whose latest record in a previous
+# output file failed, with the parameters recorded for them; runs with
+# checkpoints resume from their last completed stage (no new search or
+# analysis), the others start over.
+
+import argparse
+import csv
+import json
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import datetime
+from typing import Dict, List
+
+from main import resume_pipeline, run_pipeline, warm_up_models
+from agents.critic import Critic
+from tools.checkpoint import RunCheckpoint
+from utils.limits import set_limit
+from utils.metrics import REGISTRY, serve_metrics
+from utils.ollama_client import latency_stats
+from utils.stats import summarize
+
+STAGES = ["research", "analysis", "writing", "critique", "export"]
+
+# run_pipeline arguments a job may set for itself (falling back to the batch
+# options); every record stores the values used so --retry-failed can replay them
+JOB_PARAMS = ["title", "author", "max_retries", "speculative", "rewrite_mode", "tiered_critique",
+              "local_first", "reuse_similar", "refresh", "critic_pass_above"]
+
+
+def load_topics(path: str) -> List[Dict]:
+    """Read topic jobs from a JSONL or CSV file"""
+    jobs = []
+    if path.lower().endswith(".csv"):
+        with open(path, "r", encoding="utf-8", newline="") as f:
+            rows = list(csv.reader(f))
+        if not rows:
+            return jobs
+        header = [c.strip().lower() for c in rows[0]]
+        if "topic" in header:
+            for row in rows[1:]:
+                job = {k: v.strip() for k, v in zip(header, row) if v.strip()}
+                if job.get("topic"):
+                    jobs.append(job)
+        else:
+            jobs = [{"topic": row[0].strip()} for row in rows if row and row[0].strip()]
+    else:
+        with open(path, "r", encoding="utf-8") as f:
+            for line in f:
+                line = line.strip()
+                if not line:
+                    continue
+                item = json.loads(line)
+                job = {"topic": item} if isinstance(item, str) else dict(item)
+                if job.get("topic"):
+                    jobs.append(job)
+    return jobs
+
+
+def load_failed(path: str) -> List[Dict]:
+    """Jobs for the topics whose latest record in a batch output file failed"""
+    latest = {}
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            record = json.loads(line)
+            if record.get("topic"):
+                latest[record["topic"]] = record
+    jobs = []
+    for topic, record in latest.items():
+        if record.get("success"):
+            continue
+        job = {"topic": topic, **(record.get("params") or {})}
+        if record.get("run_id"):
+            job["run_id"] = record["run_id"]
+        jobs.append(job)
+    return jobs
+
+
+def job_params(job: Dict, defaults: Dict) -> Dict:
+    """run_pipeline arguments for a job: its own values over the batch defaults (unset ones are left out)"""
+    params = {name: job.get(name, defaults.get(name)) for name in JOB_PARAMS}
+    return {name: value for name, value in params.items() if value is not None}
+
+
+def run_job(job: Dict, defaults: Dict) -> Dict:
+    """Run one topic (resuming job["run_id"] if it has checkpoints) and turn the result into a batch record"""
+    started = time.perf_counter()
+    started_at = datetime.now().isoformat()
+    params = job_params(job, defaults)
+    if job.get("run_id") and RunCheckpoint.for_run(job["run_id"]):
+        result = resume_pipeline(job["run_id"])
+    else:
+        result = run_pipeline(topic=job["topic"], **params)
+    return {
+        "topic": job["topic"],
+        "started_at": started_at,
+        "elapsed": time.perf_counter() - started,
+        "params": params,
+        **result
+    }
+
+
+def run_batch(jobs: List[Dict], output: str, workers: int = 2, **defaults) -> List[Dict]:
+    """
+    Run all jobs on a worker pool, appending each record to output.
+
+    Args:
+        defaults: run_pipeline arguments (see JOB_PARAMS) for jobs that do
+            not set them
+    """
+    records = []
+    write_lock = threading.Lock()
+
+    with open(output, "a", encoding="utf-8") as out, ThreadPoolExecutor(max_workers=workers) as pool:
+        futures = {pool.submit(run_job, job, defaults): job for job in jobs}
+        for future in as_completed(futures):
+            job = futures[future]
+            try:
+                record = future.result()
+            except Exception as e:
+                record = {"topic": job["topic"], "success": False, "error": str(e),
+                          "params": job_params(job, defaults)}
+                if job.get("run_id"):
+                    record["run_id"] = job["run_id"]
+            records.append(record)
+            with write_lock:
+                out.write(json.dumps(record, ensure_ascii=False) + "\n")
+                out.flush()
+            status = f"score {record.get('score')}" if record.get("success") else f"FAILED: {record.get('error')}"
+            print(f"[{len(records)}/{len(jobs)}] {job['topic']} - {status}")
+
+    return records
+
+
+def print_summary(records: List[Dict], wall_time: float):
+    """Print throughput and per-stage latency percentiles"""
+    ok = [r for r in records if r.get("success")]
+    minutes = wall_time / 60 if wall_time > 0 else 0
+
+    print("\n" + "=" * 60)
+    print("BATCH SUMMARY")
+    print("=" * 60)
+    print(f"Topics: {len(records)} | Succeeded: {len(ok)} | Failed: {len(records) - len(ok)}")
+    retryable = sum(1 for r in records if r.get("retryable"))
+    if retryable:
+        print(f"Retryable failures (search unavailable or deadline): {retryable}")
+    refreshed = [r["changes"] for r in ok if r.get("changes")]
+    if refreshed:
+        updated = sum(1 for c in refreshed if c["material"])
+        print(f"Refreshed: {len(refreshed) - updated} unchanged, {updated} updated with new sources")
+    print(f"Wall time: {wall_time:.1f}s | Throughput: {len(ok) / minutes if minutes else 0:.2f} reports/minute")
+
+    print(f"\n{'Stage':<12}{'p50 (s)':>10}{'p95 (s)':>10}{'max (s)':>10}")
+    for stage in STAGES:
+        s = summarize([r["timings"][stage] for r in ok if "timings" in r])
+        print(f"{stage:<12}{s['p50']:>10.2f}{s['p95']:>10.2f}{s['max']:>10.2f}")
+    s = summarize([r["elapsed"] for r in ok if "elapsed" in r])
+    print(f"{'total':<12}{s['p50']:>10.2f}{s['p95']:>10.2f}{s['max']:>10.2f}")
+
+    tiers = Critic.tier_stats()
+    if tiers["total"]:
+        shares = ", ".join(f"{k} {v:.0%}" for k, v in tiers["fractions"].items())
+        print(f"\nCritiques: {tiers['total']} ({shares})")
+
+    latency = latency_stats()
+    if latency["cold"]["count"] or latency["warm"]["count"]:
+        print(f"\n{'Model call':<12}{'count':>10}{'p50 (s)':>10}{'p95 (s)':>10}")
+        for start in ("cold", "warm"):
+            s = latency[start]
+            print(f"{start:<12}{s['count']:>10}{s['p50']:>10.2f}{s['p95']:>10.2f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate reports for many topics")
+    parser.add_argument("topics", nargs="?", help="JSONL or CSV file with topics")
+    parser.add_argument("--retry-failed", metavar="RESULTS", default=None,
+                        help="Re-run the failed topics of a previous --output file, resuming from checkpoints")
+    parser.add_argument("--output", default="outputs/batch_results.jsonl", help="JSONL file for result records")
+    parser.add_argument("--workers", type=int, default=2, help="Pipelines running at the same time")
+    parser.add_argument("--search-concurrency", type=int, default=4, help="Simultaneous search requests")
+    parser.add_argument("--llm-concurrency", type=int, default=1, help="Simultaneous model generations")
+    parser.add_argument("--max-retries", type=int, default=2, help="Rewrites per report if the score is low")
+    parser.add_argument("--speculative", type=int, default=0, help="Parallel drafts per report (0 = sequential rewrites)")
+    parser.add_argument("--rewrite-mode", choices=["full", "section"], default="full",
+                        help="Rewrite the whole report or only the criticized sections")
+    parser.add_argument("--tiered-critique", action="store_true",
+                        help="Decide obvious critique fails without a model call")
+    parser.add_argument("--critic-pass-above", type=int, default=None,
+                        help="With --tiered-critique, pass reports with at least this structural score without a model call")
+    parser.add_argument("--local-first", action="store_true",
+                        help="Use hits from past research when they cover the topic")
+    parser.add_argument("--reuse-similar-topics", action="store_true",
+                        help="Reuse research and analysis of near-identical past topics")
+    parser.add_argument("--refresh", action="store_true",
+                        help="Update each topic's latest report, rewriting only what new sources change")
+    parser.add_argument("--author", default="AutoAgent", help="Default report author")
+    parser.add_argument("--no-warmup", action="store_true", help="Skip pre-loading the models at startup")
+    parser.add_argument("--metrics-port", type=int, default=None, help="Serve /metrics on this port while running")
+    parser.add_argument("--metrics-out", default=None, help="Dump metrics at the end (.json or Prometheus text)")
+    args = parser.parse_args()
+    if not args.topics and not args.retry_failed:
+        parser.error("a topics file or --retry-failed is required")
+
+    if args.metrics_port:
+        serve_metrics(args.metrics_port)
+
+    set_limit("search", args.search_concurrency)
+    set_limit("llm", args.llm_concurrency)
+
+    if not args.no_warmup:
+        warm_up_models()
+
+    if args.retry_failed:
+        jobs = load_failed(args.retry_failed)
+        resumable = sum(1 for job in jobs if job.get("run_id"))
+        print(f"Retrying {len(jobs)} failed topics from {args.retry_failed} ({resumable} with a run to resume)")
+    else:
+        jobs = load_topics(args.topics)
+        print(f"Loaded {len(jobs)} topics from {args.topics}")
+
+    started = time.perf_counter()
+    records = run_batch(jobs, args.output, workers=args.workers, author=args.author,
+                        max_retries=args.max_retries, speculative=args.speculative,
+                        rewrite_mode=args.rewrite_mode, tiered_critique=args.tiered_critique,
+                        local_first=args.local_first, reuse_similar=args.reuse_similar_topics,
+                        refresh=args.refresh, critic_pass_above=args.critic_pass_above)
+    print_summary(records, time.perf_counter() - started)
+
+    if args.metrics_out:
+        with open(args.metrics_out, "w", encoding="utf-8") as f:
+            if args.metrics_out.endswith(".json"):
+                json.dump(REGISTRY.to_json(), f, indent=2)
+            else:
+                f.write(REGISTRY.to_prometheus())
+        print(f"Metrics written to {args.metrics_out}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,141 @@
+# benchmarks/fake_ollama.py
+# Deterministic stand-in for the Ollama chat client.
+# - Answers each agent with a canned response of the right shape
+#   (research bullets, analysis, a five-section report, "Score: N")
+# - Simulates model cost: a fixed latency per call plus generation time
+#   derived from tokens/sec and the number of generated tokens
+# - Supports stream=True and returns Ollama-style eval_count/eval_duration
+# Scripted responses can be supplied as a callable (messages -> str).
+
+import threading
+import time
+from typing import Callable, Dict, List
+
+RESEARCH_RESPONSE = """- {topic} is an active area with several competing approaches.
+- Recent work focuses on efficiency, evaluation and deployment.
+- Open questions remain around reliability and cost.
+- Adoption is growing across industry and research."""
+
+ANALYSIS_RESPONSE = """Main themes:
+- Rapid progress in {topic}
+- Practical deployment challenges
+
+Key insights:
+- Efficiency improvements drive adoption
+- Evaluation methods are still maturing
+
+Summary: {topic} is evolving quickly, with deployment cost as the main constraint."""
+
+REPORT_RESPONSE = """# Report on {topic}
+
+**Author:** Benchmark  
+**Date:** 2024-01-01  
+
+## Introduction
+
+This report summarizes current research on {topic}. It is based on several sources.
+
+## Main Findings
+
+- **Progress:** {topic} has advanced quickly in recent years.
+- **Deployment:** Cost and latency are the main constraints.
+- **Evaluation:** Benchmarks are still maturing.
+
+## Detailed Analysis
+
+{paragraph}
+
+### Trends
+
+{paragraph}
+
+## Conclusion
+
+{topic} is a fast-moving field. Continued monitoring is recommended.
+
+## References
+
+1. [Source one](https://example.org/1)
+2. [Source two](https://example.org/2)
+3. [Source three](https://example.org/3)
+"""
+
+PARAGRAPH = ("Practitioners report that careful engineering of the surrounding system matters as much "
+             "as the core technique, and that measurement is the first step to improvement. ") * 3
+
+CRITIC_RESPONSE = "Score: {score}\nFeedback: Clear structure. Add more concrete examples and data."
+
+
+class FakeResponse:
+    def __init__(self, content: str, eval_count: int, eval_duration: int, prompt_eval_count: int):
+        self.content = content
+        self.eval_count = eval_count
+        self.eval_duration = eval_duration
+        self.prompt_eval_count = prompt_eval_count
+
+
+class FakeChatClient:
+    def __init__(self, latency: float = 0.05, tokens_per_sec: float = 200.0,
+                 critic_score: int = 80, script: Callable[[List[Dict]], str] = None):
+        """
+        Args:
+            latency: Fixed seconds per call (prompt processing, network)
+            tokens_per_sec: Simulated generation speed
+            critic_score: Score returned to the Critic
+            script: Optional callable(messages) -> response text
+        """
+        self.latency = latency
+        self.tokens_per_sec = tokens_per_sec
+        self.critic_score = critic_score
+        self.script = script
+        self.calls = 0
+        self._lock = threading.Lock()
+
+    def _respond(self, messages: List[Dict]) -> str:
+        if self.script:
+            return self.script(messages)
+        prompt = messages[-1]["content"]
+        topic = _extract_topic(prompt)
+        if "Evaluate this report" in prompt:
+            return CRITIC_RESPONSE.format(score=self.critic_score)
+        if "revising one section" in prompt:
+            name = prompt.split('"## ', 1)[1].split('"', 1)[0] if '"## ' in prompt else "Section"
+            return f"## {name}\n\n{PARAGRAPH}"
+        if "Write a professional report" in prompt:
+            return REPORT_RESPONSE.format(topic=topic, paragraph=PARAGRAPH)
+        if "Analyze this research" in prompt:
+            return ANALYSIS_RESPONSE.format(topic=topic)
+        return RESEARCH_RESPONSE.format(topic=topic)
+
+    def chat(self, model: str, messages: List[Dict], temperature: float = None,
+             options: Dict = None, stream: bool = False, **kwargs):
+        with self._lock:
+            self.calls += 1
+        text = self._respond(messages)
+        tokens = text.split(" ")
+        num_predict = (options or {}).get("num_predict")
+        if num_predict:
+            tokens = tokens[:num_predict]
+            text = " ".join(tokens)
+        prompt_tokens = sum(len(m["content"].split()) for m in messages)
+        per_token = 1.0 / self.tokens_per_sec if self.tokens_per_sec else 0.0
+
+        if stream:
+            return self._stream(tokens, per_token)
+
+        time.sleep(self.latency + per_token * len(tokens))
+        return FakeResponse(text, len(tokens), int(per_token * len(tokens) * 1e9), prompt_tokens)
+
+    def _stream(self, tokens: List[str], per_token: float):
+        time.sleep(self.latency)
+        for i, token in enumerate(tokens):
+            time.sleep(per_token)
+            yield {"message": {"content": token if i == 0 else " " + token}, "done": i == len(tokens) - 1}
+
+
+def _extract_topic(prompt: str) -> str:
+    for marker in ('about "', 'on "', "about: "):
+        if marker in prompt:
+            rest = prompt.split(marker, 1)[1]
+            return rest.split('"', 1)[0].split("\n", 1)[0].strip() or "the topic"
+    return "the topic"
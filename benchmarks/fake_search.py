@@ -0,0 +1,26 @@
+# benchmarks/fake_search.py
+# Local stand-in for tools.search_tool.search_web.
+# Returns deterministic hits for any query after a configurable delay, so
+# pipeline benchmarks do not depend on DuckDuckGo or the network.
+
+import hashlib
+import time
+from typing import Dict, List
+
+SEARCH_LATENCY = 0.0
+
+
+def fake_search_web(query: str, max_results: int = 5, **kwargs) -> List[Dict]:
+    """Same signature and hit shape as search_web"""
+    if SEARCH_LATENCY:
+        time.sleep(SEARCH_LATENCY)
+    digest = hashlib.md5(query.encode("utf-8")).hexdigest()[:8]
+    return [
+        {
+            "title": f"{query} - source {i + 1}",
+            "url": f"https://example.org/{digest}/{i + 1}",
+            "snippet": f"Source {i + 1} discusses {query}, its recent developments, "
+                       f"practical applications and open challenges in detail.",
+        }
+        for i in range(max_results)
+    ]
@@ -0,0 +1,445 @@
+# benchmarks/run_benchmarks.py
+# Offline benchmark suite for the report pipeline.
+#
+# Runs every stage against a deterministic fake Ollama client and a local
+# stand-in for search_web, so results only reflect our own overhead
+# (prompt building, parsing, caching, export, concurrency) plus the
+# simulated model cost.
+#
+# Usage (from the repository root):
+#   python -m benchmarks.run_benchmarks --iterations 20
+#   python -m benchmarks.run_benchmarks --compare benchmarks/results/<old>.json
+#   python -m benchmarks.run_benchmarks --parsers-only
+#   python -m benchmarks.run_benchmarks --export-only
+#   python -m benchmarks.run_benchmarks --hedging-only
+#   python -m benchmarks.run_benchmarks --dedup-only
+#
+# Results (latency percentiles and throughput per benchmark) are saved as
+# JSON under benchmarks/results/ so runs can be compared across commits.
+
+import argparse
+import contextlib
+import io
+import json
+import logging
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+RESULTS_DIR = os.path.join(REPO_ROOT, "benchmarks", "results")
+FIXTURES_DIR = os.path.join(REPO_ROOT, "benchmarks", "fixtures")
+TOPIC = "Edge AI inference optimization"
+
+if REPO_ROOT not in sys.path:
+    sys.path.insert(0, REPO_ROOT)
+
+# Measure real work, not cache hits
+os.environ.setdefault("LLM_CACHE", "0")
+
+
+def prepare_workdir() -> str:
+    """Run inside a scratch directory so outputs/ and cache/ of the repo stay untouched"""
+    workdir = tempfile.mkdtemp(prefix="report-bench-")
+    os.makedirs(os.path.join(workdir, "outputs"), exist_ok=True)
+    os.chdir(workdir)
+    return workdir
+
+
+def install_fakes(client):
+    """Point every agent at the fake client and the local search stand-in"""
+    import agents.researcher
+    from benchmarks.fake_search import fake_search_web
+    from utils.ollama_client import set_client
+
+    set_client(client)
+    agents.researcher.search_web = fake_search_web
+
+
+def bench(name, fn, iterations, warmup=1):
+    """Time fn() repeatedly and summarize latency and throughput"""
+    from utils.stats import summarize
+
+    for _ in range(warmup):
+        fn()
+    samples = []
+    started = time.perf_counter()
+    for _ in range(iterations):
+        t0 = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - t0)
+    total = time.perf_counter() - started
+
+    result = summarize(samples)
+    result["throughput"] = iterations / total if total else 0.0
+    print(f"  {name:<24} p50 {result['p50'] * 1000:9.2f} ms   p95 {result['p95'] * 1000:9.2f} ms   "
+          f"{result['throughput']:9.1f} ops/s", file=sys.__stdout__)
+    return result
+
+
+def bench_concurrency(run_pipeline, worker_counts, jobs_per_worker):
+    """Pipelines per second at different worker pool sizes"""
+    scaling = {}
+    for workers in worker_counts:
+        jobs = workers * jobs_per_worker
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            list(pool.map(lambda i: run_pipeline(f"{TOPIC} {i}"), range(jobs)))
+        wall = time.perf_counter() - started
+        scaling[str(workers)] = {"jobs": jobs, "wall": wall, "throughput": jobs / wall}
+        print(f"  workers={workers:<3} {jobs} pipelines in {wall:6.2f}s  "
+              f"{jobs / wall:6.2f} pipelines/s", file=sys.__stdout__)
+    return scaling
+
+
+def bench_parsers(iterations) -> dict:
+    """
+    Parse the fixture pages with every backend; outputs must be identical.
+
+    The fixtures are hand-built pages in DuckDuckGo's HTML markup, not
+    captured responses.
+    """
+    import glob
+    from tools.html_parser import PARSERS
+
+    results = {}
+    for path in sorted(glob.glob(os.path.join(FIXTURES_DIR, "ddg_*.html"))):
+        with open(path, "r", encoding="utf-8") as f:
+            html = f.read()
+        fixture = os.path.splitext(os.path.basename(path))[0]
+        outputs = {name: parse(html, 50) for name, parse in PARSERS.items()}
+        reference = next(iter(outputs.values()))
+        if any(hits != reference for hits in outputs.values()):
+            raise RuntimeError(f"Parsers disagree on {fixture}")
+        for name, parse in PARSERS.items():
+            results[f"parse.{name}.{fixture}"] = bench(f"parse.{name}.{fixture[4:]}",
+                                                       lambda: parse(html, 50), iterations)
+        if "lxml" in outputs and "bs4" in outputs:
+            speedup = results[f"parse.bs4.{fixture}"]["p50"] / results[f"parse.lxml.{fixture}"]["p50"]
+            print(f"  {fixture}: {len(reference)} hits, identical output, lxml {speedup:.1f}x faster",
+                  file=sys.__stdout__)
+    return results
+
+
+def _near_duplicates(hit: dict) -> list:
+    """Copies of a hit as mirrors and vendor pages tend to serve them"""
+    words = hit["snippet"].split()
+    changed = words[:len(words) // 2] + ["notably"] + words[len(words) // 2 + 1:]
+    return [
+        {**hit, "url": hit["url"] + "-mirror", "title": hit["title"] + " | Mirror"},
+        {**hit, "url": hit["url"] + "-copy", "snippet": " ".join(changed)},
+        {**hit, "url": hit["url"] + "-dated", "snippet": "Mar 3, 2025 — " + hit["snippet"]},
+    ]
+
+
+def bench_dedup(iterations) -> dict:
+    """
+    Deduplicate the hits saved in outputs/research_*.json: distinct pages must
+    all be kept (fails otherwise); the share of planted near-duplicates that
+    is dropped is reported (short snippets change too much per edited word
+    for all of them to be caught without merging distinct pages)
+    """
+    import glob
+    from tools.dedup import MIN_WORDS, canonical_url, dedupe_hits
+
+    distinct = {}
+    for path in sorted(glob.glob(os.path.join(REPO_ROOT, "outputs", "research_*.json"))):
+        with open(path, "r", encoding="utf-8") as f:
+            for hit in json.load(f).get("hits", []):
+                if not hit.get("fallback"):
+                    distinct.setdefault(canonical_url(hit.get("url")) or hit.get("title"), hit)
+    hits = list(distinct.values())
+    kept = dedupe_hits([dict(h) for h in hits], len(hits))
+    if len(kept) != len(hits):
+        lost = {canonical_url(h.get("url")) for h in hits} - {canonical_url(h.get("url")) for h in kept}
+        raise RuntimeError(f"Distinct saved hits merged as duplicates: {sorted(lost)}")
+
+    planted = [h for h in hits if len(h.get("snippet", "").split()) >= MIN_WORDS]
+    candidates = [dict(h) for h in hits] + [copy for h in planted for copy in _near_duplicates(h)]
+    kept = dedupe_hits(candidates, len(candidates))
+    dropped = len(candidates) - len(kept)
+    print(f"  {len(hits)} distinct saved hits kept, {dropped}/{3 * len(planted)} planted near-duplicates dropped",
+          file=sys.__stdout__)
+    result = bench("dedup.saved_hits", lambda: dedupe_hits([dict(h) for h in candidates], len(candidates)),
+                   iterations)
+    result["near_duplicate_recall"] = dropped / (3 * len(planted)) if planted else 0.0
+    return {"dedup.saved_hits": result}
+
+
+def _stub_search_server(latency):
+    """Local JSON search API answering every request after latency(n) seconds"""
+    import threading
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    counter = iter(range(10 ** 9))
+    lock = threading.Lock()
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            with lock:
+                n = next(counter)
+            time.sleep(latency(n))
+            body = json.dumps({"results": [{"title": f"Result {i}", "url": f"https://example.com/{n}/{i}",
+                                            "content": "stub"} for i in range(5)]}).encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def bench_hedging(queries=100, slow_every=10, slow=3.0, fast=0.02) -> dict:
+    """
+    Search latency with and without hedging against two local stub servers:
+    the primary answers in `fast` seconds but every slow_every-th request
+    takes `slow` seconds, the secondary always answers in 2 * fast.
+    """
+    import asyncio
+    from tools.search_backends import HttpJsonBackend, hedged_search
+    from utils.stats import summarize
+
+    for name in ("STUB_PRIMARY", "STUB_SECONDARY"):
+        os.environ.setdefault(f"SEARCH_{name}_RATE", "100000")
+        os.environ.setdefault(f"SEARCH_{name}_BURST", "100000")
+        os.environ.setdefault(f"SEARCH_{name}_MAX_CONCURRENCY", "64")
+    primary = _stub_search_server(lambda n: slow if n % slow_every == slow_every - 1 else fast)
+    secondary = _stub_search_server(lambda n: 2 * fast)
+    backends = {
+        name: HttpJsonBackend(name, f"http://127.0.0.1:{server.server_address[1]}/search?q={{query}}")
+        for name, server in (("stub_primary", primary), ("stub_secondary", secondary))
+    }
+
+    results = {}
+    try:
+        for label, order in (("single", ["stub_primary"]), ("hedged", ["stub_primary", "stub_secondary"])):
+            samples = []
+            for i in range(queries):
+                started = time.perf_counter()
+                asyncio.run(hedged_search(f"query {i}", 5, [backends[name] for name in order]))
+                samples.append(time.perf_counter() - started)
+            result = summarize(samples)
+            results[f"search.{label}"] = result
+            print(f"  search.{label:<8} p50 {result['p50'] * 1000:8.1f} ms   p95 {result['p95'] * 1000:8.1f} ms   "
+                  f"p99 {result['p99'] * 1000:8.1f} ms", file=sys.__stdout__)
+    finally:
+        primary.shutdown()
+        secondary.shutdown()
+    return results
+
+
+def _sample_report(i: int) -> str:
+    paragraph = (f"Report {i} looks at {TOPIC.lower()} from several angles, with **key findings**, "
+                 f"*caveats* and `inline code`. ") * 6
+    sections = "".join(f"## Section {s}\n\n{paragraph}\n\n- point one\n- point two\n- point three\n\n"
+                       for s in range(12))
+    return (f"# {TOPIC} ({i})\n\n{sections}| Metric | Value |\n|---|---|\n| latency | {i} ms |\n\n"
+            f"```python\nprint({i})\n```\n")
+
+
+def bench_export(iterations, reports=40) -> dict:
+    """Markdown rendering and multi-format export throughput on a batch of large reports"""
+    import markdown
+    from tools import export_engine
+    from tools.artifact_store import ArtifactStore
+
+    texts = [_sample_report(i) for i in range(reports)]
+    store = ArtifactStore(os.path.join(os.getcwd(), "outputs", "export-bench"))
+    results = {}
+
+    def fresh():
+        # A new converter per report: extensions are loaded every time
+        for text in texts:
+            markdown.Markdown(extensions=export_engine.EXTENSIONS).convert(text)
+
+    def reset_reuse():
+        # One converter, reset between reports (what render_html does, without its cache)
+        md = export_engine._converter()
+        for text in texts:
+            try:
+                md.convert(text)
+            finally:
+                md.reset()
+
+    def reused():
+        export_engine._cache.clear()
+        for text in texts:
+            export_engine.render_html(text)
+
+    def cached():
+        for text in texts:
+            export_engine.render_html(text)
+
+    def export_all(cold=True):
+        if cold:
+            export_engine._cache.clear()  # Include rendering the Markdown
+        for text in texts:
+            export_engine.export_report(text, store, TOPIC, score=80, formats=export_engine.FORMATS)
+
+    results["export.batch_fresh_converter"] = bench("export.batch_fresh", fresh, iterations)
+    results["export.batch_reset_converter"] = bench("export.batch_reset", reset_reuse, iterations)
+    results["export.batch_reused_converter"] = bench("export.batch_reused", reused, iterations)
+    results["export.batch_render_cached"] = bench("export.batch_cached", cached, iterations)
+    results["export.batch_all_formats"] = bench("export.batch_all_formats", export_all, iterations)
+    results["export.batch_all_formats_warm"] = bench("export.batch_all_warm", lambda: export_all(cold=False),
+                                                     iterations)
+    speedup = results["export.batch_fresh_converter"]["p50"] / results["export.batch_reset_converter"]["p50"]
+    print(f"  Reusing one converter (reset between reports): {speedup:.2f}x a new converter per report",
+          file=sys.__stdout__)
+    per_second = reports / results["export.batch_all_formats"]["p50"]
+    print(f"  {reports} reports x {len(export_engine.FORMATS)} formats: {per_second:.1f} reports/s",
+          file=sys.__stdout__)
+    return results
+
+
+def run_all(args) -> dict:
+    from benchmarks.fake_ollama import FakeChatClient
+    from benchmarks.fake_search import fake_search_web
+
+    client = FakeChatClient(latency=args.latency, tokens_per_sec=args.tokens_per_sec)
+    install_fakes(client)
+
+    import markdown
+    from agents.researcher import Researcher
+    from agents.analyst import Analyst
+    from agents.writer import Writer
+    from agents.critic import Critic
+    from main import run_pipeline
+
+    results = {}
+    n = args.iterations
+
+    print("\nAgents", file=sys.__stdout__)
+    researcher, analyst, writer, critic = Researcher(), Analyst(), Writer(), Critic()
+    research = researcher.run(TOPIC)
+    analysis = analyst.run(research)
+    full_data = {**research, "analysis": analysis.get("summary", "")}
+    report = writer.run(full_data)
+
+    results["agent.researcher"] = bench("agent.researcher", lambda: researcher.run(TOPIC), n)
+    results["agent.analyst"] = bench("agent.analyst", lambda: analyst.run(research), n)
+    results["agent.writer"] = bench("agent.writer", lambda: writer.run(full_data), n)
+    results["agent.writer_stream"] = bench("agent.writer_stream",
+                                           lambda: writer.run(full_data, on_token=lambda c: None), n)
+    results["agent.critic"] = bench("agent.critic", lambda: critic.run(report), n)
+
+    print("\nCPU-only paths", file=sys.__stdout__)
+    critique_text = "Score: 82\nFeedback: Clear structure. Add more concrete examples.\n" * 3
+    results["critic.parse"] = bench("critic.parse", lambda: critic._parse_critique(critique_text), n * 100)
+    results["export.markdown"] = bench(
+        "export.markdown", lambda: markdown.markdown(report, extensions=['extra', 'codehilite']), n * 10)
+    results["search.fake"] = bench("search.fake", lambda: fake_search_web(TOPIC, 5), n * 100)
+
+    print("\nSearch result parsing", file=sys.__stdout__)
+    results.update(bench_parsers(n * 10))
+
+    print("\nExport", file=sys.__stdout__)
+    results.update(bench_export(n))
+
+    print("\nPipeline", file=sys.__stdout__)
+    results["pipeline.run"] = bench("pipeline.run", lambda: run_pipeline(TOPIC), n)
+    results["pipeline.concurrency"] = bench_concurrency(run_pipeline, args.workers, args.jobs_per_worker)
+
+    results["model_calls"] = client.calls
+    return results
+
+
+def git_commit() -> str:
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], cwd=REPO_ROOT,
+                                       stderr=subprocess.DEVNULL, text=True).strip()
+    except Exception:
+        return "unknown"
+
+
+def compare(current: dict, previous_path: str):
+    """Print p50 changes against an earlier results file"""
+    with open(previous_path, "r", encoding="utf-8") as f:
+        previous = json.load(f)
+    print(f"\nComparison with {previous_path} ({previous['meta'].get('commit')})", file=sys.__stdout__)
+    for name, new in current["results"].items():
+        old = previous["results"].get(name)
+        if not isinstance(new, dict) or not isinstance(old, dict) or "p50" not in new or "p50" not in old:
+            continue
+        change = (new["p50"] - old["p50"]) / old["p50"] * 100 if old["p50"] else 0.0
+        print(f"  {name:<24} p50 {old['p50'] * 1000:9.2f} -> {new['p50'] * 1000:9.2f} ms  ({change:+.1f}%)",
+              file=sys.__stdout__)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline pipeline benchmarks")
+    parser.add_argument("--iterations", type=int, default=10, help="Timed runs per benchmark")
+    parser.add_argument("--latency", type=float, default=0.02, help="Fake model latency per call (s)")
+    parser.add_argument("--tokens-per-sec", type=float, default=2000.0, help="Fake model generation speed")
+    parser.add_argument("--workers", type=lambda s: [int(x) for x in s.split(",")], default=[1, 2, 4],
+                        help="Comma-separated worker counts for the concurrency benchmark")
+    parser.add_argument("--jobs-per-worker", type=int, default=3)
+    parser.add_argument("--output", default=None, help="Results JSON path (default: benchmarks/results/)")
+    parser.add_argument("--compare", default=None, help="Earlier results JSON to compare against")
+    parser.add_argument("--parsers-only", action="store_true", help="Only benchmark the search result parsers")
+    parser.add_argument("--export-only", action="store_true", help="Only benchmark report export")
+    parser.add_argument("--dedup-only", action="store_true",
+                        help="Only check and time search hit deduplication on the saved research")
+    parser.add_argument("--hedging-only", action="store_true",
+                        help="Only benchmark hedged search against local stub servers")
+    args = parser.parse_args()
+
+    workdir = prepare_workdir()
+    logging.disable(logging.WARNING)
+
+    # Agents and file tools print progress; keep the benchmark output readable
+    with contextlib.redirect_stdout(io.StringIO()):
+        if args.parsers_only:
+            print("\nSearch result parsing", file=sys.__stdout__)
+            results = bench_parsers(args.iterations * 10)
+        elif args.export_only:
+            print("\nExport", file=sys.__stdout__)
+            results = bench_export(args.iterations)
+        elif args.dedup_only:
+            print("\nSearch hit deduplication", file=sys.__stdout__)
+            results = bench_dedup(args.iterations * 10)
+        elif args.hedging_only:
+            print("\nHedged search", file=sys.__stdout__)
+            results = bench_hedging(args.iterations * 10)
+        else:
+            results = run_all(args)
+
+    report = {
+        "meta": {
+            "timestamp": datetime.now().isoformat(),
+            "commit": git_commit(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "workdir": workdir,
+            "params": {k: v for k, v in vars(args).items() if k not in ("output", "compare")},
+        },
+        "results": results,
+    }
+
+    output = args.output
+    if not output:
+        os.makedirs(RESULTS_DIR, exist_ok=True)
+        stamp = datetime.now().strftime("%Y%m%d-%H%M%S")
+        output = os.path.join(RESULTS_DIR, f"{stamp}_{report['meta']['commit']}.json")
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    print(f"\nSaved results: {output}")
+
+    if args.compare:
+        compare(report, args.compare)
+
+
+if __name__ == "__main__":
+    main()
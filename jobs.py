@@ -0,0 +1,239 @@
+# jobs.py
+# Background job queue for report pipelines.
+# - submit() returns a job ID immediately; run_pipeline runs on a bounded
+#   worker pool, so callers (Streamlit sessions, services) never block on it
+# - Each job collects the pipeline's progress events, a progress estimate
+#   (0-100) and the live Writer output, which callers poll with snapshot()
+#   or events(job_id, since=...)
+# - max_queued bounds the jobs waiting for a worker; submit() raises
+#   QueueFull beyond it so front-ends can push back (HTTP 429)
+# - An optional per-job deadline fails jobs that are still waiting when it
+#   passes and stops running ones at the next pipeline stage
+# - Finished jobs are kept (up to MAX_FINISHED_JOBS) so results can still be
+#   fetched after a page reload
+#
+# Usage:
+#   queue = get_job_queue()
+#   job_id = queue.submit("Edge AI", author="Me")
+#   queue.snapshot(job_id)  -> {"status": "running", "progress": 40, ...}
+
+import logging
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional
+
+from main import run_pipeline
+from tools.artifact_store import new_run_id
+
+logger = logging.getLogger(__name__)
+
+MAX_WORKERS = 2           # Pipelines running at the same time
+MAX_FINISHED_JOBS = 200   # Finished jobs kept for status/result lookups
+MAX_EVENTS = 500          # Events kept per job
+MAX_QUEUED = None         # Jobs waiting for a worker (None = unlimited)
+
+# Progress range (start, end) covered by each stage; rewrites repeat
+# writing/critique, so progress never moves backwards
+STAGE_PROGRESS = {
+    "research": (0, 25),
+    "analysis": (25, 40),
+    "writing": (40, 75),
+    "critique": (75, 90),
+    "export": (90, 100),
+}
+
+QUEUED, RUNNING, DONE, FAILED = "queued", "running", "done", "failed"
+
+
+class QueueFull(Exception):
+    """Raised by submit() when max_queued jobs are already waiting"""
+
+
+class Job:
+    def __init__(self, job_id: str, params: Dict, deadline: float = None):
+        self.id = job_id
+        self.params = params
+        self.deadline = deadline   # time.monotonic() value, or None
+        self.status = QUEUED
+        self.stage = None
+        self.attempt = 0
+        self.progress = 0
+        self.events: List[Dict] = []
+        self.dropped_events = 0
+        self.partial = ""          # Writer output of the current attempt
+        self._partial_attempt = 0
+        self.result: Optional[Dict] = None
+        self.error: Optional[str] = None
+        self.created = time.time()
+        self.started = None
+        self.finished = None
+        self.lock = threading.Lock()
+        self.done = threading.Event()
+
+    def on_event(self, event: Dict):
+        with self.lock:
+            if event["type"] == "stage_start":
+                self.stage = event["stage"]
+                self.attempt = event.get("attempt", self.attempt)
+                start, _ = STAGE_PROGRESS.get(self.stage, (self.progress, self.progress))
+                self.progress = max(self.progress, start)
+            elif event["type"] == "stage_end":
+                _, end = STAGE_PROGRESS.get(event["stage"], (self.progress, self.progress))
+                self.progress = max(self.progress, end)
+            self.events.append(event)
+            if len(self.events) > MAX_EVENTS:
+                self.events.pop(0)
+                self.dropped_events += 1
+
+    def on_token(self, chunk: str, attempt: int):
+        with self.lock:
+            if attempt != self._partial_attempt:
+                self._partial_attempt = attempt
+                self.partial = ""
+            self.partial += chunk
+
+    def snapshot(self, with_partial: bool = True) -> Dict:
+        with self.lock:
+            return {
+                "job_id": self.id,
+                "status": self.status,
+                "stage": self.stage,
+                "attempt": self.attempt,
+                "progress": self.progress,
+                "params": dict(self.params),
+                "error": self.error,
+                "created": self.created,
+                "started": self.started,
+                "finished": self.finished,
+                "events": len(self.events) + self.dropped_events,
+                "partial": self.partial if with_partial else None,
+                "partial_attempt": self._partial_attempt,
+                "result": self.result,
+            }
+
+
+class JobQueue:
+    """Runs pipeline jobs on a bounded thread pool"""
+
+    def __init__(self, workers: int = MAX_WORKERS, max_finished: int = MAX_FINISHED_JOBS,
+                 max_queued: int = MAX_QUEUED):
+        self.workers = workers
+        self.max_finished = max_finished
+        self.max_queued = max_queued
+        self._waiting = 0
+        self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="pipeline-job")
+        self._jobs: "OrderedDict[str, Job]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def submit(self, topic: str, deadline: float = None, **params) -> str:
+        """
+        Queue a report job.
+
+        Args:
+            topic: Research topic
+            deadline: Seconds from now the job may take, waiting included (None = no limit)
+            **params: Other run_pipeline arguments (title, author, max_retries, ...)
+
+        Returns:
+            Job ID (also used as the pipeline's run ID)
+
+        Raises:
+            QueueFull: max_queued jobs are already waiting for a worker
+        """
+        expires = time.monotonic() + deadline if deadline else None
+        job = Job(new_run_id(), {"topic": topic, **params}, expires)
+        with self._lock:
+            if self.max_queued is not None and self._waiting >= self.max_queued:
+                raise QueueFull(f"{self._waiting} jobs already waiting")
+            self._waiting += 1
+            self._jobs[job.id] = job
+            self._prune()
+        self._pool.submit(self._run, job)
+        logger.info(f" Queued job {job.id}: {topic}")
+        return job.id
+
+    def _run(self, job: Job):
+        with self._lock:
+            self._waiting -= 1
+        with job.lock:
+            job.status = RUNNING
+            job.started = time.time()
+        try:
+            if job.deadline is not None and time.monotonic() > job.deadline:
+                result, error = None, "Deadline exceeded while queued"
+            else:
+                result = run_pipeline(run_id=job.id, on_event=job.on_event, on_token=job.on_token,
+                                      deadline=job.deadline, **job.params)
+                error = None if result.get("success") else result.get("error", "Unknown error")
+        except Exception as e:
+            logger.error(f"Job {job.id} crashed: {e}", exc_info=True)
+            result, error = None, str(e)
+
+        with job.lock:
+            job.result = result
+            job.error = error
+            job.status = FAILED if error else DONE
+            if not error:
+                job.progress = 100
+            job.finished = time.time()
+        job.done.set()
+
+    def _prune(self):
+        """Forget the oldest finished jobs beyond max_finished"""
+        finished = [job_id for job_id, job in self._jobs.items() if job.done.is_set()]
+        for job_id in finished[:max(0, len(finished) - self.max_finished)]:
+            del self._jobs[job_id]
+
+    def get(self, job_id: str) -> Optional[Job]:
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def snapshot(self, job_id: str, with_partial: bool = True) -> Optional[Dict]:
+        job = self.get(job_id)
+        return job.snapshot(with_partial) if job else None
+
+    def events(self, job_id: str, since: int = 0) -> List[Dict]:
+        """Events after the first `since` ones (pass the count you already have)"""
+        job = self.get(job_id)
+        if job is None:
+            return []
+        with job.lock:
+            return job.events[max(0, since - job.dropped_events):]
+
+    def wait(self, job_id: str, timeout: float = None) -> Optional[Dict]:
+        """Block until the job finishes (or timeout); returns its snapshot"""
+        job = self.get(job_id)
+        if job is None:
+            return None
+        job.done.wait(timeout)
+        return job.snapshot()
+
+    def list_jobs(self) -> List[Dict]:
+        with self._lock:
+            jobs = list(self._jobs.values())
+        return [job.snapshot(with_partial=False) for job in jobs]
+
+    def stats(self) -> Dict:
+        counts = {QUEUED: 0, RUNNING: 0, DONE: 0, FAILED: 0}
+        with self._lock:
+            for job in self._jobs.values():
+                counts[job.status] += 1
+        return {"workers": self.workers, "max_queued": self.max_queued, **counts}
+
+    def shutdown(self, wait: bool = True):
+        self._pool.shutdown(wait=wait)
+
+
+_queue = None
+_queue_lock = threading.Lock()
+
+
+def get_job_queue(workers: int = MAX_WORKERS, max_queued: int = MAX_QUEUED) -> JobQueue:
+    """Return the process-wide job queue (created on first use with these limits)"""
+    global _queue
+    with _queue_lock:
+        if _queue is None:
+            _queue = JobQueue(workers, max_queued=max_queued)
+        return _queue
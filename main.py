@@ -1,12 +1,26 @@
 # main.py 
 import logging
-from agents.researcher import Researcher
-from agents.analyst import Analyst
-from agents.writer import Writer
-from agents.critic import Critic
-from tools.file_tool import save_text
-import markdown
+from agents.researcher import Researcher, MODEL as RESEARCHER_MODEL
+from agents.analyst import Analyst, MODEL as ANALYST_MODEL
+from agents.writer import Writer, MODEL as WRITER_MODEL
+from agents.critic import Critic, MODEL as CRITIC_MODEL
+from tools.file_tool import save_json
+from tools.artifact_store import RunStore, safe_filename
+from tools.checkpoint import RunCheckpoint
+from tools.export_engine import export_report
+from tools.refresh import (affected_sections, change_summary, diff_hits, merge_hits, previous_report,
+                           refresh_feedback, remember_run)
+from tools.search_tool import is_fallback, search_web
+from tools.topic_cache import get_topic_cache
+from utils.metrics import REGISTRY, emit, reset_listener, set_listener, stage, stage_totals
+from utils.ollama_client import warm_up
+from utils.rate_limit import get_guard
 import os
+import time
+import contextvars
+from contextlib import contextmanager
+from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
 
 # Setup logging
 logging.basicConfig(
@@ -19,7 +33,335 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
-def run_pipeline(topic: str, title: str = None, author: str = "AutoAgent", max_retries: int = 2):
+PIPELINE_MODELS = [RESEARCHER_MODEL, ANALYST_MODEL, WRITER_MODEL, CRITIC_MODEL]
+
+
+def warm_up_models(host: str = None):
+    """Load every model the pipeline uses (call once at startup); returns seconds per model"""
+    return warm_up(PIPELINE_MODELS, host=host)
+
+
+class DeadlineExceeded(TimeoutError):
+    """The run's deadline passed; it stops at the next stage boundary"""
+
+
+class SearchUnavailable(Exception):
+    """Only placeholder hits came back; analysis and writing were skipped"""
+
+
+_deadline = contextvars.ContextVar("deadline", default=None)
+
+
+@contextmanager
+def _stage(name, stages, **info):
+    """stage() that first checks the current run's deadline"""
+    deadline = _deadline.get()
+    if deadline is not None and time.monotonic() > deadline:
+        raise DeadlineExceeded(f"Deadline exceeded before {name}")
+    with stage(name, stages, **info) as record:
+        yield record
+
+
+def _timings(stages):
+    """Per-stage wall time totals (all five stages always present)"""
+    totals = stage_totals(stages)
+    return {name: totals.get(name, 0.0) for name in ("research", "analysis", "writing", "critique", "export")}
+
+
+def _search_cache(stages):
+    """
+    This run's search cache outcomes, from its own stage records (global
+    counters would include concurrent runs)
+    """
+    outcomes = [cache for record in stages for cache in record["search_cache"]]
+    return {"hits": outcomes.count("hit"), "stale_hits": outcomes.count("stale"),
+            "misses": outcomes.count("miss")}
+
+
+def _llm_cache(stages):
+    """This run's LLM cache hits and misses, from its own stage records"""
+    return {"hits": sum(record["llm_cached"] for record in stages),
+            "misses": sum(record["llm_cache_misses"] for record in stages)}
+
+
+def _write_sequential(writer, critic, full_data, title, max_retries, on_token, stages,
+                      rewrite_mode="full", checkpoint=None, resume=False):
+    """
+    Write and critique in a loop, rewriting with feedback until the report
+    passes or max_retries is reached.
+
+    With rewrite_mode="section" a retry regenerates only the sections the
+    feedback points at (Writer.revise), falling back to a full rewrite when
+    the feedback is not section-specific.
+
+    Every draft and critique is checkpointed; with resume=True the loop
+    continues after the last checkpointed attempt (a draft that was not
+    critiqued yet is critiqued without rewriting it).
+
+    Returns:
+        (markdown_text, critique_result, attempts)
+    """
+    markdown_text = None
+    critique_result = None
+    attempt = 0
+    resumed_draft = None
+    
+    last = checkpoint.last_attempt() if checkpoint and resume else None
+    if last:
+        attempt, markdown_text, critique_result = last
+        if critique_result is None:
+            attempt, resumed_draft = attempt - 1, markdown_text
+            previous = checkpoint.load(f"critique_{attempt}") if attempt else None
+            critique_result = previous.get("critique") if previous else None
+        logger.info(f"Resuming after writing attempt {attempt}")
+        if critique_result and critique_result.get('passed', False) and resumed_draft is None:
+            return markdown_text, critique_result, attempt
+    
+    while attempt <= max_retries:
+        attempt += 1
+        logger.info(f"Writing attempt {attempt}/{max_retries + 1}...")
+        
+        stream_cb = (lambda chunk, n=attempt: on_token(chunk, n)) if on_token else None
+        
+        # Write report
+        with _stage("writing", stages, attempt=attempt):
+            if resumed_draft is not None:
+                markdown_text, resumed_draft = resumed_draft, None
+                if stream_cb:
+                    stream_cb(markdown_text)
+            elif attempt == 1:
+                # First attempt - normal write
+                markdown_text = writer.run(full_data, title=title, on_token=stream_cb)
+            else:
+                # Retry with feedback from previous critique
+                logger.info(f"Rewriting with feedback: {critique_result.get('feedback', '')[:100]}...")
+                # Add feedback to the data
+                full_data["previous_feedback"] = critique_result.get('feedback', '')
+                revised = None
+                if rewrite_mode == "section" and markdown_text:
+                    revised = writer.revise(markdown_text, full_data["previous_feedback"], full_data, title=title)
+                    if revised and stream_cb:
+                        stream_cb(revised)
+                markdown_text = revised or writer.run(full_data, title=title, on_token=stream_cb)
+        if checkpoint and markdown_text:
+            checkpoint.save_draft(attempt, markdown_text)
+        
+        if not markdown_text or len(markdown_text) < 100:
+            logger.warning("Writer produced minimal content")
+            if attempt > max_retries:
+                break
+            continue
+        
+        logger.info(f"Report generated ({len(markdown_text)} chars)")
+        
+        # 4. Critique Phase
+        logger.info("=" * 50)
+        logger.info(f"PHASE 4: CRITIQUE (Attempt {attempt})")
+        logger.info("=" * 50)
+        
+        with _stage("critique", stages, attempt=attempt):
+            critique_result = critic.run(markdown_text)
+        if checkpoint:
+            checkpoint.save_critique(attempt, critique_result)
+        
+        score = critique_result.get('score', 0)
+        passed = critique_result.get('passed', False)
+        feedback = critique_result.get('feedback', '')
+        emit("critique", attempt=attempt, score=score, passed=passed)
+        
+        logger.info(f"Score: {score}/100")
+        logger.info(f"Feedback: {feedback[:150]}...")
+        
+        if passed:
+            logger.info("Report passed quality check")
+            break
+        else:
+            logger.warning(f"Score too low ({score} < {critic.get_threshold()})")
+            if attempt <= max_retries:
+                logger.info("Retrying with improvements...")
+            else:
+                logger.warning("Max retries reached, using last version")
+    
+    return markdown_text, critique_result, attempt
+
+
+def _write_speculative(writer, critic, full_data, title, drafts, on_token, stages,
+                       checkpoint=None, resume=False):
+    """
+    Generate several drafts at different temperatures in parallel, score
+    them all in parallel and keep the best. If the best one still fails,
+    do one feedback-driven rewrite and keep whichever scores higher.
+
+    Drafts are not streamed (they are written on worker threads); the
+    feedback round is streamed to on_token as attempt 2.
+
+    Every draft and critique is checkpointed; with resume=True only the
+    ones missing from the checkpoints are generated.
+
+    Returns:
+        (markdown_text, critique_result, rounds)
+    """
+    def restored(load, *args):
+        """Checkpointed draft / critique when resuming, else None"""
+        return getattr(checkpoint, load)(*args) if checkpoint and resume else None
+    
+    temperatures = [round(0.3 + 0.6 * i / (drafts - 1), 2) for i in range(drafts)]
+    logger.info(f"Speculative writing: {drafts} drafts at temperatures {temperatures}")
+    
+    # Worker threads run in a copy of this context so their model calls
+    # are attributed to the current stage
+    def in_context(fn):
+        ctx = contextvars.copy_context()
+        return lambda arg: ctx.copy().run(fn, arg)
+    
+    def write_draft(i):
+        text = writer.run(full_data, title=title, temperature=temperatures[i])
+        if checkpoint and text:
+            checkpoint.save_draft(1, text, draft=i)
+        return text
+    
+    def critique_draft(i):
+        result = critic.run(texts[i])
+        if checkpoint:
+            checkpoint.save_critique(1, result, draft=i)
+        return result
+    
+    texts = [restored("load_draft", 1, i) for i in range(drafts)]
+    missing = [i for i, text in enumerate(texts) if text is None]
+    if len(missing) < drafts:
+        logger.info(f"Restored {drafts - len(missing)} drafts from checkpoints")
+    
+    with ThreadPoolExecutor(max_workers=drafts) as pool:
+        with _stage("writing", stages, attempt=1, drafts=len(missing)):
+            for i, text in zip(missing, pool.map(in_context(write_draft), missing)):
+                texts[i] = text
+        
+        indices = [i for i, t in enumerate(texts) if t and len(t) >= 100]
+        if not indices:
+            logger.warning("Writer produced minimal content for every draft")
+            return (texts[0] if texts else None), None, 1
+        
+        critiques = {i: restored("load_critique", 1, i) for i in indices}
+        unscored = [i for i in indices if critiques[i] is None]
+        logger.info("=" * 50)
+        logger.info(f"PHASE 4: CRITIQUE ({len(unscored)} drafts)")
+        logger.info("=" * 50)
+        with _stage("critique", stages, attempt=1, drafts=len(unscored)):
+            for i, result in zip(unscored, pool.map(in_context(critique_draft), unscored)):
+                critiques[i] = result
+    
+    candidates = [texts[i] for i in indices]
+    critiques = [critiques[i] for i in indices]
+    
+    best = max(range(len(candidates)), key=lambda i: critiques[i].get('score', 0))
+    markdown_text, critique_result = candidates[best], critiques[best]
+    logger.info(f"Best draft: #{best + 1} with score {critique_result.get('score', 0)}/100 "
+                f"(scores: {[c.get('score', 0) for c in critiques]})")
+    emit("critique", attempt=1, score=critique_result.get('score', 0),
+         passed=critique_result.get('passed', False), drafts=len(candidates))
+    
+    if critique_result.get('passed', False):
+        logger.info("Report passed quality check")
+        return markdown_text, critique_result, 1
+    
+    logger.info(f"Rewriting best draft with feedback: {critique_result.get('feedback', '')[:100]}...")
+    stream_cb = (lambda chunk: on_token(chunk, 2)) if on_token else None
+    retry_data = {**full_data, "previous_feedback": critique_result.get('feedback', '')}
+    
+    rewrite = restored("load_draft", 2)
+    if rewrite is None:
+        with _stage("writing", stages, attempt=2):
+            rewrite = writer.run(retry_data, title=title, on_token=stream_cb)
+        if checkpoint and rewrite:
+            checkpoint.save_draft(2, rewrite)
+    
+    if rewrite and len(rewrite) >= 100:
+        rewrite_critique = restored("load_critique", 2)
+        if rewrite_critique is None:
+            with _stage("critique", stages, attempt=2):
+                rewrite_critique = critic.run(rewrite)
+            if checkpoint:
+                checkpoint.save_critique(2, rewrite_critique)
+        emit("critique", attempt=2, score=rewrite_critique.get('score', 0),
+             passed=rewrite_critique.get('passed', False))
+        if rewrite_critique.get('score', 0) >= critique_result.get('score', 0):
+            markdown_text, critique_result = rewrite, rewrite_critique
+    
+    logger.info(f"Final score: {critique_result.get('score', 0)}/100")
+    return markdown_text, critique_result, 2
+
+
+def _export(markdown_text, critique_result, topic, title, author, store):
+    """Write the final report formats into the run store; returns {format: path}"""
+    paths = export_report(markdown_text, store, title or topic, author, critique_result.get('score', 0))
+    if "html" not in paths or "md" not in paths:
+        raise Exception(f"Export failed (wrote {sorted(paths)})")
+    return paths
+
+
+def _lookup_similar(topic: str):
+    try:
+        reused = get_topic_cache().lookup(topic)
+    except Exception as e:
+        logger.warning(f" Topic cache lookup failed: {e}")
+        return None
+    if reused:
+        logger.info(f"Reusing research of {reused['research']['reused_from']}"
+                    f"{' and its analysis' if reused['analysis'] else ''}")
+    return reused
+
+
+def _remember_topic(topic: str, research_data: dict, analysis: dict):
+    try:
+        get_topic_cache().add(topic, research_data, analysis)
+    except Exception as e:
+        logger.warning(f" Could not add topic to cache: {e}")
+
+
+def _previous_report(topic: str):
+    try:
+        previous = previous_report(topic)
+    except Exception as e:
+        logger.warning(f" Could not load the previous report: {e}")
+        return None
+    if previous is None:
+        logger.info("No previous report to refresh, running the full pipeline")
+    return previous
+
+
+def _refresh_research(researcher, topic: str, previous: dict):
+    """
+    Search again and compare with the hits the previous report was written from.
+
+    Returns:
+        (research_data, diff); the previous research when no new source
+        turned up, otherwise research over the merged hits
+    """
+    old_hits = previous["research"]["hits"]
+    # Past research must not answer a refresh, or nothing would ever look new
+    hits = search_web(topic, max_results=5, use_cache=False, exclude_backends=("local",))
+    if not hits or is_fallback(hits):
+        return researcher.run(topic, hits=hits), None
+    diff = diff_hits(old_hits, hits)
+    logger.info(f"Refresh of run {previous['run_id']}: {len(diff['added'])} new, "
+                f"{len(diff['removed'])} dropped, {len(diff['kept'])} unchanged sources")
+    if not diff["material"]:
+        return previous["research"], diff
+    return researcher.run(topic, hits=merge_hits(old_hits, diff)), diff
+
+
+def _remember_run(topic: str, run_id: str, finished_at: str):
+    try:
+        remember_run(topic, run_id, finished_at)
+    except Exception as e:
+        logger.warning(f" Could not record the latest run: {e}")
+
+
+def run_pipeline(topic: str, title: str = None, author: str = "AutoAgent", max_retries: int = 2,
+                 on_token=None, speculative: int = 0, rewrite_mode: str = "full",
+                 tiered_critique: bool = False, run_id: str = None, on_event=None,
+                 deadline: float = None, local_first: bool = False, reuse_similar: bool = False,
+                 refresh: bool = False, resume: bool = False, critic_pass_above: int = None):
     """
     Main pipeline with feedback loop.
     
@@ -28,156 +370,292 @@ def run_pipeline(topic: str, title: str = None, author: str = "AutoAgent", max_r
         title: Optional custom report title
         author: Report author name
         max_retries: Maximum number of rewrites if score is low
+        on_token: Optional callback on_token(chunk, attempt) that receives
+            the Writer output as it is generated (streaming mode)
+        speculative: If > 1, write this many drafts in parallel and keep the
+            best instead of the sequential rewrite loop (max_retries is
+            then ignored; at most one feedback round follows)
+        rewrite_mode: "full" rewrites the whole report on a failed critique,
+            "section" regenerates only the sections the feedback mentions
+        tiered_critique: Let the Critic decide obvious fails from structure
+            alone and only send borderline reports to the model
+        critic_pass_above: With tiered_critique, structural scores at or
+            above this (all sections present) pass without a model call;
+            None sends every report that is not an obvious fail to the model
+        run_id: ID for this run's artifact folder (outputs/runs/<run_id>/);
+            a unique one is generated when omitted
+        on_event: Optional callback on_event(event) for progress events:
+            started, stage_start/stage_end (research, analysis, writing,
+            critique, export), critique (attempt, score, passed), and
+            finished or failed
+        deadline: time.monotonic() value after which the run fails with
+            DeadlineExceeded at the next stage boundary (a stage already
+            running is not interrupted)
+        local_first: Take research hits from the local index of past
+            research when it covers the topic, searching the web otherwise
+        reuse_similar: Reuse the research (and, for a near-identical topic,
+            the analysis) of similar past topics from the topic cache, and
+            add this topic's results to it otherwise
+        refresh: Update the topic's latest report instead of starting from
+            scratch: search again and reuse the previous analysis and report
+            if no new source turned up, otherwise re-analyse and rewrite only
+            the sections the new sources affect (changes.json records what
+            changed); runs the full pipeline if there is no previous report
+        resume: Continue run_id from its checkpoints instead of starting
+            over (use resume_pipeline(), which restores the arguments)
         
     Returns:
         Dictionary with pipeline results
     """
-    logger.info(f"Pipeline started for topic: {topic}")
+    store = RunStore(run_id)
+    checkpoint = RunCheckpoint(store)
+    logger.info(f"Pipeline {'resumed' if resume else 'started'} for topic: {topic} (run {store.run_id})")
+    started_at = datetime.now().isoformat()
+    stages = []
+    listener = set_listener(on_event)
+    deadline_token = _deadline.set(deadline)
+    emit("started", run_id=store.run_id, topic=topic, resumed=resume)
+    restored = []
     
     try:
+        if not resume:
+            checkpoint.save("params", {
+                "topic": topic, "title": title, "author": author, "max_retries": max_retries,
+                "speculative": speculative, "rewrite_mode": rewrite_mode,
+                "tiered_critique": tiered_critique, "local_first": local_first,
+                "reuse_similar": reuse_similar, "refresh": refresh,
+                "critic_pass_above": critic_pass_above,
+            })
+        
+
         # 1. Research Phase
         logger.info("=" * 50)
         logger.info("PHASE 1: RESEARCH")
         logger.info("=" * 50)
-        researcher = Researcher()
-        research_data = researcher.run(topic)
+        researcher = Researcher(local_first=local_first)
+        research_data = checkpoint.load("research") if resume else None
+        previous = _previous_report(topic) if refresh and research_data is None else None
+        reused = _lookup_similar(topic) if reuse_similar and research_data is None and not previous else None
+        changes = None
+        with _stage("research", stages):
+            if research_data is not None:
+                restored.append("research")
+                logger.info("Research restored from checkpoint")
+            elif previous:
+                research_data, changes = _refresh_research(researcher, topic, previous)
+            elif reused:
+                research_data = reused["research"]
+                save_json(research_data, f"research_{safe_filename(topic)}")
+            else:
+                research_data = researcher.run(topic)
+        search_cache = _search_cache(stages)
         
         hits_count = len(research_data.get("hits", []))
-        logger.info(f"Found {hits_count} search results")
+        logger.info(f"Found {hits_count} search results ({research_data.get('source', 'web')})")
         
         if hits_count == 0:
             logger.error("No search results found")
             raise Exception("No search results found")
+        if research_data.get("source") == "fallback":
+            # A report about placeholder hits is worthless; fail now so the
+            # topic can be retried once the search backend recovers
+            retry_in = get_guard("search").breaker.retry_in()
+            hint = f" (circuit open, retry in {retry_in:.0f}s)" if retry_in else ""
+            raise SearchUnavailable(f"Search backend unavailable{hint}; skipped analysis and writing")
+        if "research" not in restored:
+            checkpoint.save("research", research_data)
+        # The shared research_<topic>.json only feeds the local index and is
+        # overwritten by the next run on the topic; the run keeps its own copy
+        research_path = store.save_json(research_data, "research")
         
         # 2. Analysis Phase
         logger.info("=" * 50)
         logger.info("PHASE 2: ANALYSIS")
         logger.info("=" * 50)
         analyst = Analyst()
-        analysis = analyst.run(research_data)
+        analysis = checkpoint.load("analysis") if resume else None
+        with _stage("analysis", stages):
+            if analysis is not None:
+                restored.append("analysis")
+                logger.info("Analysis restored from checkpoint")
+            elif changes and not changes["material"]:
+                analysis = previous["analysis"]
+            elif reused and reused["analysis"]:
+                analysis = reused["analysis"]
+            else:
+                analysis = analyst.run(research_data)
         logger.info("Analysis completed")
+        if "analysis" not in restored:
+            checkpoint.save("analysis", analysis)
+            if reuse_similar and not reused:
+                _remember_topic(topic, research_data, analysis)
         
         # 3. Writing Phase (with potential retries)
         logger.info("=" * 50)
         logger.info("PHASE 3: WRITING")
         logger.info("=" * 50)
-        writer = Writer(author=author)
-        critic = Critic()
+        writer = Writer(author=author, store=store)
+        critic = Critic(tiered=tiered_critique, pass_above=critic_pass_above, store=store)
         
         full_data = {**research_data, "analysis": analysis.get("summary", "")}
         
-        markdown_text = None
-        critique_result = None
-        attempt = 0
-        
-        while attempt <= max_retries:
-            attempt += 1
-            logger.info(f"Writing attempt {attempt}/{max_retries + 1}...")
-            
-            # Write report
-            if attempt == 1:
-                # First attempt - normal write
-                markdown_text = writer.run(full_data, title=title)
-            else:
-                # Retry with feedback from previous critique
-                logger.info(f"Rewriting with feedback: {critique_result.get('feedback', '')[:100]}...")
-                # Add feedback to the data
-                full_data["previous_feedback"] = critique_result.get('feedback', '')
-                markdown_text = writer.run(full_data, title=title)
-            
-            if not markdown_text or len(markdown_text) < 100:
-                logger.warning("Writer produced minimal content")
-                if attempt > max_retries:
-                    break
-                continue
-            
-            logger.info(f"Report generated ({len(markdown_text)} chars)")
-            
-            # 4. Critique Phase
-            logger.info("=" * 50)
-            logger.info(f"PHASE 4: CRITIQUE (Attempt {attempt})")
-            logger.info("=" * 50)
-            
-            critique_result = critic.run(markdown_text)
-            
-            score = critique_result.get('score', 0)
-            passed = critique_result.get('passed', False)
-            feedback = critique_result.get('feedback', '')
-            
-            logger.info(f"Score: {score}/100")
-            logger.info(f"Feedback: {feedback[:150]}...")
-            
-            if passed:
-                logger.info("Report passed quality check")
-                break
-            else:
-                logger.warning(f"Score too low ({score} < {critic.get_threshold()})")
-                if attempt <= max_retries:
-                    logger.info("Retrying with improvements...")
-                else:
-                    logger.warning("Max retries reached, using last version")
+        report = checkpoint.load("report") if resume else None
+        sections = []
+        if report is not None:
+            restored.append("writing")
+            logger.info("Report restored from checkpoint")
+            markdown_text, critique_result, attempt = report["markdown"], report["critique"], report["attempt"]
+        elif changes and not changes["material"]:
+            logger.info("No new sources, keeping the previous report")
+            markdown_text, critique_result, attempt = previous["markdown"], previous["critique"], 0
+        elif changes:
+            sections = affected_sections(previous["markdown"], changes, topic)
+            logger.info(f"Rewriting sections affected by new sources: {', '.join(sections)}")
+            with _stage("writing", stages, attempt=1, sections=sections):
+                revised = writer.revise(previous["markdown"], refresh_feedback(changes), full_data,
+                                        title=title, sections=sections)
+            if revised:
+                # Critiqued (and rewritten if it fails) like any other draft
+                checkpoint.save_draft(1, revised)
+            markdown_text, critique_result, attempt = _write_sequential(
+                writer, critic, full_data, title, max_retries, on_token, stages, rewrite_mode,
+                checkpoint=checkpoint, resume=bool(revised))
+        elif speculative > 1:
+            markdown_text, critique_result, attempt = _write_speculative(
+                writer, critic, full_data, title, speculative, on_token, stages,
+                checkpoint=checkpoint, resume=resume)
+        else:
+            markdown_text, critique_result, attempt = _write_sequential(
+                writer, critic, full_data, title, max_retries, on_token, stages, rewrite_mode,
+                checkpoint=checkpoint, resume=resume)
+        if not markdown_text or critique_result is None:
+            raise Exception("Writer produced no usable report")
+        if "writing" not in restored:
+            checkpoint.save("report", {"markdown": markdown_text, "critique": critique_result, "attempt": attempt})
+        # Drafts and critiques are saved as they are made; with several drafts
+        # (or a rewrite that scored lower) the last one saved is not the kept one
+        store.save_text(markdown_text, "report.md")
+        store.save_json(critique_result, "critique")
         
         # 5. Export Phase
         logger.info("=" * 50)
         logger.info("PHASE 5: EXPORT")
         logger.info("=" * 50)
-        
-        # Simple HTML export without inline CSS
-        html_content = f"""
-<!DOCTYPE html>
-<html dir="rtl" lang="ar">
-<head>
-    <meta charset="UTF-8">
-    <meta name="viewport" content="width=device-width, initial-scale=1.0">
-    <title>{title or topic}</title>
-</head>
-<body>
-    <h1>{title or topic}</h1>
-    <p>Author: {author}</p>
-    <p>Score: {critique_result.get('score', 0)}/100</p>
-    <div>
-        {markdown.markdown(markdown_text, extensions=['extra', 'codehilite'])}
-    </div>
-</body>
-</html>
-"""
-        
-        html_path = "outputs/final_report.html"
-        with open(html_path, "w", encoding="utf-8") as f:
-            f.write(html_content)
-        
-        md_path = "outputs/final_report.md"
-        save_text(markdown_text, "final_report.md")
+        with _stage("export", stages):
+            exports = _export(markdown_text, critique_result, topic, title, author, store)
+        html_path, md_path = exports["html"], exports["md"]
         
         logger.info("=" * 50)
         logger.info("PIPELINE COMPLETED SUCCESSFULLY")
         logger.info("=" * 50)
+        llm_cache = _llm_cache(stages)
         logger.info(f"HTML Report: {html_path}")
         logger.info(f"Markdown: {md_path}")
         logger.info(f"Final Score: {critique_result.get('score', 0)}/100")
         logger.info(f"Attempts: {attempt}")
+        REGISTRY.inc("pipeline_runs_total", status="success")
+        summary = change_summary(previous, changes, sections) if changes else None
+        if summary:
+            store.save_json(summary, "changes")
+            logger.info(f"Changes: {len(summary['added'])} new sources, {len(summary['removed'])} dropped, "
+                        f"rewritten sections: {', '.join(sections) or 'none'}")
+        if refresh and not resume:
+            REGISTRY.inc("report_refresh_total", outcome="full" if not changes else
+                         "updated" if changes["material"] else "unchanged")
+        
+        finished_at = datetime.now().isoformat()
+        store.save_json({
+            "run_id": store.run_id,
+            "topic": topic,
+            "title": title or topic,
+            "author": author,
+            "started_at": started_at,
+            "research_path": research_path,
+            "writer_md_path": store.path("report.md"),
+            "critique_path": store.path("critique.json"),
+            "final_md_path": md_path,
+            "html_path": html_path,
+            "pdf_path": exports.get("pdf"),
+            "exports": exports,
+            "refreshed_from": summary["previous_run_id"] if summary else None,
+            "finished_at": finished_at
+        }, "run_meta")
+        _remember_run(topic, store.run_id, finished_at)
         
+        emit("finished", run_id=store.run_id, score=critique_result.get('score', 0),
+             passed=critique_result.get('passed', False))
         return {
             "success": True,
-            "research_path": f"outputs/research_{topic.replace(' ','_')}.json",
+            "run_id": store.run_id,
+            "run_dir": store.directory,
+            "research_path": research_path,
             "final_md_path": md_path,
-            "pdf_path": html_path,
+            "html_path": html_path,
+            "pdf_path": exports.get("pdf"),
+            "standalone_path": exports.get("standalone"),
             "score": critique_result.get('score', 0),
             "passed": critique_result.get('passed', False),
             "feedback": critique_result.get('feedback', ''),
+            "critique_tier": critique_result.get('tier'),
             "hits_count": hits_count,
-            "attempts": attempt
+            "research_source": research_data.get("source", "web"),
+            "reused_from": research_data.get("reused_from", []),
+            "attempts": attempt,
+            "search_cache": search_cache,
+            "llm_cache": llm_cache,
+            "timings": _timings(stages),
+            "stages": stages,
+            "speculative": speculative if speculative > 1 else 0,
+            "changes": summary,
+            "resumed": resume,
+            "restored_stages": restored
         }
         
     except Exception as e:
         logger.error(f"Pipeline failed: {e}", exc_info=True)
+        status = ("deadline" if isinstance(e, DeadlineExceeded) else
+                  "search_unavailable" if isinstance(e, SearchUnavailable) else "error")
+        REGISTRY.inc("pipeline_runs_total", status=status)
+        emit("failed", run_id=store.run_id, error=str(e))
         return {
             "success": False,
-            "error": str(e)
+            "run_id": store.run_id,
+            "error": str(e),
+            "retryable": isinstance(e, (DeadlineExceeded, SearchUnavailable)),
+            "timings": _timings(stages),
+            "stages": stages
         }
+    finally:
+        _deadline.reset(deadline_token)
+        reset_listener(listener)
+
+
+def resume_pipeline(run_id: str, on_token=None, on_event=None, deadline: float = None):
+    """
+    Continue a failed or interrupted run from its last checkpointed stage.
+
+    Research and analysis are taken from the run's checkpoints, writing
+    continues after the last draft / critique on disk, and a run that had
+    already finished writing only exports again.
+
+    Args:
+        run_id: ID of a run started by run_pipeline
+        on_token, on_event, deadline: As for run_pipeline
+
+    Returns:
+        Dictionary with pipeline results (see run_pipeline)
+    """
+    checkpoint = RunCheckpoint.for_run(run_id)
+    params = checkpoint.load("params") if checkpoint else None
+    if params is None:
+        raise ValueError(f"No checkpoints for run {run_id}")
+    return run_pipeline(**params, run_id=run_id, resume=True, on_token=on_token,
+                        on_event=on_event, deadline=deadline)
 
 
 if __name__ == "__main__":
+    warm_up_models()
+
     # Test run
     result = run_pipeline(
         topic="Artificial Intelligence",
@@ -190,7 +668,7 @@ if __name__ == "__main__":
         print("\n" + "=" * 60)
         print("PIPELINE COMPLETED SUCCESSFULLY")
         print("=" * 60)
-        print(f"Report: {result['pdf_path']}")
+        print(f"Report: {result['pdf_path'] or result['html_path']}")
         print(f"Score: {result['score']}/100")
         print(f"Quality: {'PASSED' if result['passed'] else 'ACCEPTABLE'}")
         print(f"Attempts: {result['attempts']}")
@@ -0,0 +1,303 @@
+# service.py
+# HTTP/JSON front-end for report generation, built on asyncio streams.
+#
+# Usage:
+#   python service.py --port 8080 --workers 4 --max-queued 20 --llm-concurrency 2
+#
+# Endpoints:
+#   POST /jobs               {"topic": ..., "title", "author", "max_retries", "speculative",
+#                             "rewrite_mode", "tiered_critique", "local_first", "reuse_similar",
+#                             "refresh", "critic_pass_above", "deadline": seconds}
+#                            -> 202 {"job_id": ...}, or 429 when the queue is full
+#   GET  /jobs               all known jobs (without results)
+#   GET  /jobs/<id>          status and progress
+#   GET  /jobs/<id>/result   200 with the pipeline result when finished, 202 while running
+#   GET  /jobs/<id>/stream   NDJSON: progress events and Writer output as it is
+#                            generated, ending with the result
+#   GET  /health             queue statistics
+#   GET  /metrics            Prometheus metrics
+#
+# Pipelines run on the shared job queue (jobs.py): --workers caps the
+# pipelines in flight, --max-queued the jobs waiting behind them, and the
+# process-wide "llm" limit caps simultaneous Ollama generations across all
+# of them. The event loop itself never runs pipeline code.
+
+import argparse
+import asyncio
+import json
+import logging
+import re
+from typing import Dict, Tuple
+
+from jobs import JobQueue, QueueFull, QUEUED, RUNNING
+from main import warm_up_models
+from utils.limits import set_limit
+from utils.metrics import REGISTRY
+
+logger = logging.getLogger(__name__)
+
+MAX_BODY_BYTES = 64 * 1024
+DEFAULT_DEADLINE = 600.0   # Seconds a job may take (waiting included) unless the request says otherwise
+MAX_DEADLINE = 3600.0
+STREAM_INTERVAL = 0.2      # Seconds between stream polls
+RETRY_AFTER = 5            # Seconds suggested to clients on 429
+MAX_SPECULATIVE = 5        # Parallel drafts one job may ask for
+
+# Request fields passed through to run_pipeline, with their types
+JOB_FIELDS = {
+    "title": str,
+    "author": str,
+    "max_retries": int,
+    "speculative": int,
+    "rewrite_mode": str,
+    "tiered_critique": bool,
+    "local_first": bool,
+    "reuse_similar": bool,
+    "refresh": bool,
+    "critic_pass_above": int,
+}
+
+REASONS = {200: "OK", 202: "Accepted", 400: "Bad Request", 404: "Not Found",
+           405: "Method Not Allowed", 413: "Payload Too Large", 429: "Too Many Requests",
+           500: "Internal Server Error"}
+
+REGISTRY.describe("service_requests_total", "HTTP requests by endpoint and status")
+
+
+class HttpError(Exception):
+    def __init__(self, status: int, message: str, headers: Dict = None):
+        super().__init__(message)
+        self.status = status
+        self.headers = headers or {}
+
+
+def parse_job(body: bytes, default_deadline: float = DEFAULT_DEADLINE) -> Tuple[str, Dict]:
+    """Validate a POST /jobs body; returns (topic, submit kwargs)"""
+    try:
+        data = json.loads(body or b"{}")
+    except ValueError:
+        raise HttpError(400, "Body must be JSON")
+    if not isinstance(data, dict):
+        raise HttpError(400, "Body must be a JSON object")
+
+    topic = data.get("topic")
+    if not isinstance(topic, str) or not topic.strip():
+        raise HttpError(400, "'topic' is required")
+
+    params = {}
+    for name, kind in JOB_FIELDS.items():
+        if data.get(name) is None:
+            continue
+        if not isinstance(data[name], kind) or (kind is int and isinstance(data[name], bool)):
+            raise HttpError(400, f"'{name}' must be {kind.__name__}")
+        params[name] = data[name]
+    if params.get("rewrite_mode", "full") not in ("full", "section"):
+        raise HttpError(400, "'rewrite_mode' must be 'full' or 'section'")
+    if not 0 <= params.get("speculative", 0) <= MAX_SPECULATIVE:
+        raise HttpError(400, f"'speculative' must be between 0 and {MAX_SPECULATIVE}")
+
+    deadline = data.get("deadline", default_deadline)
+    if not isinstance(deadline, (int, float)) or isinstance(deadline, bool) or deadline <= 0:
+        raise HttpError(400, "'deadline' must be a positive number of seconds")
+    params["deadline"] = min(float(deadline), MAX_DEADLINE)
+    return topic.strip(), params
+
+
+class ReportService:
+    def __init__(self, queue: JobQueue, default_deadline: float = DEFAULT_DEADLINE):
+        self.queue = queue
+        self.default_deadline = default_deadline
+
+    async def handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        """Serve one request per connection"""
+        endpoint, status = "unknown", 500
+        try:
+            method, path, body = await self._read_request(reader)
+            endpoint = re.sub(r"^/jobs/[^/]+", "/jobs/<id>", path)
+            status = await self._route(method, path, body, writer)
+        except HttpError as e:
+            status = e.status
+            await self._send_json(writer, e.status, {"error": str(e)}, e.headers)
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        except Exception as e:
+            logger.error(f"Request failed: {e}", exc_info=True)
+            await self._send_json(writer, 500, {"error": "Internal server error"})
+        finally:
+            REGISTRY.inc("service_requests_total", endpoint=endpoint, status=str(status))
+            try:
+                writer.close()
+                await writer.wait_closed()
+            except Exception:
+                pass
+
+    async def _read_request(self, reader: asyncio.StreamReader):
+        request_line = (await reader.readline()).decode("latin-1").strip()
+        parts = request_line.split()
+        if len(parts) != 3:
+            raise HttpError(400, "Malformed request line")
+        method, target, _ = parts
+
+        headers = {}
+        while True:
+            line = (await reader.readline()).decode("latin-1").strip()
+            if not line:
+                break
+            name, _, value = line.partition(":")
+            headers[name.strip().lower()] = value.strip()
+
+        try:
+            length = int(headers.get("content-length") or 0)
+        except ValueError:
+            raise HttpError(400, "Invalid Content-Length")
+        if length > MAX_BODY_BYTES:
+            raise HttpError(413, "Request body too large")
+        body = await reader.readexactly(length) if length else b""
+        return method.upper(), target.split("?", 1)[0].rstrip("/") or "/", body
+
+    async def _route(self, method: str, path: str, body: bytes, writer: asyncio.StreamWriter) -> int:
+        if path == "/health":
+            return await self._send_json(writer, 200, {"status": "ok", **self.queue.stats()})
+        if path == "/metrics":
+            return await self._send(writer, 200, REGISTRY.to_prometheus().encode("utf-8"),
+                                    "text/plain; version=0.0.4")
+        if path == "/jobs":
+            if method == "POST":
+                return await self._submit(body, writer)
+            if method == "GET":
+                return await self._send_json(writer, 200, {"jobs": self.queue.list_jobs()})
+            raise HttpError(405, "Use GET or POST")
+
+        match = re.fullmatch(r"/jobs/([\w\-]+)(/result|/stream)?", path)
+        if not match:
+            raise HttpError(404, "Not found")
+        if method != "GET":
+            raise HttpError(405, "Use GET")
+        job_id, action = match.groups()
+        job = self.queue.snapshot(job_id, with_partial=False)
+        if job is None:
+            raise HttpError(404, f"Unknown job {job_id}")
+
+        if action == "/stream":
+            return await self._stream(job_id, writer)
+        if action == "/result":
+            if job["status"] in (QUEUED, RUNNING):
+                return await self._send_json(writer, 202, _public(job, with_result=False))
+            return await self._send_json(writer, 200, _public(job, with_result=True))
+        return await self._send_json(writer, 200, _public(job, with_result=False))
+
+    async def _submit(self, body: bytes, writer: asyncio.StreamWriter) -> int:
+        topic, params = parse_job(body, self.default_deadline)
+        try:
+            job_id = self.queue.submit(topic, **params)
+        except QueueFull as e:
+            raise HttpError(429, f"Queue full ({e}), retry later", {"Retry-After": str(RETRY_AFTER)})
+        return await self._send_json(writer, 202, {
+            "job_id": job_id,
+            "status": QUEUED,
+            "status_url": f"/jobs/{job_id}",
+            "result_url": f"/jobs/{job_id}/result",
+            "stream_url": f"/jobs/{job_id}/stream",
+        })
+
+    async def _stream(self, job_id: str, writer: asyncio.StreamWriter) -> int:
+        """Send events and Writer output as NDJSON chunks until the job finishes"""
+        writer.write(_head(200, "application/x-ndjson", {"Transfer-Encoding": "chunked"}))
+        seen_events, sent_chars, attempt = 0, 0, None
+
+        while True:
+            job = self.queue.snapshot(job_id)
+            if job is None:
+                # Evicted from the queue's history while streaming
+                writer.write(_chunk([{"type": "error", "error": "Job no longer available"}]))
+                break
+            events = self.queue.events(job_id, since=seen_events)
+            seen_events += len(events)
+            lines = [{"type": "event", "event": event} for event in events]
+
+            if job["partial_attempt"] != attempt:
+                attempt, sent_chars = job["partial_attempt"], 0
+            if len(job["partial"]) > sent_chars:
+                lines.append({"type": "partial", "attempt": attempt, "text": job["partial"][sent_chars:]})
+                sent_chars = len(job["partial"])
+
+            finished = job["status"] not in (QUEUED, RUNNING)
+            if finished:
+                lines.append({"type": "result", **_public(job, with_result=True)})
+            if lines:
+                writer.write(_chunk(lines))
+                await writer.drain()
+            if finished:
+                break
+            await asyncio.sleep(STREAM_INTERVAL)
+
+        writer.write(b"0\r\n\r\n")
+        await writer.drain()
+        return 200
+
+    async def _send_json(self, writer, status: int, payload: Dict, headers: Dict = None) -> int:
+        body = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+        return await self._send(writer, status, body, "application/json", headers)
+
+    async def _send(self, writer, status: int, body: bytes, content_type: str, headers: Dict = None) -> int:
+        writer.write(_head(status, content_type, {"Content-Length": str(len(body)), **(headers or {})}) + body)
+        await writer.drain()
+        return status
+
+
+def _head(status: int, content_type: str, headers: Dict) -> bytes:
+    lines = [f"HTTP/1.1 {status} {REASONS.get(status, '')}", f"Content-Type: {content_type}",
+             "Connection: close"]
+    lines += [f"{k}: {v}" for k, v in headers.items()]
+    return ("\r\n".join(lines) + "\r\n\r\n").encode("latin-1")
+
+
+def _chunk(lines) -> bytes:
+    """NDJSON lines as one chunk of a chunked response"""
+    data = "".join(json.dumps(line, ensure_ascii=False) + "\n" for line in lines).encode("utf-8")
+    return b"%x\r\n%s\r\n" % (len(data), data)
+
+
+def _public(job: Dict, with_result: bool) -> Dict:
+    """Job snapshot as returned to clients"""
+    fields = {k: v for k, v in job.items() if k not in ("partial", "partial_attempt", "result", "events")}
+    if with_result:
+        fields["result"] = job["result"]
+    return fields
+
+
+async def serve(host: str, port: int, service: ReportService):
+    server = await asyncio.start_server(service.handle, host, port)
+    logger.info(f"Report service listening on http://{host}:{port}")
+    async with server:
+        await server.serve_forever()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="HTTP service for report generation")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--workers", type=int, default=2, help="Pipelines running at the same time")
+    parser.add_argument("--max-queued", type=int, default=10, help="Jobs waiting for a worker before 429")
+    parser.add_argument("--llm-concurrency", type=int, default=1, help="Simultaneous model generations")
+    parser.add_argument("--search-concurrency", type=int, default=4, help="Simultaneous search requests")
+    parser.add_argument("--deadline", type=float, default=DEFAULT_DEADLINE, help="Default per-job deadline (s)")
+    parser.add_argument("--no-warmup", action="store_true", help="Skip pre-loading the models at startup")
+    args = parser.parse_args()
+
+    set_limit("llm", args.llm_concurrency)
+    set_limit("search", args.search_concurrency)
+    if not args.no_warmup:
+        warm_up_models()
+
+    queue = JobQueue(args.workers, max_queued=args.max_queued)
+    try:
+        asyncio.run(serve(args.host, args.port, ReportService(queue, args.deadline)))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        queue.shutdown(wait=False)
+
+
+if __name__ == "__main__":
+    main()
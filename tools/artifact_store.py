@@ -0,0 +1,81 @@
+# tools/artifact_store.py
+# Per-run artifact storage so pipelines can run side by side.
+# - Every run gets a unique run ID and its own folder: outputs/runs/<run_id>/
+# - All writes go through file_tool's atomic write-rename
+# - safe_filename() turns any topic (Arabic, punctuation, very long) into a
+#   collision-safe file name, and leaves plain names unchanged so existing
+#   outputs/research_<topic>.json files keep their names
+# ArtifactStore(OUTPUT_DIR) is the shared outputs/ folder used when an agent
+# is not given a run store.
+
+import hashlib
+import os
+import re
+import unicodedata
+import uuid
+from datetime import datetime
+
+from tools.file_tool import OUTPUT_DIR, save_bytes, save_json, save_text, load_json, load_text
+
+RUNS_DIR = os.path.join(OUTPUT_DIR, "runs")
+MAX_NAME_LENGTH = 80
+
+
+def new_run_id() -> str:
+    """Sortable, unique run ID: <timestamp>-<random>"""
+    return f"{datetime.now().strftime('%Y%m%d-%H%M%S')}-{uuid.uuid4().hex[:8]}"
+
+
+def safe_filename(name: str, max_length: int = MAX_NAME_LENGTH) -> str:
+    """
+    Make a file-system-safe name from arbitrary text.
+
+    Letters and digits of any script are kept, everything else becomes '_'.
+    If anything had to change (besides spaces) or the name was truncated,
+    a short hash of the original is appended so different topics never
+    map to the same file.
+    """
+    normalized = unicodedata.normalize("NFKC", name or "").strip()
+    cleaned = re.sub(r"[^\w\-]+", "_", normalized).strip("_.")
+    if cleaned and cleaned == (name or "").replace(" ", "_") and len(cleaned) <= max_length:
+        return cleaned
+
+    digest = hashlib.sha1((name or "").encode("utf-8")).hexdigest()[:8]
+    return f"{cleaned[:max_length]}_{digest}" if cleaned else digest
+
+
+class ArtifactStore:
+    """Saves and loads files inside one folder"""
+
+    def __init__(self, directory: str = OUTPUT_DIR):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+
+    def path(self, filename: str) -> str:
+        return os.path.join(self.directory, filename)
+
+    def save_json(self, data: dict, filename: str):
+        return save_json(data, filename, directory=self.directory)
+
+    def save_text(self, text: str, filename: str):
+        return save_text(text, filename, directory=self.directory)
+
+    def save_bytes(self, data: bytes, filename: str):
+        return save_bytes(data, filename, directory=self.directory)
+
+    def load_json(self, filename: str):
+        return load_json(filename, directory=self.directory)
+
+    def load_text(self, filename: str):
+        return load_text(filename, directory=self.directory)
+
+
+class RunStore(ArtifactStore):
+    """Artifacts of a single pipeline run, in outputs/runs/<run_id>/"""
+
+    def __init__(self, run_id: str = None, base_dir: str = RUNS_DIR):
+        self.run_id = run_id or new_run_id()
+        super().__init__(os.path.join(base_dir, safe_filename(self.run_id)))
+
+
+SHARED_STORE = ArtifactStore(OUTPUT_DIR)
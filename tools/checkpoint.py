@@ -0,0 +1,79 @@
+# tools/checkpoint.py
+# Durable per-stage checkpoints of a pipeline run, so a crashed or killed
+# run can continue where it stopped instead of paying for research,
+# analysis and earlier drafts again (see main.resume_pipeline).
+# Checkpoints live next to the run's artifacts in
+# outputs/runs/<run_id>/checkpoints/ and are written atomically:
+# - params.json          arguments the run was started with
+# - research.json        Researcher output
+# - analysis.json        Analyst output
+# - draft_<n>.json       Writer output of attempt n
+# - critique_<n>.json    Critic result for attempt n
+# - draft_<n>_<i>.json / critique_<n>_<i>.json
+#                        the same for draft i of a speculative attempt n
+# - report.json          chosen report and critique once writing is finished
+
+import os
+import re
+from datetime import datetime
+from typing import Dict, Optional, Tuple
+
+from tools.artifact_store import ArtifactStore, RunStore, RUNS_DIR, safe_filename
+
+
+class RunCheckpoint:
+    def __init__(self, store: ArtifactStore):
+        self.store = ArtifactStore(store.path("checkpoints"))
+
+    @classmethod
+    def for_run(cls, run_id: str, base_dir: str = RUNS_DIR) -> Optional["RunCheckpoint"]:
+        """Checkpoints of an existing run, or None if the run has none"""
+        if not os.path.isfile(os.path.join(base_dir, safe_filename(run_id), "checkpoints", "params.json")):
+            return None
+        return cls(RunStore(run_id, base_dir))
+
+    def save(self, name: str, data: Dict):
+        self.store.save_json({**data, "saved_at": datetime.now().isoformat()}, name)
+
+    def load(self, name: str) -> Optional[Dict]:
+        if not os.path.exists(self.store.path(f"{name}.json")):
+            return None
+        data = self.store.load_json(name)
+        if data is not None:
+            data.pop("saved_at", None)
+        return data
+
+    @staticmethod
+    def _suffix(attempt: int, draft: Optional[int]) -> str:
+        return f"{attempt}_{draft}" if draft is not None else str(attempt)
+
+    def save_draft(self, attempt: int, markdown_text: str, draft: int = None):
+        self.save(f"draft_{self._suffix(attempt, draft)}", {"attempt": attempt, "markdown": markdown_text})
+
+    def save_critique(self, attempt: int, critique_result: Dict, draft: int = None):
+        self.save(f"critique_{self._suffix(attempt, draft)}", {"attempt": attempt, "critique": critique_result})
+
+    def load_draft(self, attempt: int, draft: int = None) -> Optional[str]:
+        data = self.load(f"draft_{self._suffix(attempt, draft)}")
+        return data.get("markdown") if data else None
+
+    def load_critique(self, attempt: int, draft: int = None) -> Optional[Dict]:
+        data = self.load(f"critique_{self._suffix(attempt, draft)}")
+        return data.get("critique") if data else None
+
+    def last_attempt(self) -> Optional[Tuple[int, str, Optional[Dict]]]:
+        """
+        Latest writing attempt on disk.
+
+        Returns:
+            (attempt, markdown, critique) where critique is None if the run
+            stopped before that draft was critiqued, or None if no draft exists
+        """
+        attempts = [int(m.group(1)) for name in os.listdir(self.store.directory)
+                    for m in [re.fullmatch(r"draft_(\d+)\.json", name)] if m]
+        if not attempts:
+            return None
+        attempt = max(attempts)
+        draft = self.load(f"draft_{attempt}") or {}
+        critique = self.load(f"critique_{attempt}")
+        return attempt, draft.get("markdown"), critique.get("critique") if critique else None
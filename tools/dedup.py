@@ -0,0 +1,129 @@
+# tools/dedup.py
+# Near-duplicate elimination for search hits.
+# DuckDuckGo often returns the same page under different URLs (redirect
+# wrappers, tracking parameters, mobile hosts) or several pages with almost
+# identical snippets (mirrors, vendor copies of one article). Each duplicate
+# would cost prompt tokens without adding information.
+# - canonical_url(): one form per page (uddg= unwrapped, no tracking params)
+# - simhash(): 64-bit fingerprint of the text's words; fingerprints that
+#   differ in only a few bits belong to near-identical texts (single words
+#   work better than longer shingles on snippet-sized texts: one changed
+#   word already costs 2-grams ~0.83 similarity). With single words, distinct
+#   pages of one site that share most of their vocabulary reach ~0.86, so
+#   the threshold is 0.9 (checked by run_benchmarks --dedup-only)
+# - dedupe_hits(): keeps the best-ranked hit of each group and backfills
+#   from the lower-ranked candidates up to max_results
+
+import hashlib
+import logging
+import os
+import re
+from typing import Dict, List, Sequence
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+from tools.fetch_tool import resolve_url
+from utils.metrics import REGISTRY
+
+logger = logging.getLogger(__name__)
+
+SIMHASH_BITS = 64
+SHINGLE_SIZE = 1
+DEDUP_THRESHOLD = float(os.getenv("SEARCH_DEDUP_THRESHOLD", 0.9))  # Fingerprint similarity counted as duplicate
+MIN_WORDS = 8  # Shorter texts are compared by canonical URL only
+
+TRACKING_PARAMS = re.compile(r"^(utm_\w+|fbclid|gclid|msclkid|mc_cid|mc_eid|ref|ref_src|source|spm)$", re.IGNORECASE)
+
+REGISTRY.describe("search_duplicates_total", "Search hits dropped as duplicates (by URL or near-identical text)")
+
+
+def canonical_url(url: str) -> str:
+    """
+    Normalize a URL so different links to the same page compare equal.
+
+    Unwraps DuckDuckGo redirects, ignores scheme, "www."/"m." prefixes,
+    default ports, fragments, trailing slashes and tracking parameters,
+    and sorts the remaining query parameters.
+    """
+    url = resolve_url((url or "").strip())
+    if not url:
+        return ""
+    parts = urlsplit(url if "//" in url else "//" + url)
+    host = (parts.hostname or "").lower()
+    for prefix in ("www.", "m."):
+        if host.startswith(prefix):
+            host = host[len(prefix):]
+    if parts.port and parts.port not in (80, 443):
+        host = f"{host}:{parts.port}"
+    path = re.sub(r"/+", "/", parts.path or "/")
+    if len(path) > 1:
+        path = path.rstrip("/")
+    query = urlencode(sorted((k, v) for k, v in parse_qsl(parts.query, keep_blank_values=True)
+                             if not TRACKING_PARAMS.match(k)))
+    return urlunsplit(("", host, path, query, "")).lstrip("/")
+
+
+def simhash(text: str, bits: int = SIMHASH_BITS) -> int:
+    """SimHash fingerprint of the word shingles of text"""
+    words = re.findall(r"\w+", (text or "").lower())
+    if not words:
+        return 0
+    shingles = [" ".join(words[i:i + SHINGLE_SIZE]) for i in range(max(1, len(words) - SHINGLE_SIZE + 1))]
+    weights = [0] * bits
+    for shingle in shingles:
+        h = int.from_bytes(hashlib.blake2b(shingle.encode("utf-8"), digest_size=bits // 8).digest(), "big")
+        for b in range(bits):
+            weights[b] += 1 if (h >> b) & 1 else -1
+    return sum(1 << b for b in range(bits) if weights[b] > 0)
+
+
+def similarity(a: int, b: int, bits: int = SIMHASH_BITS) -> float:
+    """Share of equal bits between two fingerprints (1.0 = identical)"""
+    return 1.0 - bin(a ^ b).count("1") / bits
+
+
+def _hit_text(hit: Dict, fields: Sequence[str]) -> str:
+    return " ".join(hit.get(field) or "" for field in fields)
+
+
+def dedupe_hits(hits: List[Dict], max_results: int, threshold: float = DEDUP_THRESHOLD,
+                fields: Sequence[str] = ("title", "snippet")) -> List[Dict]:
+    """
+    Drop duplicate hits, keeping rank order.
+
+    Args:
+        hits: Ranked candidates (more than max_results, so drops can be backfilled)
+        max_results: Hits to return
+        threshold: SimHash similarity at or above which two texts are duplicates
+        fields: Hit fields whose text is compared
+
+    Returns:
+        Up to max_results hits; each keeps its resolved (unwrapped) url
+    """
+    kept, seen_urls, fingerprints = [], set(), []
+    dropped = 0
+    for hit in hits:
+        key = canonical_url(hit.get("url")) or hit.get("title")
+        if key in seen_urls:
+            dropped += 1
+            continue
+
+        text = _hit_text(hit, fields)
+        fingerprint = simhash(text) if len(text.split()) >= MIN_WORDS else None
+        if fingerprint is not None and any(similarity(fingerprint, f) >= threshold for f in fingerprints):
+            dropped += 1
+            logger.debug(f" Near-duplicate dropped: {hit.get('url')}")
+            continue
+
+        seen_urls.add(key)
+        if fingerprint is not None:
+            fingerprints.append(fingerprint)
+        if hit.get("url"):
+            hit["url"] = resolve_url(hit["url"])
+        kept.append(hit)
+        if len(kept) >= max_results:
+            break
+
+    if dropped:
+        REGISTRY.inc("search_duplicates_total", dropped)
+        logger.info(f" Dropped {dropped} duplicate search results")
+    return kept
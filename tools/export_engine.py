@@ -0,0 +1,226 @@
+# tools/export_engine.py
+# One export path for every report format.
+# - The Markdown is parsed once per distinct text: converters are reused per
+#   thread (building a Markdown instance with its extensions is a large part
+#   of a conversion), and rendered HTML is kept in an in-memory cache keyed
+#   by a hash of the text
+# - All requested formats are then written concurrently from that one render:
+#   "html" (report page), "md" (the Markdown itself), "standalone" (one HTML
+#   file with CSS and local images embedded) and "pdf" (tools/pdf_tool.py,
+#   pure Python; skipped for text its Latin-only fonts cannot print)
+# EXPORT_FORMATS sets the formats run_pipeline writes (default: all four).
+
+import base64
+import hashlib
+import html as html_lib
+import logging
+import mimetypes
+import os
+import re
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Sequence
+
+import markdown
+
+from tools.pdf_tool import can_render, html_to_pdf
+
+logger = logging.getLogger(__name__)
+
+EXTENSIONS = ["extra", "codehilite"]
+FORMATS = ("html", "md", "standalone", "pdf")
+EXPORT_FORMATS = tuple(f.strip() for f in os.getenv("EXPORT_FORMATS", ",".join(FORMATS)).split(",") if f.strip())
+FILENAMES = {
+    "html": "final_report.html",
+    "md": "final_report.md",
+    "standalone": "final_report.standalone.html",
+    "pdf": "final_report.pdf",
+}
+RENDER_CACHE_SIZE = 256
+MAX_EMBED_BYTES = 2 * 1024 * 1024  # Larger local images stay linked
+
+STANDALONE_CSS = """
+body { font-family: -apple-system, "Segoe UI", Roboto, Arial, sans-serif; max-width: 860px;
+       margin: 2rem auto; padding: 0 1rem; line-height: 1.6; color: #222; }
+h1, h2, h3 { line-height: 1.25; }
+h2 { border-bottom: 1px solid #ddd; padding-bottom: .3rem; }
+pre, code { font-family: Consolas, Menlo, monospace; font-size: .92em; }
+pre { background: #f6f8fa; padding: .8rem; overflow-x: auto; }
+table { border-collapse: collapse; }
+th, td { border: 1px solid #ccc; padding: .3rem .6rem; }
+blockquote { border-left: 4px solid #ddd; margin-left: 0; padding-left: 1rem; color: #555; }
+img { max-width: 100%; }
+.meta { color: #666; }
+"""
+
+_local = threading.local()
+_cache: "OrderedDict[str, str]" = OrderedDict()
+_cache_lock = threading.Lock()
+_stats = {"hits": 0, "misses": 0}
+_executor = ThreadPoolExecutor(max_workers=4, thread_name_prefix="export")
+_code_css = None
+
+
+def _converter() -> markdown.Markdown:
+    """This thread's Markdown instance (created on first use)"""
+    md = getattr(_local, "md", None)
+    if md is None:
+        md = _local.md = markdown.Markdown(extensions=EXTENSIONS)
+    return md
+
+
+def render_html(markdown_text: str) -> str:
+    """HTML fragment for Markdown text, from the render cache when possible"""
+    key = hashlib.sha256(markdown_text.encode("utf-8")).hexdigest()
+    with _cache_lock:
+        cached = _cache.get(key)
+        if cached is not None:
+            _cache.move_to_end(key)
+            _stats["hits"] += 1
+            return cached
+        _stats["misses"] += 1
+
+    md = _converter()
+    try:
+        rendered = md.convert(markdown_text)
+    finally:
+        md.reset()
+
+    with _cache_lock:
+        _cache[key] = rendered
+        while len(_cache) > RENDER_CACHE_SIZE:
+            _cache.popitem(last=False)
+    return rendered
+
+
+def get_render_stats() -> Dict:
+    with _cache_lock:
+        return {**_stats, "entries": len(_cache)}
+
+
+def report_page(body: str, title: str, author: str, score, head: str = "") -> str:
+    """Full HTML page around a rendered report"""
+    title = html_lib.escape(title)
+    return f"""
+<!DOCTYPE html>
+<html dir="rtl" lang="ar">
+<head>
+    <meta charset="UTF-8">
+    <meta name="viewport" content="width=device-width, initial-scale=1.0">
+    <title>{title}</title>{head}
+</head>
+<body>
+    <h1>{title}</h1>
+    <p class="meta">Author: {html_lib.escape(author)}</p>
+    <p class="meta">Score: {score}/100</p>
+    <div>
+        {body}
+    </div>
+</body>
+</html>
+"""
+
+
+def _code_styles() -> str:
+    global _code_css
+    if _code_css is None:
+        try:
+            from pygments.formatters import HtmlFormatter
+            _code_css = HtmlFormatter().get_style_defs(".codehilite")
+        except Exception:
+            _code_css = ""
+    return _code_css
+
+
+def _local_image(src: str, base_dir: str):
+    """
+    (path, mime type) of an image under base_dir, or None.
+
+    The report text comes from a model that read scraped pages, so a source
+    must not reach outside base_dir (absolute paths, "..", symlinks) and
+    must be an image.
+    """
+    if not src or os.path.isabs(src) or re.match(r"^[a-zA-Z]:|^[\\/]", src):
+        return None
+    if ".." in re.split(r"[\\/]", src):
+        return None
+    root = os.path.realpath(base_dir)
+    path = os.path.realpath(os.path.join(root, src))
+    if os.path.commonpath([root, path]) != root:
+        return None
+    mime = mimetypes.guess_type(path)[0]
+    if not mime or not mime.startswith("image/"):
+        return None
+    return path, mime
+
+
+def _embed_images(body: str, base_dir: str) -> str:
+    """Inline local <img> sources (images under base_dir only) as data: URIs"""
+    def embed(match):
+        src = html_lib.unescape(match.group(2))
+        if re.match(r"^(https?:|data:|//)", src):
+            return match.group(0)
+        image = _local_image(src, base_dir)
+        if image is None:
+            logger.warning(f" Not embedding image outside the report folder or not an image: {src}")
+            return match.group(0)
+        path, mime = image
+        try:
+            if os.path.getsize(path) > MAX_EMBED_BYTES:
+                return match.group(0)
+            with open(path, "rb") as f:
+                data = base64.b64encode(f.read()).decode("ascii")
+        except OSError:
+            return match.group(0)
+        return f'{match.group(1)}data:{mime};base64,{data}{match.group(3)}'
+
+    return re.sub(r'(<img\b[^>]*?\ssrc=")([^"]+)(")', embed, body)
+
+
+def standalone_page(body: str, title: str, author: str, score, base_dir: str = ".") -> str:
+    """Self-contained page: styles inline, local images embedded"""
+    head = f"\n    <style>{STANDALONE_CSS}{_code_styles()}</style>"
+    return report_page(_embed_images(body, base_dir), title, author, score, head)
+
+
+def export_report(markdown_text: str, store, title: str, author: str = "AutoAgent", score=0,
+                  formats: Sequence[str] = None, base_dir: str = ".") -> Dict[str, str]:
+    """
+    Write a report in several formats from one Markdown render.
+
+    Args:
+        markdown_text: Final report
+        store: ArtifactStore to write into
+        title: Page / document title
+        formats: Any of FORMATS (default EXPORT_FORMATS)
+        base_dir: Folder relative image paths are resolved against
+
+    Returns:
+        {format: path} of the files written (failed formats are logged and
+        left out, as is "pdf" when the report has characters it cannot print)
+    """
+    formats = [f for f in (formats or EXPORT_FORMATS) if f in FORMATS]
+    if "pdf" in formats and not (can_render(markdown_text) and can_render(title)):
+        logger.info(" Skipping PDF export: the report has characters the PDF fonts cannot print")
+        formats.remove("pdf")
+    body = render_html(markdown_text)
+
+    writers = {
+        "html": lambda: store.save_text(report_page(body, title, author, score), FILENAMES["html"]),
+        "md": lambda: store.save_text(markdown_text, FILENAMES["md"]),
+        "standalone": lambda: store.save_text(standalone_page(body, title, author, score, base_dir),
+                                              FILENAMES["standalone"]),
+        "pdf": lambda: store.save_bytes(html_to_pdf(body, title), FILENAMES["pdf"]),
+    }
+    futures = {fmt: _executor.submit(writers[fmt]) for fmt in formats}
+    paths = {}
+    for fmt, future in futures.items():
+        try:
+            path = future.result()
+        except Exception as e:
+            logger.error(f" {fmt} export failed: {e}")
+            continue
+        if path:
+            paths[fmt] = path
+    return paths
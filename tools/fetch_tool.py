@@ -0,0 +1,164 @@
+# tools/fetch_tool.py
+# Downloads the pages behind search results to build richer summaries:
+# - Resolves DuckDuckGo redirect links (duckduckgo.com/l/?uddg=...)
+# - Fetches pages concurrently over a shared keep-alive connection pool
+# - Reads only the first few KB of each page (streamed)
+# - Extracts the lead paragraphs into hit["content"]
+# Per-host concurrency is capped and the whole stage has a time budget,
+# so a slow page can never hold the pipeline longer than the budget.
+import asyncio
+import concurrent.futures
+import logging
+import threading
+import time
+from typing import List, Dict
+from urllib.parse import urlsplit, parse_qs
+
+import requests
+from requests.adapters import HTTPAdapter
+
+logger = logging.getLogger(__name__)
+
+MAX_BYTES = 64 * 1024      # Read at most this much of each page
+MAX_PARAGRAPHS = 3         # Lead paragraphs kept per page
+MIN_PARAGRAPH_CHARS = 40   # Shorter <p> blocks are navigation/boilerplate
+MAX_CONTENT_CHARS = 800
+PER_HOST_LIMIT = 2         # Simultaneous requests to the same host
+MAX_WORKERS = 8            # Total simultaneous page downloads
+TIME_BUDGET = 4.0          # Seconds for the whole fetch stage
+
+HEADERS = {
+    'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36',
+    'Accept': 'text/html,application/xhtml+xml',
+}
+
+_session = None
+_session_lock = threading.Lock()
+
+# Dedicated pool: threads left running after the budget expires must not
+# block asyncio.run() from returning (the default executor would).
+_executor = concurrent.futures.ThreadPoolExecutor(max_workers=MAX_WORKERS, thread_name_prefix="fetch")
+
+
+def get_session() -> requests.Session:
+    """Return the shared keep-alive session (created on first use)"""
+    global _session
+    with _session_lock:
+        if _session is None:
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=MAX_WORKERS, pool_maxsize=MAX_WORKERS)
+            session.mount("http://", adapter)
+            session.mount("https://", adapter)
+            session.headers.update(HEADERS)
+            _session = session
+        return _session
+
+
+def resolve_url(url: str) -> str:
+    """Unwrap DuckDuckGo redirect links to the real target URL"""
+    if not url:
+        return url
+    if "uddg=" in url:
+        target = parse_qs(urlsplit(url).query).get("uddg")
+        if target:
+            return target[0]
+    if url.startswith("//"):
+        return "https:" + url
+    return url
+
+
+def extract_lead(html: str, max_paragraphs: int = MAX_PARAGRAPHS) -> str:
+    """Extract the first meaningful paragraphs from (possibly truncated) HTML"""
+    from bs4 import BeautifulSoup
+    soup = BeautifulSoup(html, 'html.parser')
+    for tag in soup(["script", "style", "nav", "header", "footer", "aside"]):
+        tag.decompose()
+
+    paragraphs = []
+    for p in soup.find_all('p'):
+        text = " ".join(p.get_text(" ", strip=True).split())
+        if len(text) >= MIN_PARAGRAPH_CHARS:
+            paragraphs.append(text)
+        if len(paragraphs) >= max_paragraphs:
+            break
+    return "\n".join(paragraphs)[:MAX_CONTENT_CHARS]
+
+
+def _fetch_page(url: str, deadline: float, max_bytes: int = MAX_BYTES) -> str:
+    """Stream the head of one page and return its lead paragraphs"""
+    remaining = deadline - time.monotonic()
+    if remaining <= 0:
+        return ""
+
+    session = get_session()
+    with session.get(url, timeout=(min(3.0, remaining), remaining), stream=True) as response:
+        response.raise_for_status()
+        content_type = response.headers.get('Content-Type', '')
+        if content_type and 'html' not in content_type:
+            return ""
+
+        chunks = []
+        size = 0
+        for chunk in response.iter_content(chunk_size=8192):
+            chunks.append(chunk)
+            size += len(chunk)
+            if size >= max_bytes or time.monotonic() > deadline:
+                break
+
+        encoding = response.encoding or 'utf-8'
+        html = b"".join(chunks)[:max_bytes].decode(encoding, errors='replace')
+
+    return extract_lead(html)
+
+
+async def fetch_pages_async(hits: List[Dict], time_budget: float = TIME_BUDGET,
+                            per_host: int = PER_HOST_LIMIT,
+                            max_bytes: int = MAX_BYTES) -> List[Dict]:
+    """
+    Resolve and download the pages behind search hits concurrently.
+
+    Args:
+        hits: Search results ({title, url, snippet})
+        time_budget: Seconds allowed for the whole stage
+        per_host: Maximum simultaneous requests per host
+        max_bytes: Bytes read from each page
+
+    Returns:
+        The same hits, with resolved urls and a "content" field where a
+        page could be fetched within the budget
+    """
+    loop = asyncio.get_running_loop()
+    deadline = time.monotonic() + time_budget
+    host_limits = {}
+
+    for hit in hits:
+        hit['url'] = resolve_url(hit.get('url', ''))
+
+    async def fetch_one(hit: Dict):
+        host = urlsplit(hit['url']).netloc
+        semaphore = host_limits.setdefault(host, asyncio.Semaphore(max(1, per_host)))
+        async with semaphore:
+            try:
+                content = await loop.run_in_executor(_executor, _fetch_page, hit['url'], deadline, max_bytes)
+            except Exception as e:
+                logger.debug(f"Page fetch failed for {hit['url']}: {e}")
+                return
+            if content:
+                hit['content'] = content
+
+    tasks = [asyncio.ensure_future(fetch_one(h)) for h in hits if h.get('url', '').startswith('http')]
+    if not tasks:
+        return hits
+
+    done, pending = await asyncio.wait(tasks, timeout=time_budget)
+    for task in pending:
+        task.cancel()
+
+    logger.info(f" Fetched content for {sum(1 for h in hits if h.get('content'))}/{len(hits)} pages "
+                f"({len(pending)} timed out)")
+    return hits
+
+
+def fetch_pages(hits: List[Dict], **kwargs) -> List[Dict]:
+    """Synchronous wrapper around fetch_pages_async"""
+    return asyncio.run(fetch_pages_async(hits, **kwargs))
@@ -1,52 +1,96 @@
 # tools/file_tool.py
 # Creates an outputs/ folder if it doesn’t exist
 # Saves JSON files
-# Saves text / Markdown files
+# Saves text / Markdown files (and binary files such as PDFs)
 # It’s simply a file-saving utility for the whole project.
+# Writes are atomic (temp file + rename), so readers never see a half-written
+# file and concurrent writers of the same file cannot interleave.
+# Research files (research_*.json) are also added to the local search index
+# (tools/local_index.py).
 # tools/file_tool.py
 import json
 import os
+import tempfile
 from pathlib import Path
 
 # Ensure outputs directory exists
 OUTPUT_DIR = "outputs"
 os.makedirs(OUTPUT_DIR, exist_ok=True)
 
-def save_json(data: dict, filename: str):
+def atomic_write(filepath: str, text):
+    """Write text (or bytes) to a temp file in the same folder, then rename it into place"""
+    directory = os.path.dirname(filepath) or "."
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".tmp-", suffix=os.path.basename(filepath))
+    try:
+        if isinstance(text, bytes):
+            with os.fdopen(fd, 'wb') as f:
+                f.write(text)
+        else:
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                f.write(text)
+        os.replace(tmp_path, filepath)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+def save_json(data: dict, filename: str, directory: str = OUTPUT_DIR):
     """Save dictionary to JSON file"""
     if not filename.endswith('.json'):
         filename += '.json'
     
-    filepath = os.path.join(OUTPUT_DIR, filename)
+    filepath = os.path.join(directory, filename)
     
     try:
-        with open(filepath, 'w', encoding='utf-8') as f:
-            json.dump(data, f, ensure_ascii=False, indent=2)
+        atomic_write(filepath, json.dumps(data, ensure_ascii=False, indent=2))
         print(f" Saved JSON: {filepath}")
-        return filepath
     except Exception as e:
         print(f" Error saving JSON {filepath}: {e}")
         return None
 
-def save_text(text: str, filename: str):
+    if filename.startswith('research_'):
+        _index_research(data, filename)
+    return filepath
+
+def _index_research(data: dict, filename: str):
+    """Add a research file's hits to the local search index"""
+    try:
+        from tools.local_index import index_research
+        index_research(data, source=filename)
+    except Exception as e:
+        print(f" Error indexing {filename}: {e}")
+
+def save_text(text: str, filename: str, directory: str = OUTPUT_DIR):
     """Save text to file"""
-    filepath = os.path.join(OUTPUT_DIR, filename)
+    filepath = os.path.join(directory, filename)
     
     try:
-        with open(filepath, 'w', encoding='utf-8') as f:
-            f.write(text)
+        atomic_write(filepath, text)
         print(f" Saved text: {filepath}")
         return filepath
     except Exception as e:
         print(f" Error saving text {filepath}: {e}")
         return None
 
-def load_json(filename: str):
+def save_bytes(data: bytes, filename: str, directory: str = OUTPUT_DIR):
+    """Save binary data (e.g. a PDF) to file"""
+    filepath = os.path.join(directory, filename)
+    
+    try:
+        atomic_write(filepath, data)
+        print(f" Saved file: {filepath}")
+        return filepath
+    except Exception as e:
+        print(f" Error saving file {filepath}: {e}")
+        return None
+
+def load_json(filename: str, directory: str = OUTPUT_DIR):
     """Load JSON file"""
     if not filename.endswith('.json'):
         filename += '.json'
     
-    filepath = os.path.join(OUTPUT_DIR, filename)
+    filepath = os.path.join(directory, filename)
     
     try:
         with open(filepath, 'r', encoding='utf-8') as f:
@@ -55,9 +99,9 @@ def load_json(filename: str):
         print(f" Error loading JSON {filepath}: {e}")
         return None
 
-def load_text(filename: str):
+def load_text(filename: str, directory: str = OUTPUT_DIR):
     """Load text file"""
-    filepath = os.path.join(OUTPUT_DIR, filename)
+    filepath = os.path.join(directory, filename)
     
     try:
         with open(filepath, 'r', encoding='utf-8') as f:
@@ -0,0 +1,134 @@
+# tools/html_parser.py
+# Extraction of search hits from DuckDuckGo's HTML results page.
+# Two interchangeable backends produce the same {title, url, snippet} hits:
+# - "lxml": libxml2 parse plus XPath over the result__a / result__url /
+#   result__snippet anchors (several times faster; lxml is in requirements)
+# - "bs4": BeautifulSoup with the pure-Python html.parser (fallback when
+#   lxml is missing or cannot parse a page)
+# The backend is chosen with SEARCH_PARSER (default "lxml").
+# benchmarks/run_benchmarks.py compares both on saved result pages in
+# benchmarks/fixtures/ and checks that their outputs are identical.
+
+import logging
+import os
+from typing import Callable, Dict, List, Optional
+
+try:
+    import lxml.html
+except ImportError:
+    lxml = None
+
+try:
+    from bs4 import BeautifulSoup
+except ImportError:
+    BeautifulSoup = None
+
+logger = logging.getLogger(__name__)
+
+SEARCH_PARSER = os.getenv("SEARCH_PARSER", "lxml")
+
+
+def _has_class(name: str) -> str:
+    """XPath predicate matching one class token, like BeautifulSoup's class_="""
+    return f"contains(concat(' ', normalize-space(@class), ' '), ' {name} ')"
+
+
+RESULT_XPATH = f"//div[{_has_class('result')}]"
+TITLE_XPATH = f".//a[{_has_class('result__a')}]"
+URL_XPATH = f".//a[{_has_class('result__url')}]"
+SNIPPET_XPATH = f".//a[{_has_class('result__snippet')}]"
+
+
+def _hit(title: str, url: str, snippet: str) -> Dict:
+    """Build a hit; title/snippet are None when the page has no such element"""
+    if not url.startswith('http'):
+        url = 'https://' + url
+    return {
+        'title': "No title" if title is None else title,
+        'url': url,
+        'snippet': "No description" if snippet is None else snippet,
+    }
+
+
+def _clean(text: str) -> str:
+    # Collapse whitespace across text nodes. Joining stripped nodes instead
+    # (get_text(strip=True)) glued the <b>-highlighted query words to their
+    # neighbours ("whatartificialintelligencesystems")
+    return " ".join(text.split())
+
+
+def _lxml_text(elements) -> Optional[str]:
+    if not elements:
+        return None
+    return _clean("".join(elements[0].xpath(".//text()")))
+
+
+def parse_results_lxml(html: str, max_results: int = 5) -> List[Dict]:
+    """Extract hits with lxml and XPath"""
+    if not html or not html.strip():
+        return []
+    tree = lxml.html.fromstring(html)
+    results = []
+    for div in tree.xpath(RESULT_XPATH)[:max_results]:
+        try:
+            url_elem = div.xpath(URL_XPATH)
+            results.append(_hit(
+                _lxml_text(div.xpath(TITLE_XPATH)),
+                url_elem[0].get('href', '') if url_elem else "",
+                _lxml_text(div.xpath(SNIPPET_XPATH)),
+            ))
+        except Exception as e:
+            logger.warning(f" Error parsing result: {e}")
+    return results
+
+
+def parse_results_bs4(html: str, max_results: int = 5) -> List[Dict]:
+    """Extract hits with BeautifulSoup (html.parser)"""
+    soup = BeautifulSoup(html, 'html.parser')
+    results = []
+    for div in soup.find_all('div', class_='result', limit=max_results):
+        try:
+            title_elem = div.find('a', class_='result__a')
+            url_elem = div.find('a', class_='result__url')
+            snippet_elem = div.find('a', class_='result__snippet')
+            results.append(_hit(
+                _clean(title_elem.get_text()) if title_elem else None,
+                url_elem.get('href', '') if url_elem else "",
+                _clean(snippet_elem.get_text()) if snippet_elem else None,
+            ))
+        except Exception as e:
+            logger.warning(f" Error parsing result: {e}")
+    return results
+
+
+PARSERS: Dict[str, Callable[[str, int], List[Dict]]] = {}
+if lxml is not None:
+    PARSERS["lxml"] = parse_results_lxml
+if BeautifulSoup is not None:
+    PARSERS["bs4"] = parse_results_bs4
+
+
+def parse_results(html: str, max_results: int = 5, parser: str = None) -> List[Dict]:
+    """
+    Extract search hits from a DuckDuckGo HTML results page.
+
+    Args:
+        html: Page source
+        max_results: Hits to return (in page order)
+        parser: "lxml" or "bs4" (default SEARCH_PARSER); falls back to the
+            other backend if it is not installed or fails on the page
+
+    Returns:
+        List of {title, url, snippet} dicts
+    """
+    name = parser or SEARCH_PARSER
+    order = [name] + [p for p in PARSERS if p != name]
+    for candidate in order:
+        parse = PARSERS.get(candidate)
+        if parse is None:
+            continue
+        try:
+            return parse(html, max_results)
+        except Exception as e:
+            logger.warning(f" {candidate} could not parse search results: {e}")
+    raise RuntimeError("No HTML parser available (install lxml or beautifulsoup4)")
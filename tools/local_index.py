@@ -0,0 +1,281 @@
+# tools/local_index.py
+# Local BM25 retrieval over every search hit saved in outputs/research_*.json.
+# - The inverted index (term -> document -> term frequency) is persisted in
+#   SQLite (cache/research_index.sqlite) and mirrored in memory, so lookups
+#   do not touch the disk
+# - save_json() adds the hits of every research file it writes; documents are
+#   keyed by canonical URL, so a page seen again is updated, not duplicated
+# - Updates are applied to the in-memory copy incrementally; other
+#   processes' additions are picked up through a generation counter
+# - The first open backfills from the research files already in outputs/
+#
+# Usage:
+#   python -m tools.local_index --rebuild
+#   python -m tools.local_index "edge ai inference"
+
+import glob
+import json
+import logging
+import math
+import os
+import re
+import sqlite3
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+from typing import Dict, List
+
+from tools.dedup import canonical_url
+from utils.disk_cache import CACHE_DIR
+from utils.prompt_packer import STOPWORDS
+
+logger = logging.getLogger(__name__)
+
+INDEX_PATH = os.path.join(CACHE_DIR, "research_index.sqlite")
+RESEARCH_GLOB = os.path.join("outputs", "research_*.json")
+BM25_K1 = 1.2
+BM25_B = 0.75
+TITLE_WEIGHT = 2             # Title terms count this many times
+RELOAD_CHECK_INTERVAL = 1.0  # Seconds between checks for other processes' updates
+
+
+def tokenize(text: str) -> List[str]:
+    """Lowercase words of at least two characters, without stopwords"""
+    return [w for w in re.findall(r"\w+", (text or "").lower()) if len(w) > 1 and w not in STOPWORDS]
+
+
+def _doc_terms(hit: Dict) -> Counter:
+    terms = Counter(tokenize(hit.get("title")) * TITLE_WEIGHT)
+    terms.update(tokenize(hit.get("snippet")))
+    terms.update(tokenize(hit.get("content")))
+    return terms
+
+
+class LocalIndex:
+    def __init__(self, path: str = INDEX_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+        self._postings: Dict[str, Dict[int, int]] = {}
+        self._docs: Dict[int, Dict] = {}      # doc_id -> hit
+        self._lengths: Dict[int, int] = {}
+        self._total_length = 0
+        self._generation = -1
+        self._checked = 0.0
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        with self._connect() as db:
+            db.execute("PRAGMA journal_mode=WAL")
+            db.execute(
+                "CREATE TABLE IF NOT EXISTS docs ("
+                " doc_id INTEGER PRIMARY KEY,"
+                " key TEXT UNIQUE NOT NULL,"
+                " hit TEXT NOT NULL,"
+                " length INTEGER NOT NULL,"
+                " source TEXT,"
+                " updated REAL NOT NULL)"
+            )
+            db.execute(
+                "CREATE TABLE IF NOT EXISTS postings ("
+                " term TEXT NOT NULL,"
+                " doc_id INTEGER NOT NULL,"
+                " tf INTEGER NOT NULL,"
+                " PRIMARY KEY (term, doc_id)) WITHOUT ROWID"
+            )
+            db.execute("CREATE INDEX IF NOT EXISTS idx_postings_doc ON postings(doc_id)")
+            db.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value INTEGER NOT NULL)")
+            db.execute("INSERT OR IGNORE INTO meta (key, value) VALUES ('generation', 0)")
+
+    @contextmanager
+    def _connect(self):
+        db = sqlite3.connect(self.path, timeout=10)
+        try:
+            with db:
+                yield db
+        finally:
+            db.close()
+
+    def _refresh(self, force: bool = False):
+        """Reload the in-memory index if the file changed since the last load (lock held)"""
+        now = time.monotonic()
+        if not force and now - self._checked < RELOAD_CHECK_INTERVAL:
+            return
+        self._checked = now
+        with self._connect() as db:
+            generation = db.execute("SELECT value FROM meta WHERE key = 'generation'").fetchone()[0]
+            if generation == self._generation and not force:
+                return
+            docs = db.execute("SELECT doc_id, hit, length FROM docs").fetchall()
+            postings = db.execute("SELECT term, doc_id, tf FROM postings").fetchall()
+
+        self._docs = {doc_id: json.loads(hit) for doc_id, hit, _ in docs}
+        self._lengths = {doc_id: length for doc_id, _, length in docs}
+        self._total_length = sum(self._lengths.values())
+        self._postings = {}
+        for term, doc_id, tf in postings:
+            self._postings.setdefault(term, {})[doc_id] = tf
+        self._generation = generation
+
+    def add_hits(self, hits: List[Dict], source: str = None) -> int:
+        """
+        Add or update search hits.
+
+        A hit whose canonical URL is already indexed replaces the stored one
+        only if it carries at least as much text (so fetched page content is
+        not overwritten by a snippet-only copy).
+
+        Returns:
+            Number of documents added or updated
+        """
+        updates = []
+        now = time.time()
+        with self._lock:
+            self._refresh()
+            with self._connect() as db:
+                generation = db.execute("SELECT value FROM meta WHERE key = 'generation'").fetchone()[0]
+                for hit in hits:
+                    if hit.get("fallback") or hit.get("backend") == "local" or not (hit.get("url") or hit.get("title")):
+                        continue  # Placeholders, and copies of what is already indexed
+                    key = canonical_url(hit.get("url")) or hit.get("title")
+                    terms = _doc_terms(hit)
+                    length = sum(terms.values())
+                    if not length:
+                        continue
+                    stored = {k: hit.get(k) for k in ("title", "url", "snippet", "content") if hit.get(k)}
+                    data = json.dumps(stored, ensure_ascii=False)
+                    row = db.execute("SELECT doc_id, hit, length FROM docs WHERE key = ?", (key,)).fetchone()
+                    if row and (row[2] > length or row[1] == data):
+                        continue
+                    if row:
+                        doc_id = row[0]
+                        db.execute("UPDATE docs SET hit = ?, length = ?, source = ?, updated = ? WHERE doc_id = ?",
+                                   (data, length, source, now, doc_id))
+                        db.execute("DELETE FROM postings WHERE doc_id = ?", (doc_id,))
+                    else:
+                        doc_id = db.execute(
+                            "INSERT INTO docs (key, hit, length, source, updated) VALUES (?, ?, ?, ?, ?)",
+                            (key, data, length, source, now)).lastrowid
+                    db.executemany("INSERT INTO postings (term, doc_id, tf) VALUES (?, ?, ?)",
+                                   [(term, doc_id, tf) for term, tf in terms.items()])
+                    updates.append((doc_id, stored, terms, length))
+                if updates:
+                    db.execute("UPDATE meta SET value = value + 1 WHERE key = 'generation'")
+
+            if not updates:
+                return 0
+            if generation != self._generation:
+                # Another process wrote in between; reload everything
+                self._refresh(force=True)
+                return len(updates)
+            for doc_id, stored, terms, length in updates:
+                self._apply(doc_id, stored, terms, length)
+            self._generation = generation + 1
+        return len(updates)
+
+    def _apply(self, doc_id: int, hit: Dict, terms: Counter, length: int):
+        """Update the in-memory index for one document (lock held)"""
+        old = self._docs.get(doc_id)
+        if old is not None:
+            for term in _doc_terms(old):
+                postings = self._postings.get(term)
+                if postings:
+                    postings.pop(doc_id, None)
+                    if not postings:
+                        del self._postings[term]
+            self._total_length -= self._lengths[doc_id]
+        for term, tf in terms.items():
+            self._postings.setdefault(term, {})[doc_id] = tf
+        self._docs[doc_id] = hit
+        self._lengths[doc_id] = length
+        self._total_length += length
+
+    def add_research_file(self, path: str) -> int:
+        """Index the hits of one research_*.json file"""
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except Exception as e:
+            logger.warning(f" Could not index {path}: {e}")
+            return 0
+        return self.add_hits(data.get("hits", []), source=os.path.basename(path))
+
+    def rebuild(self, pattern: str = RESEARCH_GLOB) -> int:
+        """Index every research file matching pattern; returns documents added or updated"""
+        return sum(self.add_research_file(path) for path in sorted(glob.glob(pattern)))
+
+    def search(self, query: str, k: int = 5) -> List[Dict]:
+        """
+        BM25 search.
+
+        Returns:
+            Up to k hits (title, url, snippet, content) with "score" (BM25)
+            and "coverage" (share of the query terms the document contains)
+        """
+        query_terms = list(dict.fromkeys(tokenize(query)))
+        if not query_terms:
+            return []
+        with self._lock:
+            self._refresh()
+            n = len(self._docs)
+            if not n:
+                return []
+            avg_length = self._total_length / n
+            scores, matched = {}, {}
+            for term in query_terms:
+                postings = self._postings.get(term)
+                if not postings:
+                    continue
+                idf = math.log(1 + (n - len(postings) + 0.5) / (len(postings) + 0.5))
+                for doc_id, tf in postings.items():
+                    norm = BM25_K1 * (1 - BM25_B + BM25_B * self._lengths[doc_id] / avg_length)
+                    scores[doc_id] = scores.get(doc_id, 0.0) + idf * tf * (BM25_K1 + 1) / (tf + norm)
+                    matched[doc_id] = matched.get(doc_id, 0) + 1
+            best = sorted(scores, key=scores.get, reverse=True)[:k]
+            return [{**self._docs[doc_id], "score": scores[doc_id],
+                     "coverage": matched[doc_id] / len(query_terms)} for doc_id in best]
+
+    def __len__(self):
+        with self._lock:
+            self._refresh()
+            return len(self._docs)
+
+
+_index = None
+_index_lock = threading.Lock()
+
+
+def get_local_index() -> LocalIndex:
+    """Return the shared index, backfilling it from outputs/ on first use"""
+    global _index
+    with _index_lock:
+        if _index is None:
+            _index = LocalIndex()
+            if not len(_index):
+                added = _index.rebuild()
+                if added:
+                    logger.info(f" Local index backfilled with {added} documents")
+        return _index
+
+
+def index_research(data: Dict, source: str = None) -> int:
+    """Add the hits of a research result (called by save_json)"""
+    return get_local_index().add_hits(data.get("hits", []), source=source)
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Local research index")
+    parser.add_argument("query", nargs="?", help="Search the index")
+    parser.add_argument("--rebuild", action="store_true", help="Re-index all outputs/research_*.json")
+    parser.add_argument("-k", type=int, default=5)
+    args = parser.parse_args()
+
+    index = get_local_index()
+    if args.rebuild:
+        print(f"Indexed {index.rebuild()} documents")
+    if args.query:
+        started = time.perf_counter()
+        results = index.search(args.query, args.k)
+        print(f"{len(results)} results in {(time.perf_counter() - started) * 1000:.2f} ms")
+        for hit in results:
+            print(f"{hit['score']:7.2f}  {hit['coverage']:.0%}  {hit.get('title')}  {hit.get('url')}")
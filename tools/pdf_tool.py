@@ -1,19 +1,287 @@
 # tools/pdf_tool.py
-# Input
-# md_text: Markdown text to convert
-# out_filename: desired output PDF name (but we’ll fallback to HTML)
+# Pure-Python PDF output for reports (no native libraries, works on Windows).
+# html_to_pdf() lays out the HTML that the export engine already rendered
+# from the report's Markdown: headings, paragraphs, (nested) lists, code
+# blocks, quotes, tables and rules, with bold/italic/code runs, on A4 pages
+# using the PDF base fonts (Helvetica, Courier).
+# The base fonts only cover Latin-1 / Windows-1252: can_render() tells
+# whether a text fits, and the export engine skips the PDF for text that
+# does not (e.g. Arabic) instead of printing it as "?".
+#
+# md_to_pdf(md_text, out_filename) converts a Markdown string directly.
 
-# Output
-# Returns a string path pointing to the generated HTML file.
-
-import markdown2
+import re
+import zlib
+from html.parser import HTMLParser
 from pathlib import Path
+from typing import List, Tuple
+
+PAGE_WIDTH, PAGE_HEIGHT = 595, 842   # A4 in points
+MARGIN = 56
+BODY_SIZE = 10.5
+LINE_SPACING = 1.35
+HEADING_SIZES = {"h1": 20, "h2": 15, "h3": 12.5, "h4": 11, "h5": BODY_SIZE, "h6": BODY_SIZE}
+LIST_INDENT = 16
+
+FONTS = {"regular": "Helvetica", "bold": "Helvetica-Bold", "italic": "Helvetica-Oblique", "code": "Courier"}
+FONT_IDS = {name: f"F{i}" for i, name in enumerate(FONTS, 1)}
+
+# Helvetica advance widths (1/1000 em) for ASCII 32-126, from the Adobe AFM
+_HELVETICA = [
+    278, 278, 355, 556, 556, 889, 667, 191, 333, 333, 389, 584, 278, 333, 278, 278,
+    556, 556, 556, 556, 556, 556, 556, 556, 556, 556, 278, 278, 584, 584, 584, 556,
+    1015, 667, 667, 722, 722, 667, 611, 778, 722, 278, 500, 667, 556, 833, 722, 778,
+    667, 778, 722, 667, 611, 722, 667, 944, 667, 667, 611, 278, 278, 278, 469, 556,
+    333, 556, 556, 500, 556, 556, 278, 556, 556, 222, 222, 500, 222, 833, 556, 556,
+    556, 556, 333, 500, 278, 556, 500, 722, 500, 500, 500, 334, 260, 334, 584,
+]
+
+BLOCK_TAGS = {"p", "h1", "h2", "h3", "h4", "h5", "h6", "li", "pre", "tr", "dt", "dd"}
+
+Run = Tuple[str, str]  # (font name, text)
+
+
+def can_render(text: str) -> bool:
+    """True if the PDF base fonts can print every character of text"""
+    try:
+        (text or "").encode("cp1252")
+    except UnicodeEncodeError:
+        return False
+    return True
+
+
+def text_width(text: str, font: str, size: float) -> float:
+    if font == "code":
+        return len(text) * 0.6 * size
+    units = sum(_HELVETICA[ord(c) - 32] if 32 <= ord(c) <= 126 else 556 for c in text)
+    if font == "bold":
+        units *= 1.07
+    return units * size / 1000
+
+
+class _Blocks(HTMLParser):
+    """Flatten rendered report HTML into (kind, indent, runs) blocks"""
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.blocks: List[Tuple[str, int, List[Run]]] = []
+        self._runs: List[Run] = []
+        self._kind = None
+        self._bold = self._italic = self._code = 0
+        self._lists: List[List] = []  # [tag, counter] per open list
+        self._quote = 0
+        self._cells = 0
+
+    def _font(self) -> str:
+        if self._code or self._kind == "pre":
+            return "code"
+        if self._bold or (self._kind or "").startswith("h") or self._kind == "dt":
+            return "bold"
+        return "italic" if self._italic else "regular"
+
+    def _flush(self):
+        if self._kind and any(text.strip() for _, text in self._runs):
+            indent = LIST_INDENT * (len(self._lists) + self._quote)
+            self.blocks.append((self._kind, indent, self._runs))
+        self._runs, self._kind = [], None
+
+    def handle_starttag(self, tag, attrs):
+        if tag in ("ul", "ol"):
+            self._flush()
+            self._lists.append([tag, 0])
+        elif tag == "blockquote":
+            self._flush()
+            self._quote += 1
+        elif tag == "hr":
+            self._flush()
+            self.blocks.append(("hr", 0, []))
+        elif tag == "br":
+            self._runs.append((self._font(), "\n"))
+        elif tag in BLOCK_TAGS:
+            if tag == "p" and self._kind == "li":
+                return  # Loose lists wrap item text in <p>
+            self._flush()
+            self._kind, self._cells = tag, 0
+            if tag == "li" and self._lists:
+                self._lists[-1][1] += 1
+                marker = f"{self._lists[-1][1]}. " if self._lists[-1][0] == "ol" else "• "
+                self._runs.append(("regular", marker))
+        elif tag in ("td", "th"):
+            if self._cells:
+                self._runs.append(("regular", "  |  "))
+            self._cells += 1
+            self._bold += tag == "th"
+        elif tag in ("strong", "b"):
+            self._bold += 1
+        elif tag in ("em", "i"):
+            self._italic += 1
+        elif tag == "code":
+            self._code += 1
+
+    def handle_endtag(self, tag):
+        if tag in ("ul", "ol"):
+            self._flush()
+            if self._lists:
+                self._lists.pop()
+        elif tag == "blockquote":
+            self._flush()
+            self._quote = max(0, self._quote - 1)
+        elif tag in BLOCK_TAGS and not (tag == "p" and self._kind == "li"):
+            self._flush()
+        elif tag == "th":
+            self._bold = max(0, self._bold - 1)
+        elif tag in ("strong", "b"):
+            self._bold = max(0, self._bold - 1)
+        elif tag in ("em", "i"):
+            self._italic = max(0, self._italic - 1)
+        elif tag == "code":
+            self._code = max(0, self._code - 1)
+
+    def handle_data(self, data):
+        if self._kind is None:
+            if not data.strip():
+                return
+            self._kind = "p"  # Loose text (e.g. tight list items after a nested list)
+        if self._kind != "pre":
+            data = re.sub(r"\s+", " ", data)
+        self._runs.append((self._font(), data))
+
+    def close(self):
+        super().close()
+        self._flush()
+
+
+def _wrap(runs: List[Run], size: float, width: float, preformatted: bool) -> List[List[Run]]:
+    """Break runs into lines that fit width"""
+    lines, line, used = [], [], 0.0
+    for font, text in runs:
+        pieces = re.split(r"(\n| )", text) if not preformatted else re.split(r"(\n)", text)
+        for piece in pieces:
+            if piece == "\n":
+                lines.append(line)
+                line, used = [], 0.0
+                continue
+            if not piece or (piece == " " and not line):
+                continue
+            w = text_width(piece, font, size)
+            if used + w > width and line and piece != " ":
+                lines.append(line)
+                line, used = [], 0.0
+            line.append((font, piece))
+            used += w
+    if line:
+        lines.append(line)
+    return lines
+
+
+def _pdf_string(text: str) -> bytes:
+    data = text.encode("cp1252", errors="replace")
+    return b"(" + data.replace(b"\\", b"\\\\").replace(b"(", b"\\(").replace(b")", b"\\)") + b")"
+
+
+def layout(blocks) -> List[bytes]:
+    """Lay blocks out on pages; returns one content stream per page"""
+    pages, ops = [], []
+    y = PAGE_HEIGHT - MARGIN
+
+    def new_page():
+        nonlocal ops, y
+        if ops:
+            pages.append(b"\n".join(ops))
+        ops, y = [], PAGE_HEIGHT - MARGIN
+
+    for kind, indent, runs in blocks:
+        if kind == "hr":
+            if y - 14 < MARGIN:
+                new_page()
+            y -= 6
+            ops.append(b"0.6 G %.2f %.2f m %.2f %.2f l S" % (MARGIN, y, PAGE_WIDTH - MARGIN, y))
+            y -= 8
+            continue
+        size = HEADING_SIZES.get(kind, 9.5 if kind == "pre" else BODY_SIZE)
+        leading = size * LINE_SPACING
+        space_before = size * 0.8 if kind.startswith("h") else size * 0.35
+        x = MARGIN + indent + (LIST_INDENT if kind == "pre" else 0)
+        lines = _wrap(runs, size, PAGE_WIDTH - MARGIN - x, kind == "pre")
+        y -= space_before
+        for line in lines:
+            if y - leading < MARGIN:
+                new_page()
+            y -= leading
+            parts = [b"BT %.2f %.2f Td" % (x, y)]
+            merged = []
+            for run_font, text in line:
+                if merged and merged[-1][0] == run_font:
+                    merged[-1][1] += text
+                else:
+                    merged.append([run_font, text])
+            for run_font, text in merged:
+                parts.append(b"/%s %.1f Tf %s Tj" % (FONT_IDS[run_font].encode(), size, _pdf_string(text)))
+            parts.append(b"ET")
+            ops.append(b" ".join(parts))
+    new_page()
+    return pages or [b""]
+
+
+def build_pdf(pages: List[bytes], title: str = "") -> bytes:
+    """Assemble content streams into a PDF document"""
+    objects = []
+
+    def add(body: bytes) -> int:
+        objects.append(body)
+        return len(objects)
+
+    catalog = add(b"")
+    pages_id = add(b"")
+    fonts = b" ".join(
+        b"/%s %d 0 R" % (FONT_IDS[name].encode(),
+                         add(b"<< /Type /Font /Subtype /Type1 /BaseFont /%s /Encoding /WinAnsiEncoding >>"
+                             % base.encode()))
+        for name, base in FONTS.items())
+    kids = []
+    for content in pages:
+        compressed = zlib.compress(content)
+        stream = add(b"<< /Length %d /Filter /FlateDecode >>\nstream\n%s\nendstream" % (len(compressed), compressed))
+        kids.append(add(b"<< /Type /Page /Parent %d 0 R /MediaBox [0 0 %d %d] /Resources << /Font << %s >> >> "
+                        b"/Contents %d 0 R >>" % (pages_id, PAGE_WIDTH, PAGE_HEIGHT, fonts, stream)))
+    info = add(b"<< /Title %s /Producer (report exporter) >>" % _pdf_string(title or ""))
+    objects[catalog - 1] = b"<< /Type /Catalog /Pages %d 0 R >>" % pages_id
+    objects[pages_id - 1] = b"<< /Type /Pages /Kids [%s] /Count %d >>" % (
+        b" ".join(b"%d 0 R" % k for k in kids), len(kids))
+
+    out = bytearray(b"%PDF-1.4\n%\xe2\xe3\xcf\xd3\n")
+    offsets = []
+    for number, body in enumerate(objects, 1):
+        offsets.append(len(out))
+        out += b"%d 0 obj\n%s\nendobj\n" % (number, body)
+    xref = len(out)
+    out += b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1)
+    out += b"".join(b"%010d 00000 n \n" % offset for offset in offsets)
+    out += b"trailer\n<< /Size %d /Root %d 0 R /Info %d 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (
+        len(objects) + 1, catalog, info, xref)
+    return bytes(out)
+
+
+def html_to_pdf(html: str, title: str = None) -> bytes:
+    """
+    Render report HTML (as produced from the Markdown) to PDF bytes.
+
+    Args:
+        html: HTML fragment or page; only its body content is laid out
+        title: Document title (metadata; the report's own heading is printed)
+    """
+    body = re.search(r"<body[^>]*>(.*)</body>", html, re.S | re.I)
+    parser = _Blocks()
+    parser.feed(body.group(1) if body else html)
+    parser.close()
+    return build_pdf(layout(parser.blocks), title or "")
+
 
 def md_to_pdf(md_text: str, out_filename: str = "outputs/report.pdf") -> str:
-    Path("outputs").mkdir(exist_ok=True)
-    html = markdown2.markdown(md_text)
-    # For now, just save as HTML since weasyprint is not working on Windows
-    html_filename = out_filename.replace('.pdf', '.html')
-    with open(html_filename, 'w', encoding='utf-8') as f:
-        f.write(html)
-    return html_filename
+    """Convert Markdown to a PDF file; returns its path"""
+    from tools.export_engine import render_html
+    from tools.file_tool import atomic_write
+
+    Path(out_filename).parent.mkdir(parents=True, exist_ok=True)
+    atomic_write(out_filename, html_to_pdf(render_html(md_text)))
+    return out_filename
@@ -0,0 +1,188 @@
+# tools/refresh.py
+# Incremental refresh of topics that were reported on before.
+# Every successful run leaves a pointer to itself in
+# outputs/latest_run_<topic>.json; a refresh loads that run's checkpoints
+# (research it was written from, analysis, report and critique), searches
+# again and compares the hits by canonical URL:
+# - no new sources: the previous analysis and report are reused as they are
+#   (the refresh costs one search and a diff)
+# - new sources: only the new pages are fetched, the research is analysed
+#   again and only the report sections the new sources touch are rewritten
+# diff_hits() / affected_sections() / change_summary() are the pieces
+# main.run_pipeline(refresh=True) puts together.
+
+import json
+import logging
+import os
+import re
+from typing import Dict, List, Optional
+
+from agents.writer import REPORT_SECTIONS, canonical_section, split_sections
+from tools.artifact_store import RUNS_DIR, safe_filename
+from tools.checkpoint import RunCheckpoint
+from tools.dedup import canonical_url
+from tools.fetch_tool import fetch_pages
+from tools.file_tool import OUTPUT_DIR, save_json
+from utils.metrics import REGISTRY
+
+logger = logging.getLogger(__name__)
+
+REFRESH_MIN_NEW_HITS = int(os.getenv("REFRESH_MIN_NEW_HITS", 1))  # New sources that make a change material
+MIN_TERM_LENGTH = 4
+
+# Sections new findings are written into when a source matches none of them
+DEFAULT_SECTIONS = ["Main Findings"]
+
+REGISTRY.describe("report_refresh_total", "Refreshed reports, by outcome (unchanged, updated, full)")
+
+
+def _key(hit: Dict) -> str:
+    return canonical_url(hit.get("url")) or (hit.get("title") or "").strip().lower()
+
+
+def pointer_name(topic: str) -> str:
+    return f"latest_run_{safe_filename(topic)}"
+
+
+def remember_run(topic: str, run_id: str, finished_at: str):
+    """Point the topic at its latest successful run"""
+    save_json({"topic": topic, "run_id": run_id, "finished_at": finished_at}, pointer_name(topic))
+
+
+def previous_report(topic: str, base_dir: str = RUNS_DIR) -> Optional[Dict]:
+    """
+    Checkpointed results of the topic's latest successful run.
+
+    Returns:
+        {run_id, finished_at, research, analysis, markdown, critique},
+        or None if the topic has no run that can be refreshed
+    """
+    path = os.path.join(OUTPUT_DIR, f"{pointer_name(topic)}.json")
+    if not os.path.exists(path):
+        return None
+    with open(path, "r", encoding="utf-8") as f:
+        pointer = json.load(f)
+
+    checkpoint = RunCheckpoint.for_run(pointer["run_id"], base_dir)
+    if checkpoint is None:
+        return None
+    research, analysis, report = (checkpoint.load(name) for name in ("research", "analysis", "report"))
+    if not (research and analysis and report and research.get("hits")):
+        logger.info(f" Run {pointer['run_id']} is incomplete, cannot refresh from it")
+        return None
+    return {
+        "run_id": pointer["run_id"],
+        "finished_at": pointer.get("finished_at"),
+        "research": research,
+        "analysis": analysis,
+        "markdown": report["markdown"],
+        "critique": report["critique"],
+    }
+
+
+def diff_hits(old_hits: List[Dict], new_hits: List[Dict],
+              min_new_hits: int = REFRESH_MIN_NEW_HITS) -> Dict:
+    """
+    Compare two hit lists by canonical URL.
+
+    Returns:
+        {added, removed, kept (new hits also in old), material}; the change
+        is material when at least min_new_hits sources are new (sources
+        that dropped out alone leave the report valid)
+    """
+    old_keys = {_key(h) for h in old_hits}
+    new_keys = {_key(h) for h in new_hits}
+    added = [h for h in new_hits if _key(h) not in old_keys]
+    removed = [h for h in old_hits if _key(h) not in new_keys]
+    kept = [h for h in new_hits if _key(h) in old_keys]
+    return {"added": added, "removed": removed, "kept": kept,
+            "material": len(added) >= max(1, min_new_hits)}
+
+
+def merge_hits(old_hits: List[Dict], diff: Dict, fetch_content: bool = True) -> List[Dict]:
+    """
+    Hits for the refreshed research in the new search order: kept sources
+    keep their stored page content, only added ones are fetched.
+    """
+    old = {_key(h): h for h in old_hits}
+    added = [dict(h) for h in diff["added"]]
+    if fetch_content and added:
+        try:
+            added = fetch_pages(added)
+        except Exception as e:
+            logger.warning(f" Could not fetch new pages: {e}")
+    fresh = {_key(h): h for h in added}
+    merged = []
+    for hit in diff["kept"] + diff["added"]:
+        key = _key(hit)
+        if key in fresh:
+            merged.append(fresh[key])
+        elif old[key].get("content"):
+            merged.append({**hit, "content": old[key]["content"]})
+        else:
+            merged.append(hit)
+    return merged
+
+
+def _terms(text: str, exclude=frozenset()) -> set:
+    return {w for w in re.findall(r"\w+", (text or "").lower())
+            if len(w) >= MIN_TERM_LENGTH and w not in exclude}
+
+
+def affected_sections(markdown_text: str, diff: Dict, topic: str = "") -> List[str]:
+    """
+    Report sections the changed sources touch.
+
+    Each new source goes to the body section sharing most of its terms
+    (DEFAULT_SECTIONS when none does), sections citing a source that
+    dropped out are rewritten too, and References whenever sources changed.
+    """
+    topic_terms = _terms(topic)
+    sections = {}
+    for heading, text in split_sections(markdown_text):
+        name = canonical_section(heading)
+        if name and name != "References":
+            sections.setdefault(name, "")
+            sections[name] += text
+
+    affected = set()
+    section_terms = {name: _terms(text, topic_terms) for name, text in sections.items()}
+    for hit in diff["added"]:
+        terms = _terms(" ".join(str(hit.get(f) or "") for f in ("title", "snippet", "content")), topic_terms)
+        overlap = {name: len(terms & st) for name, st in section_terms.items()}
+        best = max(overlap.values(), default=0)
+        affected.update([n for n, o in overlap.items() if o == best] if best else DEFAULT_SECTIONS)
+    for hit in diff["removed"]:
+        url = hit.get("url") or ""
+        affected.update(name for name, text in sections.items() if url and url in text)
+    if diff["added"] or diff["removed"]:
+        affected.add("References")
+    return [name for name in REPORT_SECTIONS if name in affected]
+
+
+def refresh_feedback(diff: Dict) -> str:
+    """Rewrite instructions for the sections affected by changed sources"""
+    lines = ["The research was refreshed. Update this section for the changed sources."]
+    if diff["added"]:
+        lines.append("New sources:")
+        lines += [f"- {h.get('title')} ({h.get('url')}): {(h.get('snippet') or '')[:200]}" for h in diff["added"]]
+    if diff["removed"]:
+        lines.append("Sources no longer found (drop claims that rely only on them):")
+        lines += [f"- {h.get('title')} ({h.get('url')})" for h in diff["removed"]]
+    return "\n".join(lines)
+
+
+def change_summary(previous: Dict, diff: Dict, sections: List[str] = None) -> Dict:
+    """What a refresh found and did, for changes.json and the run result"""
+    def brief(hits):
+        return [{"title": h.get("title"), "url": h.get("url")} for h in hits]
+
+    return {
+        "previous_run_id": previous["run_id"],
+        "previous_finished_at": previous.get("finished_at"),
+        "added": brief(diff["added"]),
+        "removed": brief(diff["removed"]),
+        "kept": len(diff["kept"]),
+        "material": diff["material"],
+        "rewritten_sections": sections or [],
+    }
@@ -0,0 +1,243 @@
+# tools/search_backends.py
+# Interchangeable search backends and hedged requests across them.
+# Every backend answers search(query, max_results) with {title, url, snippet}
+# hits tagged with the backend's name (raising on errors) and keeps a window
+# of its recent latencies:
+# - DuckDuckGoBackend: the DuckDuckGo HTML endpoint (the default)
+# - LocalIndexBackend: BM25 over past research (tools/local_index.py)
+# - HttpJsonBackend: any JSON search API, e.g. a SearXNG instance
+#   (SEARCH_HTTP_URL, with {query} and {max_results} placeholders)
+# hedged_search() asks the first backend and, if it has not answered within
+# its p90 latency (or failed / came back empty), also asks the next one; the
+# first non-empty result set wins. A slow request therefore costs about the
+# p90 instead of the full request timeout.
+# SEARCH_BACKENDS sets the order (default "duckduckgo"). "local" is opt-in:
+# its hits are past research, so they are kept out of the search cache and
+# of refresh searches (see search_tool).
+
+
+import abc
+import asyncio
+import collections
+import concurrent.futures
+import logging
+import os
+import threading
+import time
+from typing import Dict, List, Optional, Sequence
+from urllib.parse import quote_plus
+
+import requests
+
+from tools.html_parser import parse_results
+from utils.limits import slot
+from utils.metrics import REGISTRY
+from utils.rate_limit import Throttled, get_guard
+from utils.stats import percentile
+
+logger = logging.getLogger(__name__)
+
+DDG_URL = "https://html.duckduckgo.com/html/"
+HEADERS = {
+    'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'
+}
+REQUEST_TIMEOUT = 10.0
+
+SEARCH_BACKENDS = os.getenv("SEARCH_BACKENDS", "duckduckgo")
+SEARCH_HTTP_URL = os.getenv("SEARCH_HTTP_URL", "")   # e.g. https://searx.example/search?q={query}&format=json
+HEDGE_PERCENTILE = 90
+HEDGE_DELAY = 1.5        # Seconds before hedging while a backend has too few latency samples
+MIN_HEDGE_DELAY = 0.2
+LATENCY_WINDOW = 100     # Recent successful calls per backend used for the percentile
+MIN_SAMPLES = 5
+LOCAL_MIN_COVERAGE = 0.5  # Share of query terms a local hit must contain
+
+REGISTRY.describe("search_backend_seconds", "Latency of search backend calls, by backend")
+REGISTRY.describe("search_backend_errors_total", "Failed search backend calls, by backend")
+REGISTRY.describe("search_hedges_total", "Hedged requests sent to a further backend, by backend")
+REGISTRY.describe("search_backend_wins_total", "Hedged searches answered by each backend")
+
+# Dedicated pool: requests that lost the race keep running until their own
+# timeout and must not hold up asyncio.run() (the default executor would)
+_executor = concurrent.futures.ThreadPoolExecutor(max_workers=16, thread_name_prefix="search")
+
+
+class SearchBackend(abc.ABC):
+    name = "backend"
+
+    def __init__(self):
+        self._latencies = collections.deque(maxlen=LATENCY_WINDOW)
+        self._lock = threading.Lock()
+
+    @abc.abstractmethod
+    def _search(self, query: str, max_results: int) -> List[Dict]:
+        """Hits for one query; raise on errors"""
+
+    def search(self, query: str, max_results: int = 5) -> List[Dict]:
+        """Run one query (blocking; raises on errors) and record its latency"""
+        started = time.perf_counter()
+        try:
+            results = self._search(query, max_results)
+        except Exception:
+            REGISTRY.inc("search_backend_errors_total", backend=self.name)
+            raise
+        elapsed = time.perf_counter() - started
+        for hit in results:
+            hit["backend"] = self.name
+        REGISTRY.observe("search_backend_seconds", elapsed, backend=self.name)
+        with self._lock:
+            self._latencies.append(elapsed)
+        return results
+
+    def hedge_delay(self) -> float:
+        """Seconds to wait for this backend before asking the next one"""
+        with self._lock:
+            samples = list(self._latencies)
+        if len(samples) < MIN_SAMPLES:
+            return HEDGE_DELAY
+        return max(MIN_HEDGE_DELAY, percentile(samples, HEDGE_PERCENTILE))
+
+
+class DuckDuckGoBackend(SearchBackend):
+    name = "duckduckgo"
+
+    def _search(self, query: str, max_results: int) -> List[Dict]:
+        with get_guard("search").attempt():
+            with slot("search"):
+                response = requests.get(DDG_URL, params={'q': query}, headers=HEADERS, timeout=REQUEST_TIMEOUT)
+            response.raise_for_status()
+            results = parse_results(response.text, max_results)
+            # A throttled client gets a 202 "anomaly" (captcha) page instead of results
+            if not results and (response.status_code == 202 or "anomaly" in response.text):
+                raise Throttled(f"DuckDuckGo throttled the query (HTTP {response.status_code})")
+        return results
+
+
+class LocalIndexBackend(SearchBackend):
+    name = "local"
+
+    def __init__(self, min_coverage: float = LOCAL_MIN_COVERAGE):
+        super().__init__()
+        self.min_coverage = min_coverage
+
+    def _search(self, query: str, max_results: int) -> List[Dict]:
+        from tools.local_index import get_local_index
+
+        hits = get_local_index().search(query, max_results)
+        return [{k: v for k, v in h.items() if k not in ("score", "coverage")}
+                for h in hits if h["coverage"] >= self.min_coverage]
+
+
+class HttpJsonBackend(SearchBackend):
+    def __init__(self, name: str, url: str, results_key: str = "results",
+                 fields: Dict[str, str] = None):
+        """
+        Args:
+            url: Request URL with {query} and optionally {max_results} placeholders
+            results_key: Key of the hit list in the JSON response (the
+                response itself may also be the list)
+            fields: Response field for each hit field (default SearXNG's:
+                title, url, content as snippet)
+        """
+        super().__init__()
+        self.name = name
+        self.url = url
+        self.results_key = results_key
+        self.fields = fields or {"title": "title", "url": "url", "snippet": "content"}
+
+    def _search(self, query: str, max_results: int) -> List[Dict]:
+        url = self.url.format(query=quote_plus(query), max_results=max_results)
+        with get_guard(f"search_{self.name}").attempt():
+            with slot("search"):
+                response = requests.get(url, headers=HEADERS, timeout=REQUEST_TIMEOUT)
+            response.raise_for_status()
+            data = response.json()
+        items = data if isinstance(data, list) else data.get(self.results_key) or []
+        results = []
+        for item in items[:max_results]:
+            hit = {field: str(item.get(source) or "") for field, source in self.fields.items()}
+            if hit.get("url") or hit.get("title"):
+                results.append(hit)
+        return results
+
+
+_backends: Dict[str, SearchBackend] = {}
+_backends_lock = threading.Lock()
+
+
+def _add_defaults():
+    # Lock held; registered backends with the same name take precedence
+    if "duckduckgo" not in _backends:
+        _backends["duckduckgo"] = DuckDuckGoBackend()
+    if "local" not in _backends:
+        _backends["local"] = LocalIndexBackend()
+    if SEARCH_HTTP_URL and "http" not in _backends:
+        _backends["http"] = HttpJsonBackend("http", SEARCH_HTTP_URL)
+
+
+def register_backend(backend: SearchBackend):
+    """Make a backend available under its name (list it in SEARCH_BACKENDS to use it)"""
+    with _backends_lock:
+        _backends[backend.name] = backend
+
+
+def get_backends(names: Optional[str] = None, exclude: Sequence[str] = ()) -> List[SearchBackend]:
+    """Backends in hedging order (default SEARCH_BACKENDS); unknown and excluded names are skipped"""
+    with _backends_lock:
+        _add_defaults()
+        order = [n.strip() for n in (names or SEARCH_BACKENDS).split(",") if n.strip()]
+        return [_backends[n] for n in order if n in _backends and n not in exclude]
+
+
+async def hedged_search(query: str, max_results: int = 5,
+                        backends: Sequence[SearchBackend] = None) -> List[Dict]:
+    """
+    Query backends in order, hedging slow or failed ones; first good answer wins.
+
+    Returns:
+        The first non-empty result list, or [] if every backend came back
+        empty. Raises the last error if none had results and any failed.
+    """
+    backends = list(get_backends() if backends is None else backends)
+    if not backends:
+        raise RuntimeError("No search backend configured")
+    loop = asyncio.get_running_loop()
+    pending = {}
+    errors = []
+    next_backend = 0
+
+    def launch():
+        nonlocal next_backend
+        backend = backends[next_backend]
+        next_backend += 1
+        if next_backend > 1:
+            REGISTRY.inc("search_hedges_total", backend=backend.name)
+            logger.info(f" Hedging '{query}' to {backend.name}")
+        future = loop.run_in_executor(_executor, backend.search, query, max_results)
+        pending[future] = backend
+        return backend
+
+    current = launch()
+    while pending:
+        timeout = current.hedge_delay() if next_backend < len(backends) else None
+        done, _ = await asyncio.wait(pending, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+        for future in done:
+            backend = pending.pop(future)
+            try:
+                results = future.result()
+            except Exception as e:
+                logger.warning(f" {backend.name} search failed for '{query}': {e}")
+                errors.append(e)
+                continue
+            if results:
+                REGISTRY.inc("search_backend_wins_total", backend=backend.name)
+                return results
+        # Timed out, or a request failed / came back empty (even while an
+        # earlier one is still running): bring in the next backend
+        if next_backend < len(backends):
+            current = launch()
+
+    if errors:
+        # An empty answer from e.g. the local index does not mean the web has nothing
+        raise errors[-1]
+    return []
@@ -3,78 +3,307 @@
 # ✔️ Run a web search
 # ✔️ Fetch the top results
 # ✔️ Scrape the first paragraph of each webpage to generate richer summaries
+#
+# A topic is expanded into several sub-queries that are sent concurrently
+# (asyncio + a bounded semaphore), then the result lists are merged and
+# ranked into a single {title, url, snippet} hit list. Duplicate pages and
+# near-identical snippets are dropped (tools/dedup.py) and backfilled from
+# lower-ranked candidates.
+# Results are kept in a persistent TTL cache (utils/disk_cache.py) keyed by
+# the normalized query, with stale-while-revalidate refreshes.
+# Each sub-query is hedged across the configured backends
+# (tools/search_backends.py: DuckDuckGo, local index, HTTP JSON APIs).
+# DuckDuckGo requests go through the "search" backend guard
+# (utils/rate_limit.py): a token bucket, adaptive concurrency and a circuit
+# breaker. When no sub-query succeeds the placeholder hits are marked
+# "fallback" so callers can tell them from real results (see is_fallback()).
 # tools/search_tool.py
-import requests
-from typing import List, Dict
+import asyncio
+import concurrent.futures
+import os
+import threading
+import time
+import unicodedata
+from typing import List, Dict, Sequence
 import logging
 
+from tools.dedup import canonical_url, dedupe_hits
+from tools.fetch_tool import fetch_pages_async, TIME_BUDGET
+from tools.search_backends import get_backends, hedged_search
+from utils.disk_cache import DiskCache, CACHE_DIR
+from utils.metrics import REGISTRY, record_search
+from utils.rate_limit import get_guard
+
 logger = logging.getLogger(__name__)
 
-def search_web(query: str, max_results: int = 5) -> List[Dict]:
+MAX_QUERIES = 4        # Sub-queries per topic (including the topic itself)
+MAX_CONCURRENCY = 3    # Simultaneous requests to the search backend
+RRF_K = 60             # Reciprocal-rank-fusion damping constant
+DEDUP_OVERFETCH = 3    # Merged candidates per requested result, for backfilling dropped duplicates
+DEDUP_SPARE_FETCHES = 2  # Extra pages fetched in case fetched pages turn out to be duplicates
+
+# Search cache settings (seconds / entries), overridable from the environment
+CACHE_TTL = int(os.getenv("SEARCH_CACHE_TTL", 24 * 3600))
+CACHE_STALE_TTL = int(os.getenv("SEARCH_CACHE_STALE_TTL", 7 * 24 * 3600))
+CACHE_MAX_ENTRIES = int(os.getenv("SEARCH_CACHE_MAX_ENTRIES", 5000))
+CACHE_PATH = os.path.join(CACHE_DIR, "search.sqlite")
+
+# Suffixes used to widen coverage of a topic
+QUERY_EXPANSIONS = ["latest", "research", "overview", "applications"]
+
+# Common abbreviations expanded into an extra synonym query
+SYNONYMS = {
+    "ai": "artificial intelligence",
+    "ml": "machine learning",
+    "llm": "large language model",
+    "nlp": "natural language processing",
+}
+
+
+def expand_queries(topic: str, max_queries: int = MAX_QUERIES) -> List[str]:
+    """
+    Expand a topic into several related sub-queries.
+
+    The original topic always comes first so it dominates the ranking.
+    """
+    topic = " ".join(topic.split())
+    queries = [topic]
+
+    words = topic.lower().split()
+    expanded = " ".join(SYNONYMS.get(w, w) for w in words)
+    if expanded != topic.lower():
+        queries.append(expanded)
+
+    for suffix in QUERY_EXPANSIONS:
+        if len(queries) >= max_queries:
+            break
+        if suffix not in words:
+            queries.append(f"{topic} {suffix}")
+    return queries[:max(1, max_queries)]
+
+
+REGISTRY.describe("search_fallback_total", "Searches answered with placeholder hits because the backend failed")
+
+
+def merge_results(result_lists: List[List[Dict]], max_results: int = 5) -> List[Dict]:
+    """
+    Merge several ranked hit lists with reciprocal rank fusion.
+
+    Hits that appear in more sub-queries, and higher up, rank first.
+    Duplicates (same canonical URL) keep the longest snippet.
+    """
+    scores = {}
+    merged = {}
+    for hits in result_lists:
+        for rank, hit in enumerate(hits):
+            key = canonical_url(hit.get('url')) or hit.get('title')
+            scores[key] = scores.get(key, 0.0) + 1.0 / (RRF_K + rank + 1)
+            current = merged.get(key)
+            if current is None or len(hit.get('snippet', '')) > len(current.get('snippet', '')):
+                merged[key] = hit
+
+    ranked = sorted(merged, key=lambda k: scores[k], reverse=True)
+    return [merged[k] for k in ranked[:max_results]]
+
+
+async def search_web_async(query: str, max_results: int = 5,
+                           max_queries: int = MAX_QUERIES,
+                           concurrency: int = MAX_CONCURRENCY,
+                           fetch_content: bool = False,
+                           fetch_budget: float = TIME_BUDGET,
+                           exclude_backends: Sequence[str] = ()) -> List[Dict]:
+    """
+    Fan a topic out into sub-queries and search them concurrently.
+
+    Args:
+        query: Search topic
+        max_results: Maximum number of merged results to return
+        max_queries: Number of sub-queries to run (1 disables expansion)
+        concurrency: Maximum simultaneous requests
+        fetch_content: Also download each result page and add its lead
+            paragraphs as "content"
+        fetch_budget: Seconds allowed for the page-fetch stage
+        exclude_backends: Search backends not to ask (e.g. ("local",) when
+            the answer must come from the web)
+
+    Returns:
+        List of search results with title, url, snippet (and content)
+    """
+    queries = expand_queries(query, max_queries)
+    semaphore = asyncio.Semaphore(max(1, concurrency))
+    backends = get_backends(exclude=exclude_backends)
+
+    async def run_one(q: str) -> List[Dict]:
+        async with semaphore:
+            return await hedged_search(q, max_results, backends)
+
+    logger.info(f"🔍 Searching web for: {query} ({len(queries)} sub-queries)")
+    outcomes = await asyncio.gather(*(run_one(q) for q in queries), return_exceptions=True)
+
+    result_lists = []
+    for q, outcome in zip(queries, outcomes):
+        if isinstance(outcome, Exception):
+            logger.error(f" Search request failed for '{q}': {outcome}")
+            continue
+        result_lists.append(outcome)
+
+    if not result_lists:
+        guard = get_guard("search")
+        if guard.breaker.retry_in():
+            logger.warning(f" Search circuit open, retrying in {guard.breaker.retry_in():.0f}s")
+        return _fallback_search(query, max_results)
+
+    candidates = merge_results(result_lists, max_results * DEDUP_OVERFETCH)
+    spare = DEDUP_SPARE_FETCHES if fetch_content else 0
+    results = dedupe_hits(candidates, max_results + spare)
+    logger.info(f" Found {len(results)} search results")
+
+    if fetch_content and results:
+        results = await fetch_pages_async(results, time_budget=fetch_budget)
+        # Different URLs can still serve the same article
+        results = dedupe_hits(results, max_results, fields=("content",))
+    return results[:max_results]
+
+
+_cache = None
+_cache_lock = threading.Lock()
+_cache_stats = {"hits": 0, "stale_hits": 0, "misses": 0}
+_refreshing = set()
+
+
+def get_search_cache() -> DiskCache:
+    """Return the shared search cache (opened on first use)"""
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = DiskCache(CACHE_PATH, max_entries=CACHE_MAX_ENTRIES)
+        return _cache
+
+
+def get_cache_stats() -> Dict:
+    """Return process-wide search cache counters"""
+    with _cache_lock:
+        return dict(_cache_stats)
+
+
+def _count(name: str):
+    with _cache_lock:
+        _cache_stats[name] += 1
+
+
+def normalize_query(query: str) -> str:
+    """Normalize a query so trivially different spellings share a cache entry"""
+    return " ".join(unicodedata.normalize("NFKC", query).casefold().split())
+
+
+def _cache_key(query: str, max_results: int, kwargs: Dict) -> str:
+    extra = ",".join(f"{k}={kwargs[k]}" for k in sorted(kwargs))
+    return f"{normalize_query(query)}|{max_results}|{extra}"
+
+
+def is_fallback(results: List[Dict]) -> bool:
+    """True if results are placeholders because the search backend was unavailable"""
+    return any(r.get('fallback') for r in results)
+
+
+def is_cacheable(results: List[Dict]) -> bool:
+    """
+    True if results may be cached: not placeholders, and not answered from
+    the local index (past research must not come back as fresh web results)
+    """
+    return bool(results) and not is_fallback(results) and not any(r.get('backend') == 'local' for r in results)
+
+
+def _refresh_in_background(key: str, query: str, max_results: int, kwargs: Dict):
+    """Re-run a stale query once, without blocking the caller"""
+    with _cache_lock:
+        if key in _refreshing:
+            return
+        _refreshing.add(key)
+
+    def refresh():
+        try:
+            results = _search_live(query, max_results, **kwargs)
+            if is_cacheable(results):
+                get_search_cache().set(key, results)
+        finally:
+            with _cache_lock:
+                _refreshing.discard(key)
+
+    threading.Thread(target=refresh, name="search-refresh", daemon=True).start()
+
+
+def search_web(query: str, max_results: int = 5, use_cache: bool = True, **kwargs) -> List[Dict]:
     """
     Search the web using DuckDuckGo API (free, no API key needed)
-    
+
+    Answers from the persistent cache when possible: fresh entries are
+    returned directly, stale ones are returned immediately and refreshed
+    in the background, and everything else goes to the live search.
+
     Args:
         query: Search query
         max_results: Maximum number of results to return
-        
+        use_cache: Read and write the search cache
+
     Returns:
         List of search results with title, url, snippet
     """
+    started = time.perf_counter()
+    results, outcome = _search_cached(query, max_results, use_cache, kwargs)
+    record_search(time.perf_counter() - started, outcome)
+    return results
+
+
+def _search_cached(query: str, max_results: int, use_cache: bool, kwargs: Dict):
+    """Return (results, cache outcome: "hit", "stale", "miss" or "off")"""
+    if not use_cache:
+        return _search_live(query, max_results, **kwargs), "off"
+
+    key = _cache_key(query, max_results, kwargs)
     try:
-        logger.info(f"🔍 Searching web for: {query}")
-        
-        # Using DuckDuckGo HTML scraping (simple approach)
-        url = "https://html.duckduckgo.com/html/"
-        params = {
-            'q': query,
-        }
-        
-        headers = {
-            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'
-        }
-        
-        response = requests.get(url, params=params, headers=headers, timeout=10)
-        response.raise_for_status()
-        
-        # Simple parsing (you might want to use BeautifulSoup for production)
-        from bs4 import BeautifulSoup
-        soup = BeautifulSoup(response.text, 'html.parser')
-        
-        results = []
-        result_divs = soup.find_all('div', class_='result', limit=max_results)
-        
-        for div in result_divs:
-            try:
-                # Extract title
-                title_elem = div.find('a', class_='result__a')
-                title = title_elem.get_text(strip=True) if title_elem else "No title"
-                
-                # Extract URL
-                url_elem = div.find('a', class_='result__url')
-                url = url_elem.get('href', '') if url_elem else ""
-                if not url.startswith('http'):
-                    url = 'https://' + url
-                
-                # Extract snippet
-                snippet_elem = div.find('a', class_='result__snippet')
-                snippet = snippet_elem.get_text(strip=True) if snippet_elem else "No description"
-                
-                results.append({
-                    'title': title,
-                    'url': url,
-                    'snippet': snippet
-                })
-            except Exception as e:
-                logger.warning(f" Error parsing result: {e}")
-                continue
-        
-        logger.info(f" Found {len(results)} search results")
-        return results
-        
-    except requests.RequestException as e:
-        logger.error(f" Search request failed: {e}")
-        return _fallback_search(query, max_results)
+        entry = get_search_cache().get(key)
+    except Exception as e:
+        logger.warning(f" Search cache unavailable: {e}")
+        return _search_live(query, max_results, **kwargs), "off"
+
+    if entry is not None:
+        results, age = entry
+        if age <= CACHE_TTL:
+            _count("hits")
+            logger.info(f" Search cache hit for: {query}")
+            return results, "hit"
+        if age <= CACHE_TTL + CACHE_STALE_TTL:
+            _count("stale_hits")
+            logger.info(f" Search cache stale hit for: {query} (refreshing)")
+            _refresh_in_background(key, query, max_results, kwargs)
+            return results, "stale"
+
+    _count("misses")
+    results = _search_live(query, max_results, **kwargs)
+    if is_cacheable(results):
+        try:
+            get_search_cache().set(key, results)
+        except Exception as e:
+            logger.warning(f" Could not write search cache: {e}")
+    return results, "miss"
+
+
+def _search_live(query: str, max_results: int = 5, **kwargs) -> List[Dict]:
+    """
+    Synchronous wrapper around search_web_async, safe to call from code
+    that is already running inside an event loop.
+    """
+    try:
+        try:
+            asyncio.get_running_loop()
+        except RuntimeError:
+            return asyncio.run(search_web_async(query, max_results, **kwargs))
+
+        # A loop is already running in this thread (e.g. inside a server)
+        with concurrent.futures.ThreadPoolExecutor(max_workers=1) as pool:
+            return pool.submit(asyncio.run, search_web_async(query, max_results, **kwargs)).result()
+
     except Exception as e:
         logger.error(f" Search failed: {e}")
         return _fallback_search(query, max_results)
@@ -84,9 +313,10 @@ def _fallback_search(query: str, max_results: int = 5) -> List[Dict]:
     Fallback search results when actual search fails
     """
     logger.warning("⚠️ Using fallback search results")
-    
+    REGISTRY.inc("search_fallback_total")
+
     # Return mock results based on query
-    return [
+    results = [
         {
             'title': f'Result 1 about {query}',
             'url': 'https://example.com/1',
@@ -112,4 +342,7 @@ def _fallback_search(query: str, max_results: int = 5) -> List[Dict]:
             'url': 'https://example.com/5',
             'snippet': f'Academic research on {query} and related topics...'
         },
-    ][:max_results]
\ No newline at end of file
+    ]
+    for r in results:
+        r['fallback'] = True
+    return results[:max_results]
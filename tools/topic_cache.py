@@ -0,0 +1,237 @@
+# tools/topic_cache.py
+# Semantic cache of past research, keyed by topic meaning instead of spelling.
+# "AI", "Artificial Intelligence" and "AI agents" / "AI agent" would
+# otherwise each trigger a fresh research and analysis pass.
+# - Topics are embedded offline as hashed TF-IDF vectors: words (with common
+#   abbreviations expanded and plurals folded) plus character n-grams,
+#   hashed into a fixed number of dimensions
+# - The vectors of all past topics live in one NumPy matrix, so the nearest
+#   neighbours of a new topic are a single matrix-vector product
+# - A close match reuses that topic's research (and its analysis when the
+#   match is near-exact); several close matches are merged into one hit list
+# Vectors are saved to cache/topic_index.npz and the research/analysis
+# payloads to a DiskCache (cache/topics.sqlite).
+
+import logging
+import os
+import re
+import tempfile
+import threading
+import time
+import unicodedata
+import uuid
+import zlib
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from tools.dedup import dedupe_hits
+from tools.search_tool import SYNONYMS
+from utils.disk_cache import DiskCache, CACHE_DIR
+
+logger = logging.getLogger(__name__)
+
+INDEX_PATH = os.path.join(CACHE_DIR, "topic_index.npz")
+STORE_PATH = os.path.join(CACHE_DIR, "topics.sqlite")
+DIMENSIONS = 1024
+NGRAM_SIZES = (3, 4)
+NGRAM_WEIGHT = 0.5
+MAX_TOPICS = 5000
+SIMILARITY_THRESHOLD = float(os.getenv("TOPIC_CACHE_THRESHOLD", 0.9))  # Reuse research at or above this
+ANALYSIS_THRESHOLD = float(os.getenv("TOPIC_CACHE_ANALYSIS_THRESHOLD", 0.97))  # Also reuse the analysis
+TOPIC_TTL = int(os.getenv("TOPIC_CACHE_TTL", 7 * 24 * 3600))
+
+
+def topic_features(topic: str) -> Dict[str, float]:
+    """Weighted features of a topic: normalized words and their character n-grams"""
+    text = unicodedata.normalize("NFKC", topic or "").lower()
+    words = []
+    for word in re.findall(r"\w+", text):
+        for part in SYNONYMS.get(word, word).split():
+            if len(part) > 3 and part.endswith("s") and not part.endswith("ss"):
+                part = part[:-1]
+            words.append(part)
+
+    features = {}
+    for word in words:
+        features[word] = features.get(word, 0.0) + 1.0
+        padded = f"#{word}#"
+        for n in NGRAM_SIZES:
+            for i in range(len(padded) - n + 1):
+                gram = "~" + padded[i:i + n]
+                features[gram] = features.get(gram, 0.0) + NGRAM_WEIGHT
+    return features
+
+
+def embed(topic: str, dimensions: int = DIMENSIONS) -> np.ndarray:
+    """Hashed term-frequency vector of a topic (IDF is applied at search time)"""
+    vector = np.zeros(dimensions, dtype=np.float32)
+    for feature, weight in topic_features(topic).items():
+        h = zlib.crc32(feature.encode("utf-8"))
+        # The sign bit spreads collisions out instead of letting them add up
+        vector[h % dimensions] += weight if (h >> 31) & 1 else -weight
+    return vector
+
+
+class TopicCache:
+    def __init__(self, index_path: str = INDEX_PATH, store_path: str = STORE_PATH,
+                 dimensions: int = DIMENSIONS, max_topics: int = MAX_TOPICS):
+        self.index_path = index_path
+        self.dimensions = dimensions
+        self.max_topics = max_topics
+        self.store = DiskCache(store_path, max_entries=max_topics, max_bytes=200 * 1024 * 1024)
+        self._lock = threading.Lock()
+        self._ids: List[str] = []
+        self._topics: List[str] = []
+        self._created = np.zeros(0)
+        self._tf = np.zeros((0, dimensions), dtype=np.float32)
+        self._weighted = None  # IDF-weighted, L2-normalized rows (rebuilt after changes)
+        self._idf = None
+        self._mtime = None
+        self._load()
+
+    def _load(self):
+        """(Re)load the vector index if the file changed (lock held or during init)"""
+        try:
+            mtime = os.path.getmtime(self.index_path)
+        except OSError:
+            return
+        if mtime == self._mtime:
+            return
+        try:
+            with np.load(self.index_path, allow_pickle=False) as data:
+                if data["tf"].shape[1] != self.dimensions:
+                    logger.warning(" Topic index has other dimensions, starting empty")
+                    return
+                self._tf = data["tf"]
+                self._ids = [str(x) for x in data["ids"]]
+                self._topics = [str(x) for x in data["topics"]]
+                self._created = data["created"]
+            self._weighted = None
+            self._mtime = mtime
+        except Exception as e:
+            logger.warning(f" Could not load topic index: {e}")
+
+    def _save(self):
+        directory = os.path.dirname(self.index_path) or "."
+        os.makedirs(directory, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".tmp-", suffix=".npz")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                np.savez(f, tf=self._tf, ids=np.array(self._ids), topics=np.array(self._topics),
+                         created=self._created)
+            os.replace(tmp_path, self.index_path)
+            self._mtime = os.path.getmtime(self.index_path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+    def _matrix(self) -> np.ndarray:
+        """IDF-weighted, normalized topic matrix (lock held)"""
+        if self._weighted is None:
+            n = len(self._ids)
+            df = np.count_nonzero(self._tf, axis=0)
+            self._idf = (np.log((1 + n) / (1 + df)) + 1).astype(np.float32)
+            weighted = self._tf * self._idf
+            norms = np.linalg.norm(weighted, axis=1, keepdims=True)
+            self._weighted = weighted / np.maximum(norms, 1e-9)
+        return self._weighted
+
+    def nearest(self, topic: str, k: int = 5, max_age: float = TOPIC_TTL) -> List[Tuple[str, str, float]]:
+        """
+        Most similar past topics.
+
+        Returns:
+            Up to k (entry_id, topic, cosine similarity) tuples, best first;
+            entries older than max_age seconds are skipped
+        """
+        with self._lock:
+            self._load()
+            if not self._ids:
+                return []
+            matrix = self._matrix()
+            query = embed(topic, self.dimensions) * self._idf
+            norm = np.linalg.norm(query)
+            if not norm:
+                return []
+            scores = matrix @ (query / norm)
+            scores[self._created < time.time() - max_age] = -1.0
+            k = min(k, len(scores))
+            best = np.argpartition(-scores, k - 1)[:k]
+            best = best[np.argsort(-scores[best])]
+            return [(self._ids[i], self._topics[i], float(scores[i])) for i in best if scores[i] > 0]
+
+    def lookup(self, topic: str, top_k: int = 5, threshold: float = SIMILARITY_THRESHOLD) -> Optional[Dict]:
+        """
+        Reuse research of similar past topics.
+
+        Returns:
+            None when nothing is similar enough, else a dict with
+            "research" (hits of the matches, merged if several), "analysis"
+            (only for a near-exact single match, otherwise None), and
+            "matches" [(topic, similarity), ...]
+        """
+        matches = []
+        for entry_id, past_topic, similarity in self.nearest(topic):
+            if similarity < threshold:
+                break
+            entry = self.store.get(entry_id)
+            if entry is not None:
+                matches.append((past_topic, similarity, entry[0]))
+        if not matches:
+            return None
+
+        best_topic, best_similarity, best = matches[0]
+        hits = []
+        for _, _, entry in matches:
+            hits.extend(dict(h) for h in entry["research"].get("hits", []))
+        if len(matches) > 1:
+            hits = dedupe_hits(hits, top_k)
+        research = {
+            **best["research"],
+            "topic": topic,
+            "timestamp": datetime.utcnow().isoformat(),
+            "hits": hits[:top_k],
+            "source": "topic_cache",
+            "reused_from": [t for t, _, _ in matches],
+        }
+        analysis = best.get("analysis") if len(matches) == 1 and best_similarity >= ANALYSIS_THRESHOLD else None
+        logger.info(f" Topic cache: '{topic}' reuses {[(t, round(s, 2)) for t, s, _ in matches]}")
+        return {"research": research, "analysis": analysis,
+                "matches": [(t, s) for t, s, _ in matches]}
+
+    def add(self, topic: str, research: Dict, analysis: Dict = None):
+        """Remember a topic's research and analysis"""
+        if not research.get("hits") or any(h.get("fallback") for h in research["hits"]):
+            return
+        entry_id = uuid.uuid4().hex
+        self.store.set(entry_id, {"topic": topic, "research": research, "analysis": analysis})
+        vector = embed(topic, self.dimensions)
+        with self._lock:
+            self._load()
+            self._tf = np.vstack([self._tf, vector[None, :]])[-self.max_topics:]
+            self._ids = (self._ids + [entry_id])[-self.max_topics:]
+            self._topics = (self._topics + [topic])[-self.max_topics:]
+            self._created = np.append(self._created, time.time())[-self.max_topics:]
+            self._weighted = None
+            self._save()
+
+    def __len__(self):
+        with self._lock:
+            self._load()
+            return len(self._ids)
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_topic_cache() -> TopicCache:
+    """Return the shared topic cache (loaded on first use)"""
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = TopicCache()
+        return _cache
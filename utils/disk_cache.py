@@ -0,0 +1,95 @@
+# utils/disk_cache.py
+# Small persistent key/value cache backed by SQLite.
+# - Values are stored as JSON
+# - Every entry remembers when it was written (for TTL checks by the caller)
+#   and when it was last read (for LRU eviction)
+# - The cache is bounded by entry count and total size in bytes
+# A connection is opened per operation, so one cache file can be shared
+# safely by threads and by several processes (batch runs).
+
+import json
+import os
+from contextlib import contextmanager
+import sqlite3
+import threading
+import time
+from typing import Any, Optional, Tuple
+
+CACHE_DIR = "cache"
+
+
+class DiskCache:
+    def __init__(self, path: str, max_entries: int = 5000, max_bytes: int = 50 * 1024 * 1024):
+        self.path = path
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        with self._connect() as db:
+            db.execute("PRAGMA journal_mode=WAL")
+            db.execute(
+                "CREATE TABLE IF NOT EXISTS entries ("
+                " key TEXT PRIMARY KEY,"
+                " value TEXT NOT NULL,"
+                " created REAL NOT NULL,"
+                " accessed REAL NOT NULL,"
+                " size INTEGER NOT NULL)"
+            )
+            db.execute("CREATE INDEX IF NOT EXISTS idx_accessed ON entries(accessed)")
+
+    @contextmanager
+    def _connect(self):
+        db = sqlite3.connect(self.path, timeout=10)
+        try:
+            with db:
+                yield db
+        finally:
+            db.close()
+
+    def get(self, key: str) -> Optional[Tuple[Any, float]]:
+        """Return (value, age_in_seconds) or None, and mark the entry as recently used"""
+        now = time.time()
+        with self._lock, self._connect() as db:
+            row = db.execute("SELECT value, created FROM entries WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                return None
+            db.execute("UPDATE entries SET accessed = ? WHERE key = ?", (now, key))
+        return json.loads(row[0]), now - row[1]
+
+    def set(self, key: str, value: Any):
+        """Store a value and evict least-recently-used entries over the limits"""
+        data = json.dumps(value, ensure_ascii=False)
+        now = time.time()
+        with self._lock, self._connect() as db:
+            db.execute(
+                "INSERT OR REPLACE INTO entries (key, value, created, accessed, size) VALUES (?, ?, ?, ?, ?)",
+                (key, data, now, now, len(data.encode("utf-8"))),
+            )
+            self._evict(db)
+
+    def delete(self, key: str):
+        with self._lock, self._connect() as db:
+            db.execute("DELETE FROM entries WHERE key = ?", (key,))
+
+    def clear(self):
+        with self._lock, self._connect() as db:
+            db.execute("DELETE FROM entries")
+
+    def _evict(self, db: sqlite3.Connection):
+        count, total = db.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM entries").fetchone()
+        if count <= self.max_entries and total <= self.max_bytes:
+            return
+
+        rows = db.execute("SELECT key, size FROM entries ORDER BY accessed ASC").fetchall()
+        doomed = []
+        for key, size in rows:
+            if count <= self.max_entries and total <= self.max_bytes:
+                break
+            doomed.append((key,))
+            count -= 1
+            total -= size
+        db.executemany("DELETE FROM entries WHERE key = ?", doomed)
+
+    def __len__(self) -> int:
+        with self._connect() as db:
+            return db.execute("SELECT COUNT(*) FROM entries").fetchone()[0]
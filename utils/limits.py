@@ -0,0 +1,36 @@
+# utils/limits.py
+# Process-wide concurrency limits shared by every pipeline in the process.
+# Used by batch mode to cap outbound work independently of the number of
+# pipeline workers:
+# - "search": simultaneous requests to the search backend
+# - "llm":    simultaneous model generations
+# A limit of None (the default) means unlimited.
+
+import threading
+from contextlib import contextmanager
+from typing import Optional
+
+_lock = threading.Lock()
+_limits = {}
+
+
+def set_limit(name: str, limit: Optional[int]):
+    """Set (or clear, with None) the concurrency limit for a resource"""
+    with _lock:
+        _limits[name] = threading.BoundedSemaphore(limit) if limit else None
+
+
+def get_limit(name: str) -> Optional[threading.BoundedSemaphore]:
+    with _lock:
+        return _limits.get(name)
+
+
+@contextmanager
+def slot(name: str):
+    """Hold one slot of the named resource for the duration of the block"""
+    semaphore = get_limit(name)
+    if semaphore is None:
+        yield
+        return
+    with semaphore:
+        yield
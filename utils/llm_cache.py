@@ -0,0 +1,183 @@
+# utils/llm_cache.py
+# Content-addressed cache for LLM chat calls, shared by all agents.
+# The key is a SHA-256 hash of (model, messages, temperature, options), so
+# identical prompts are answered from disk instead of calling the model again.
+# Agents wrap their client in CachedChatClient; enabled=False (or
+# bypass_cache=True on a single call) sends the request straight through.
+# Streaming calls (stream=True) are cached too: a hit replays the whole
+# text as one chunk, a miss is recorded while the chunks pass through.
+# Real model calls hold a slot of the process-wide "llm" limit (utils/limits.py).
+# Every call, cached or not, is reported to utils/metrics.py, and Ollama's
+# prompt_eval_count calibrates the prompt packer's token estimate.
+
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from typing import Dict, Iterator, List
+
+from utils.disk_cache import DiskCache, CACHE_DIR
+from utils.limits import slot
+from utils.metrics import record_llm_cache_miss, record_llm_call, response_field
+from utils.prompt_packer import calibrate
+
+logger = logging.getLogger(__name__)
+
+CACHE_PATH = os.path.join(CACHE_DIR, "llm.sqlite")
+CACHE_MAX_ENTRIES = int(os.getenv("LLM_CACHE_MAX_ENTRIES", 2000))
+CACHE_MAX_BYTES = int(os.getenv("LLM_CACHE_MAX_BYTES", 100 * 1024 * 1024))
+CACHE_ENABLED = os.getenv("LLM_CACHE", "1") != "0"  # LLM_CACHE=0 turns the cache off process-wide
+
+_cache = None
+_lock = threading.Lock()
+_stats = {"hits": 0, "misses": 0}
+
+
+class CachedResponse:
+    """Response object replayed from the cache (same shape the agents read)"""
+
+    def __init__(self, content: str):
+        self.content = content
+        self.cached = True
+
+
+def get_llm_cache() -> DiskCache:
+    """Return the shared LLM response cache (opened on first use)"""
+    global _cache
+    with _lock:
+        if _cache is None:
+            _cache = DiskCache(CACHE_PATH, max_entries=CACHE_MAX_ENTRIES, max_bytes=CACHE_MAX_BYTES)
+        return _cache
+
+
+def get_cache_stats() -> Dict:
+    """Return process-wide LLM cache counters"""
+    with _lock:
+        return dict(_stats)
+
+
+def _count(name: str):
+    with _lock:
+        _stats[name] += 1
+
+
+def chunk_text(chunk) -> str:
+    """Extract the text of one streamed chunk (dict or object style)"""
+    if isinstance(chunk, str):
+        return chunk
+    if isinstance(chunk, dict):
+        message = chunk.get("message") or {}
+        return message.get("content") or chunk.get("content") or ""
+    message = getattr(chunk, "message", None)
+    if message is not None:
+        return getattr(message, "content", "") or ""
+    return getattr(chunk, "content", "") or ""
+
+
+STAT_FIELDS = ("eval_count", "eval_duration", "prompt_eval_count")
+
+
+def iter_chunks(resp, stats: Dict = None) -> Iterator[str]:
+    """
+    Iterate over the text chunks of a chat response.
+
+    Works for streamed responses and for clients that ignore stream=True
+    and return one complete response object. If stats is given, Ollama's
+    eval_count/eval_duration (sent with the final chunk) are copied into it.
+    """
+    content = getattr(resp, "content", None)
+    if isinstance(content, str) or isinstance(resp, (str, dict)) or getattr(resp, "message", None) is not None:
+        chunks = [resp]
+    else:
+        chunks = resp
+    for chunk in chunks:
+        if stats is not None:
+            for name in STAT_FIELDS:
+                value = response_field(chunk, name)
+                if value is not None:
+                    stats[name] = value
+        text = chunk_text(chunk)
+        if text:
+            yield text
+
+
+def make_key(model: str, messages: List[Dict], **kwargs) -> str:
+    """Hash everything that influences the model output"""
+    payload = {
+        "model": model,
+        "messages": messages,
+        "temperature": kwargs.get("temperature"),
+        "options": kwargs.get("options") or {},
+    }
+    data = json.dumps(payload, sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(data.encode("utf-8")).hexdigest()
+
+
+class CachedChatClient:
+    def __init__(self, client, enabled: bool = True):
+        self.inner = client
+        self.enabled = enabled
+
+    def chat(self, model: str, messages: List[Dict], bypass_cache: bool = False, **kwargs):
+        """Same call signature as the wrapped client's chat()"""
+        prompt_chars = sum(len(m.get("content", "")) for m in messages)
+        key = None
+        if self.enabled and CACHE_ENABLED and not bypass_cache:
+            key = make_key(model, messages, **kwargs)
+            try:
+                entry = get_llm_cache().get(key)
+            except Exception as e:
+                logger.warning(f"LLM cache unavailable: {e}")
+                entry = None
+
+            if entry is not None:
+                _count("hits")
+                logger.info(f"LLM cache hit ({model})")
+                record_llm_call(model, prompt_chars, len(entry[0]), 0.0, cached=True)
+                return CachedResponse(entry[0])
+            _count("misses")
+            record_llm_cache_miss()
+
+        if kwargs.get("stream"):
+            return self._stream(key, model, messages, kwargs, prompt_chars)
+
+        with slot("llm"):
+            started = time.perf_counter()
+            resp = self.inner.chat(model=model, messages=messages, **kwargs)
+            seconds = time.perf_counter() - started
+
+        content = getattr(resp, "content", None)
+        record_llm_call(model, prompt_chars, len(content) if isinstance(content, str) else 0, seconds,
+                        response_field(resp, "eval_count"), response_field(resp, "eval_duration"))
+        calibrate(model, messages, response_field(resp, "prompt_eval_count"))
+        if key and isinstance(content, str) and content.strip():
+            self._store(key, content)
+        return resp
+
+    def _stream(self, key: str, model: str, messages: List[Dict], kwargs: Dict,
+                prompt_chars: int) -> Iterator[str]:
+        """Pass streamed chunks through and cache the full text at the end"""
+        parts = []
+        stats = {}
+        with slot("llm"):
+            started = time.perf_counter()
+            resp = self.inner.chat(model=model, messages=messages, **kwargs)
+            for text in iter_chunks(resp, stats):
+                parts.append(text)
+                yield text
+            seconds = time.perf_counter() - started
+
+        content = "".join(parts)
+        record_llm_call(model, prompt_chars, len(content), seconds,
+                        stats.get("eval_count"), stats.get("eval_duration"))
+        calibrate(model, messages, stats.get("prompt_eval_count"))
+        if key and content.strip():
+            self._store(key, content)
+
+    def _store(self, key: str, content: str):
+        try:
+            get_llm_cache().set(key, content)
+        except Exception as e:
+            logger.warning(f"Could not write LLM cache: {e}")
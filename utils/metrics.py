@@ -0,0 +1,261 @@
+# utils/metrics.py
+# Structured instrumentation for the pipeline.
+# - A process-wide registry of counters and histograms (Prometheus-style
+#   names and labels), dumpable as Prometheus text format or JSON and
+#   servable over HTTP for long-running deployments
+# - stage(): times one pipeline phase and collects what happened inside it
+#   (model calls, prompt/response sizes, Ollama eval_count/eval_duration,
+#   search latency and cache hits) into a per-run record
+# - Progress events: stage() reports stage_start/stage_end to the listener
+#   installed with set_listener(), and emit() sends any other event
+# The current stage and listener are tracked with context variables, so
+# concurrent pipelines in different threads keep separate records.
+
+import contextvars
+import json
+import logging
+import threading
+import time
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_BUCKETS = (0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300)
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counters = {}    # name -> {labels: value}
+        self._histograms = {}  # name -> {labels: {"buckets": [...], "sum": s, "count": n}}
+        self._help = {}
+
+    def describe(self, name: str, text: str):
+        self._help[name] = text
+
+    def inc(self, name: str, value: float = 1, **labels):
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            series = self._counters.setdefault(name, {})
+            series[key] = series.get(key, 0) + value
+
+    def observe(self, name: str, value: float, **labels):
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            series = self._histograms.setdefault(name, {})
+            hist = series.get(key)
+            if hist is None:
+                hist = series[key] = {"buckets": [0] * len(DEFAULT_BUCKETS), "sum": 0.0, "count": 0}
+            for i, bound in enumerate(DEFAULT_BUCKETS):
+                if value <= bound:
+                    hist["buckets"][i] += 1
+            hist["sum"] += value
+            hist["count"] += 1
+
+    def to_json(self) -> Dict:
+        with self._lock:
+            return {
+                "counters": {name: [{"labels": dict(k), "value": v} for k, v in series.items()]
+                             for name, series in self._counters.items()},
+                "histograms": {name: [{"labels": dict(k), "count": h["count"], "sum": h["sum"],
+                                       "buckets": dict(zip(map(str, DEFAULT_BUCKETS), h["buckets"]))}
+                                      for k, h in series.items()]
+                               for name, series in self._histograms.items()},
+            }
+
+    def to_prometheus(self) -> str:
+        lines = []
+        with self._lock:
+            for name, series in sorted(self._counters.items()):
+                if name in self._help:
+                    lines.append(f"# HELP {name} {self._help[name]}")
+                lines.append(f"# TYPE {name} counter")
+                for key, value in series.items():
+                    lines.append(f"{name}{_labels(key)} {value}")
+            for name, series in sorted(self._histograms.items()):
+                if name in self._help:
+                    lines.append(f"# HELP {name} {self._help[name]}")
+                lines.append(f"# TYPE {name} histogram")
+                for key, hist in series.items():
+                    for bound, count in zip(DEFAULT_BUCKETS, hist["buckets"]):
+                        lines.append(f"{name}_bucket{_labels(key, le=str(bound))} {count}")
+                    lines.append(f"{name}_bucket{_labels(key, le='+Inf')} {hist['count']}")
+                    lines.append(f"{name}_sum{_labels(key)} {hist['sum']}")
+                    lines.append(f"{name}_count{_labels(key)} {hist['count']}")
+        return "\n".join(lines) + "\n"
+
+
+def _labels(key, **extra) -> str:
+    items = list(key) + list(extra.items())
+    if not items:
+        return ""
+    body = ",".join(f'{k}="{_escape(v)}"' for k, v in items)
+    return "{" + body + "}"
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+REGISTRY = MetricsRegistry()
+REGISTRY.describe("pipeline_stage_seconds", "Wall time of pipeline stages")
+REGISTRY.describe("pipeline_runs_total", "Finished pipeline runs")
+REGISTRY.describe("llm_requests_total", "Model chat calls (cached=true for cache hits)")
+REGISTRY.describe("llm_request_seconds", "Latency of model chat calls")
+REGISTRY.describe("llm_prompt_chars_total", "Characters sent to the model")
+REGISTRY.describe("llm_response_chars_total", "Characters received from the model")
+REGISTRY.describe("llm_eval_tokens_total", "Tokens generated (Ollama eval_count)")
+REGISTRY.describe("llm_eval_seconds_total", "Generation time reported by Ollama (eval_duration)")
+REGISTRY.describe("search_seconds", "Latency of search_web calls")
+REGISTRY.describe("search_requests_total", "search_web calls by cache outcome")
+
+_current_stage = contextvars.ContextVar("current_stage", default=None)
+_listener = contextvars.ContextVar("event_listener", default=None)
+_record_lock = threading.Lock()
+
+
+def set_listener(on_event) -> contextvars.Token:
+    """Send this context's progress events to on_event(event); returns a token for reset_listener()"""
+    return _listener.set(on_event)
+
+
+def reset_listener(token: contextvars.Token):
+    _listener.reset(token)
+
+
+def emit(event_type: str, **data):
+    """Send a progress event ({"type": ..., "time": ..., **data}) to the current listener"""
+    on_event = _listener.get()
+    if on_event is None:
+        return
+    try:
+        on_event({"type": event_type, "time": time.time(), **data})
+    except Exception as e:
+        logger.warning(f"Event listener failed: {e}")
+
+
+@contextmanager
+def stage(name: str, stages: List[Dict], **info):
+    """
+    Time one pipeline stage and collect model/search activity inside it.
+
+    The finished record is appended to stages and the wall time is added
+    to the pipeline_stage_seconds histogram. stage_start/stage_end events
+    go to the current listener.
+    """
+    record = {
+        "stage": name, **info,
+        "seconds": 0.0, "models": [],
+        "llm_calls": 0, "llm_cached": 0, "llm_cache_misses": 0, "llm_seconds": 0.0,
+        "prompt_chars": 0, "response_chars": 0,
+        "eval_count": 0, "eval_duration": 0.0,
+        "search_calls": 0, "search_seconds": 0.0, "search_cache": [],
+    }
+    token = _current_stage.set(record)
+    emit("stage_start", stage=name, **info)
+    started = time.perf_counter()
+    try:
+        yield record
+    finally:
+        record["seconds"] = time.perf_counter() - started
+        _current_stage.reset(token)
+        stages.append(record)
+        REGISTRY.observe("pipeline_stage_seconds", record["seconds"], stage=name)
+        emit("stage_end", stage=name, seconds=record["seconds"], **info)
+
+
+def stage_totals(stages: List[Dict]) -> Dict[str, float]:
+    """Sum stage wall times by stage name"""
+    totals = {}
+    for record in stages:
+        totals[record["stage"]] = totals.get(record["stage"], 0.0) + record["seconds"]
+    return totals
+
+
+def response_field(resp, name: str):
+    """Read an Ollama stats field (eval_count, ...) from an object or dict response"""
+    if isinstance(resp, dict):
+        return resp.get(name)
+    return getattr(resp, name, None)
+
+
+def record_llm_call(model: str, prompt_chars: int, response_chars: int, seconds: float,
+                    eval_count=None, eval_duration=None, cached: bool = False):
+    """Account one model call in the registry and the current stage"""
+    eval_seconds = (eval_duration or 0) / 1e9  # Ollama reports nanoseconds
+    REGISTRY.inc("llm_requests_total", model=model, cached=str(cached).lower())
+    REGISTRY.inc("llm_prompt_chars_total", prompt_chars, model=model)
+    REGISTRY.inc("llm_response_chars_total", response_chars, model=model)
+    if not cached:
+        REGISTRY.observe("llm_request_seconds", seconds, model=model)
+    if eval_count:
+        REGISTRY.inc("llm_eval_tokens_total", eval_count, model=model)
+        REGISTRY.inc("llm_eval_seconds_total", eval_seconds, model=model)
+
+    record = _current_stage.get()
+    if record is None:
+        return
+    with _record_lock:
+        if model not in record["models"]:
+            record["models"].append(model)
+        record["llm_calls"] += 1
+        record["llm_cached"] += int(cached)
+        record["llm_seconds"] += seconds
+        record["prompt_chars"] += prompt_chars
+        record["response_chars"] += response_chars
+        record["eval_count"] += eval_count or 0
+        record["eval_duration"] += eval_seconds
+
+
+def record_llm_cache_miss():
+    """Account one LLM cache lookup that found nothing (hits are counted by record_llm_call)"""
+    record = _current_stage.get()
+    if record is None:
+        return
+    with _record_lock:
+        record["llm_cache_misses"] += 1
+
+
+def record_search(seconds: float, cache: str):
+    """Account one search_web call ("hit", "stale", "miss" or "off")"""
+    REGISTRY.observe("search_seconds", seconds)
+    REGISTRY.inc("search_requests_total", cache=cache)
+
+    record = _current_stage.get()
+    if record is None:
+        return
+    with _record_lock:
+        record["search_calls"] += 1
+        record["search_seconds"] += seconds
+        record["search_cache"].append(cache)
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.startswith("/metrics.json"):
+            body = json.dumps(REGISTRY.to_json()).encode("utf-8")
+            content_type = "application/json"
+        elif self.path.startswith("/metrics"):
+            body = REGISTRY.to_prometheus().encode("utf-8")
+            content_type = "text/plain; version=0.0.4"
+        else:
+            self.send_error(404)
+            return
+        self.send_response(200)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+def serve_metrics(port: int = 9108, host: str = "127.0.0.1") -> ThreadingHTTPServer:
+    """Serve /metrics (Prometheus text) and /metrics.json from a background thread"""
+    server = ThreadingHTTPServer((host, port), _MetricsHandler)
+    threading.Thread(target=server.serve_forever, name="metrics", daemon=True).start()
+    logger.info(f"Metrics available at http://{host}:{server.server_address[1]}/metrics")
+    return server
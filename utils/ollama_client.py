@@ -0,0 +1,199 @@
+# utils/ollama_client.py
+# Process-wide registry of Ollama clients, shared by every agent.
+# - One client per host, so all agents and pipelines in the process reuse
+#   the same HTTP connection pool instead of opening their own
+# - keep_alive is sent with every request so models stay loaded between reports
+# - warm_up() pre-loads the configured models at startup, so the first report
+#   after a deploy does not pay the model-load cost
+# - Each call is recorded as "cold" (the model had to be loaded) or "warm"
+#
+# The ollama package's Client expects options={"temperature": ...} and answers
+# with .message.content; OllamaChatClient adapts it to the chat(temperature=...)
+# call and .content response the agents use.
+
+import logging
+import os
+import re
+import threading
+import time
+from collections import deque
+from typing import Dict, Iterable, List
+
+from utils.metrics import REGISTRY, response_field
+from utils.stats import summarize
+
+logger = logging.getLogger(__name__)
+
+try:
+    import ollama
+    _OLLAMA_AVAILABLE = hasattr(ollama, "Client")
+except Exception:
+    ollama = None
+    _OLLAMA_AVAILABLE = False
+
+OLLAMA_HOST = os.getenv("OLLAMA_HOST", "http://localhost:11434")
+KEEP_ALIVE = os.getenv("OLLAMA_KEEP_ALIVE", "30m")  # Ollama duration ("30m", "1h", "-1" = forever)
+COLD_LOAD_SECONDS = 0.5  # load_duration above this means the model was (re)loaded
+MAX_SAMPLES = 1000       # Latency samples kept per start type
+
+_clients = {}
+_lock = threading.Lock()
+_last_used = {}  # (host, model) -> monotonic time of the last finished call
+_samples = {"cold": deque(maxlen=MAX_SAMPLES), "warm": deque(maxlen=MAX_SAMPLES)}
+
+REGISTRY.describe("llm_start_seconds", "Model call latency by start type (cold = model load included)")
+REGISTRY.describe("llm_model_load_seconds_total", "Model load time reported by Ollama (load_duration)")
+
+
+def keep_alive_seconds(value) -> float:
+    """Convert an Ollama keep_alive value ("30m", "1h30m", 300, "-1") to seconds"""
+    if value is None:
+        return 300.0
+    if isinstance(value, (int, float)):
+        return float("inf") if value < 0 else float(value)
+    text = str(value).strip()
+    if text.lstrip("-").replace(".", "", 1).isdigit():
+        return keep_alive_seconds(float(text))
+    units = {"h": 3600, "m": 60, "s": 1, "ms": 0.001}
+    parts = re.findall(r"(-?\d+(?:\.\d+)?)(ms|h|m|s)", text)
+    if not parts:
+        return 300.0
+    seconds = sum(float(n) * units[u] for n, u in parts)
+    return float("inf") if seconds < 0 else seconds
+
+
+class ChatResult:
+    """Non-streamed response in the shape the agents read (.content plus Ollama stats)"""
+
+    def __init__(self, resp):
+        message = response_field(resp, "message")
+        content = response_field(message, "content") if message is not None else response_field(resp, "content")
+        self.content = content or ""
+        self.eval_count = response_field(resp, "eval_count")
+        self.eval_duration = response_field(resp, "eval_duration")
+        self.prompt_eval_count = response_field(resp, "prompt_eval_count")
+        self.load_duration = response_field(resp, "load_duration")
+
+
+class OllamaChatClient:
+    """Shared client for one Ollama host; see get_client()"""
+
+    def __init__(self, client, host: str = OLLAMA_HOST, keep_alive=KEEP_ALIVE):
+        self.client = client
+        self.host = host
+        self.keep_alive = keep_alive
+
+    def chat(self, model: str, messages: List[Dict], temperature: float = None,
+             options: Dict = None, stream: bool = False, **kwargs):
+        options = dict(options or {})
+        if temperature is not None:
+            options.setdefault("temperature", temperature)
+        kwargs.setdefault("keep_alive", self.keep_alive)
+
+        started = time.perf_counter()
+        resp = self.client.chat(model=model, messages=messages, options=options or None,
+                                stream=stream, **kwargs)
+        if stream:
+            return self._stream(model, resp, started)
+        self._record(model, time.perf_counter() - started, response_field(resp, "load_duration"))
+        return ChatResult(resp)
+
+    def _stream(self, model: str, resp, started: float):
+        load_duration = None
+        for chunk in resp:
+            value = response_field(chunk, "load_duration")
+            if value is not None:
+                load_duration = value
+            yield chunk
+        self._record(model, time.perf_counter() - started, load_duration)
+
+    def warm_up(self, model: str) -> float:
+        """Load a model into memory (a chat request without messages); returns seconds taken"""
+        started = time.perf_counter()
+        resp = self.client.chat(model=model, messages=[], keep_alive=self.keep_alive)
+        seconds = time.perf_counter() - started
+        load = (response_field(resp, "load_duration") or 0) / 1e9
+        with _lock:
+            _last_used[(self.host, model)] = time.monotonic()
+        REGISTRY.inc("llm_model_load_seconds_total", load, model=model)
+        logger.info(f" Warmed up {model} in {seconds:.2f}s (load {load:.2f}s)")
+        return seconds
+
+    def _record(self, model: str, seconds: float, load_duration=None):
+        """Classify a finished call as cold or warm and account it"""
+        now = time.monotonic()
+        with _lock:
+            last = _last_used.get((self.host, model))
+            _last_used[(self.host, model)] = now
+            if load_duration is not None:
+                cold = load_duration / 1e9 >= COLD_LOAD_SECONDS
+            else:
+                # No load_duration reported: assume the model was unloaded
+                # if it was never used or sat idle past the keep-alive window
+                cold = last is None or now - seconds - last > keep_alive_seconds(self.keep_alive)
+            start = "cold" if cold else "warm"
+            _samples[start].append(seconds)
+
+        REGISTRY.observe("llm_start_seconds", seconds, model=model, start=start)
+        if load_duration:
+            REGISTRY.inc("llm_model_load_seconds_total", load_duration / 1e9, model=model)
+        if cold:
+            logger.info(f" Cold start for {model}: {seconds:.2f}s")
+
+
+def get_client(host: str = None):
+    """
+    Return the shared chat client for an Ollama host.
+
+    Args:
+        host: Ollama URL (default: OLLAMA_HOST)
+
+    Returns:
+        OllamaChatClient, or None if the ollama package is not installed
+    """
+    host = host or OLLAMA_HOST
+    with _lock:
+        client = _clients.get(host)
+        if client is None and _OLLAMA_AVAILABLE:
+            client = _clients[host] = OllamaChatClient(ollama.Client(host=host), host=host)
+        return client
+
+
+def set_client(client, host: str = None):
+    """Register a client for a host (e.g. a fake one for benchmarks); None removes it"""
+    host = host or OLLAMA_HOST
+    with _lock:
+        if client is None:
+            _clients.pop(host, None)
+        else:
+            _clients[host] = client
+
+
+def warm_up(models: Iterable[str], host: str = None) -> Dict[str, float]:
+    """
+    Pre-load models so the first real request does not include load time.
+
+    Failures (server down, unknown model) are logged and skipped.
+
+    Returns:
+        Seconds taken per successfully warmed model
+    """
+    client = get_client(host)
+    if client is None or not hasattr(client, "warm_up"):
+        logger.info(" Model warm-up skipped (no Ollama client)")
+        return {}
+
+    timings = {}
+    for model in dict.fromkeys(models):
+        try:
+            timings[model] = client.warm_up(model)
+        except Exception as e:
+            logger.warning(f" Could not warm up {model}: {e}")
+    return timings
+
+
+def latency_stats() -> Dict[str, Dict]:
+    """Cold vs warm call latency percentiles (process-wide)"""
+    with _lock:
+        samples = {start: list(values) for start, values in _samples.items()}
+    return {start: summarize(values) for start, values in samples.items()}
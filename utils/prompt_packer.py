@@ -0,0 +1,245 @@
+# utils/prompt_packer.py
+# Token-budgeted prompt packing shared by all agents.
+# Instead of cutting text at a fixed character count, content is split into
+# units (sentences, lines, paragraphs), each unit is scored for relevance to
+# the topic, and the best units are packed under a token budget. Selected
+# units keep their original order so the prompt still reads naturally.
+# - count_tokens(): estimate for the target model, calibrated at runtime
+#   from Ollama's prompt_eval_count (see calibrate())
+# - pack(): choose units under a budget; pinned units (e.g. headings) first
+# - pack_text() / pack_fields(): convenience wrappers used by the agents
+# Budgets are per agent and can be overridden with PROMPT_BUDGET_<AGENT>.
+
+import math
+import os
+import re
+import threading
+from typing import Dict, Iterable, List, Sequence, Set
+
+BUDGETS = {
+    "researcher": int(os.getenv("PROMPT_BUDGET_RESEARCHER", 450)),  # Snippets and page leads of all hits
+    "analyst": int(os.getenv("PROMPT_BUDGET_ANALYST", 200)),        # Research insights
+    "writer": int(os.getenv("PROMPT_BUDGET_WRITER", 250)),          # Analysis summary
+    "section": int(os.getenv("PROMPT_BUDGET_SECTION", 150)),        # Analysis for one rewritten section
+    "critic": int(os.getenv("PROMPT_BUDGET_CRITIC", 380)),          # Report under review
+}
+
+# Average characters per token by model family (Latin script); other
+# scripts (Arabic, CJK, ...) are split into roughly twice as many tokens
+CHARS_PER_TOKEN = {"gemma": 3.8, "llama": 3.6, "qwen": 3.7, "mistral": 3.5}
+DEFAULT_CHARS_PER_TOKEN = 3.6
+MESSAGE_OVERHEAD = 4      # Chat template tokens per message
+MIN_PARTIAL_TOKENS = 24   # Smallest useful tail of a unit cut to fit the budget
+
+STOPWORDS = {
+    "the", "and", "for", "with", "that", "this", "from", "are", "was", "were", "will", "have",
+    "has", "had", "not", "but", "you", "your", "our", "its", "their", "they", "can", "all",
+    "more", "about", "into", "than", "also", "which", "what", "when", "how", "who", "why",
+    "been", "being", "such", "these", "those", "there", "here", "use", "using", "used",
+}
+
+# Navigation and site chrome that search snippets and page leads often contain
+BOILERPLATE = re.compile(
+    r"cookie|subscribe|sign (in|up)|log ?in|newsletter|all rights reserved|privacy policy|"
+    r"terms of (use|service)|javascript|advertisement|click here|read more|share this",
+    re.IGNORECASE
+)
+
+_calibration: Dict[str, float] = {}
+_lock = threading.Lock()
+
+
+def _family(model: str) -> str:
+    name = (model or "").lower()
+    return next((f for f in CHARS_PER_TOKEN if f in name), "")
+
+
+def _raw_estimate(text: str, model: str = None) -> float:
+    if not text:
+        return 0.0
+    chars_per_token = CHARS_PER_TOKEN.get(_family(model), DEFAULT_CHARS_PER_TOKEN)
+    non_ascii = sum(1 for c in text if ord(c) > 127)
+    return (len(text) - non_ascii) / chars_per_token + non_ascii / (chars_per_token / 2)
+
+
+def count_tokens(text: str, model: str = None) -> int:
+    """Estimated number of tokens text takes in the given model's prompt"""
+    if not text:
+        return 0
+    with _lock:
+        factor = _calibration.get(model, 1.0)
+    return max(1, math.ceil(_raw_estimate(text, model) * factor))
+
+
+def calibrate(model: str, messages: Sequence[Dict], prompt_eval_count: int):
+    """
+    Adjust the estimate for model using the prompt size Ollama reported.
+
+    Ratios far off (e.g. when Ollama reused a cached prompt prefix and only
+    counted the new tokens) are ignored.
+    """
+    estimate = sum(_raw_estimate(m.get("content", ""), model) for m in messages)
+    actual = (prompt_eval_count or 0) - MESSAGE_OVERHEAD * len(messages)
+    if estimate < 50 or actual <= 0:
+        return
+    ratio = actual / estimate
+    if not 0.5 <= ratio <= 2.0:
+        return
+    with _lock:
+        current = _calibration.get(model, 1.0)
+        _calibration[model] = current + 0.2 * (ratio - current)
+
+
+def terms(text: str) -> List[str]:
+    """Lowercase content words of text (no stopwords, at least 3 characters)"""
+    return [w for w in re.findall(r"\w+", (text or "").lower()) if len(w) > 2 and w not in STOPWORDS]
+
+
+def relevance(text: str, query_terms: Set[str], position: int = 0, total: int = 1) -> float:
+    """
+    Score a unit for a prompt about query_terms.
+
+    Combines topic coverage and term density, a mild preference for
+    earlier units (leads carry the gist), a bonus for concrete figures and a
+    penalty for site boilerplate. Boilerplate phrases that are part of the
+    query (a topic about JavaScript or a login page) do not count, and units
+    that also match the query are only penalised mildly.
+    """
+    words = terms(text)
+    if not words:
+        return 0.0
+    matches = sum(1 for w in words if w in query_terms)
+    coverage = len(set(words) & query_terms) / len(query_terms) if query_terms else 0.0
+    density = matches / math.sqrt(len(words))
+    score = 0.1 + coverage + density
+    if re.search(r"\d", text):
+        score += 0.1
+    score *= 1.0 - 0.5 * position / max(total, 1)
+    chrome = [m.group(0) for m in BOILERPLATE.finditer(text)
+              if not set(terms(m.group(0))) <= query_terms]
+    if chrome and matches:
+        score *= 0.5
+    elif chrome:
+        # Short units around such phrases are site chrome, longer ones may be content
+        score = 0.0 if len(words) < 12 else score * 0.2
+    return score
+
+
+def truncate_tokens(text: str, budget: int, model: str = None) -> str:
+    """Cut text at a word boundary so it fits within budget tokens"""
+    if count_tokens(text, model) <= budget:
+        return text
+    low, high = 0, len(text)
+    while low < high:
+        mid = (low + high + 1) // 2
+        if count_tokens(text[:mid], model) + 1 <= budget:
+            low = mid
+        else:
+            high = mid - 1
+    cut = text[:low]
+    space = cut.rfind(" ")
+    if space > len(cut) // 2:
+        cut = cut[:space]
+    return cut.rstrip() + "…"
+
+
+def pack(units: Sequence[str], budget: int, query: str = "", model: str = None,
+         pinned: Iterable[int] = ()) -> Dict[int, str]:
+    """
+    Choose the units to send under a token budget.
+
+    Args:
+        units: Candidate texts, in document order
+        budget: Token budget for all chosen units together
+        query: Text the units should be relevant to (usually the topic)
+        model: Target model, for token counting
+        pinned: Indexes kept before anything else (if they fit)
+
+    Returns:
+        {index: text} of chosen units. Units that do not fit are skipped in
+        favour of smaller ones; the best skipped unit is then shortened to
+        use up what is left. Iterate in sorted(index) order to keep document
+        order. Site boilerplate is dropped.
+    """
+    query_terms = set(terms(query))
+    pinned = [i for i in pinned if 0 <= i < len(units)]
+    scores = {i: relevance(units[i], query_terms, i, len(units)) for i in range(len(units)) if i not in pinned}
+    ranked = sorted((i for i in scores if scores[i] > 0), key=scores.get, reverse=True)
+
+    chosen, seen, remaining, skipped = {}, set(), budget, None
+    for i in pinned + ranked:
+        text = units[i].strip()
+        key = re.sub(r"\W+", " ", text.lower()).strip()
+        if not key or key in seen:
+            continue
+        cost = count_tokens(text, model) + 1  # + separator
+        if cost > remaining:
+            if skipped is None and i not in pinned:
+                skipped = i
+            continue
+        chosen[i] = text
+        seen.add(key)
+        remaining -= cost
+
+    if skipped is not None and remaining >= MIN_PARTIAL_TOKENS:
+        chosen[skipped] = truncate_tokens(units[skipped].strip(), remaining - 1, model)
+    return chosen
+
+
+def split_sentences(text: str) -> List[str]:
+    return [s for s in re.split(r"(?<=[.!?؟])\s+", (text or "").strip()) if s.strip()]
+
+
+def pack_text(text: str, budget: int, query: str = "", model: str = None,
+              unit: str = "line", pin_headings: bool = False) -> str:
+    """
+    Pack one block of text under budget.
+
+    Args:
+        unit: "line", "paragraph" or "sentence"
+        pin_headings: Always keep markdown headings (used for reports, so the
+            reader still sees the full structure)
+    """
+    if count_tokens(text, model) <= budget:
+        return text
+    if unit == "sentence":
+        units, joiner = split_sentences(text), " "
+    elif unit == "paragraph":
+        units, joiner = [p for p in re.split(r"\n\s*\n", text) if p.strip()], "\n\n"
+    else:
+        units, joiner = [l for l in text.splitlines() if l.strip()], "\n"
+
+    if pin_headings and unit == "paragraph":
+        # Keep headings as their own units so they can be pinned
+        units = [part for p in units for part in re.split(r"(?m)^(#+ .*)\n", p) if part.strip()]
+    pinned = [i for i, u in enumerate(units) if pin_headings and u.lstrip().startswith("#")]
+    chosen = pack(units, budget, query, model, pinned)
+    return joiner.join(chosen[i] for i in sorted(chosen))
+
+
+def pack_fields(records: Sequence[Dict], fields: Sequence[str], budget: int,
+                query: str = "", model: str = None) -> List[Dict[str, str]]:
+    """
+    Pack the sentences of several text fields across many records (e.g. the
+    snippet and page content of every search hit) under one shared budget.
+
+    Returns:
+        One {field: packed text} dict per record; fields with nothing
+        selected are empty strings
+    """
+    total = sum(count_tokens(record.get(field) or "", model) + 1 for record in records for field in fields)
+    if total <= budget:
+        return [{field: record.get(field) or "" for field in fields} for record in records]
+    units, owners = [], []
+    for r, record in enumerate(records):
+        for field in fields:
+            for sentence in split_sentences(record.get(field) or ""):
+                units.append(sentence)
+                owners.append((r, field))
+
+    chosen = pack(units, budget, query, model)
+    packed = [{field: [] for field in fields} for _ in records]
+    for i in sorted(chosen):
+        r, field = owners[i]
+        packed[r][field].append(chosen[i])
+    return [{field: " ".join(parts) for field, parts in record.items()} for record in packed]
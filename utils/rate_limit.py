@@ -0,0 +1,261 @@
+# utils/rate_limit.py
+# Overload protection for outbound backends (currently the search backend).
+# Under batch load DuckDuckGo starts answering with 429s, empty "anomaly"
+# pages or timeouts; hammering it further only extends the ban.
+# - TokenBucket: caps the request rate per backend (with a small burst)
+# - AdaptiveLimiter: AIMD concurrency - grows by one slot per window of
+#   successes, halves on a throttle signal (429, 503, timeout)
+# - CircuitBreaker: after consecutive failures, fails calls immediately for
+#   a cool-down period, then lets a single probe through (half-open)
+# BackendGuard combines the three; get_guard(name) returns the shared one.
+# Settings per backend come from <NAME>_RATE, <NAME>_BURST,
+# <NAME>_MAX_CONCURRENCY, <NAME>_BREAKER_FAILURES and <NAME>_BREAKER_RESET.
+
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict
+
+from utils.metrics import REGISTRY
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_RATE = 1.0              # Requests per second
+DEFAULT_BURST = 3
+DEFAULT_MAX_CONCURRENCY = 4
+DEFAULT_BREAKER_FAILURES = 5    # Consecutive failures that open the breaker
+DEFAULT_BREAKER_RESET = 30.0    # Seconds the breaker stays open before a probe
+MAX_WAIT = 10.0                 # Longest a call waits for a token or a slot
+
+CLOSED, OPEN, HALF_OPEN = "closed", "open", "half_open"
+
+REGISTRY.describe("backend_throttled_total", "Backend calls rejected or throttled, by backend and reason")
+REGISTRY.describe("backend_breaker_transitions_total", "Circuit breaker state changes, by backend and state")
+REGISTRY.describe("backend_concurrency_changes_total", "Adaptive concurrency limit changes, by backend and direction")
+
+
+class Throttled(Exception):
+    """The backend signalled overload (429/503, anomaly page, timeout)"""
+
+
+class CircuitOpen(Exception):
+    """The circuit breaker is open; the call was not attempted"""
+
+
+class RateLimited(Exception):
+    """No token or slot became free within the wait limit"""
+
+
+class TokenBucket:
+    def __init__(self, rate: float, burst: int):
+        self.rate = rate
+        self.burst = max(1, burst)
+        self._tokens = float(self.burst)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _reserve(self) -> float:
+        """Take a token; returns how long the caller must wait before using it (lock held)"""
+        now = time.monotonic()
+        self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+        self._tokens -= 1
+        return 0.0 if self._tokens >= 0 else -self._tokens / self.rate
+
+    def acquire(self, max_wait: float = MAX_WAIT) -> bool:
+        """Wait for a token; False (and nothing taken) if that takes longer than max_wait"""
+        if not self.rate:
+            return True
+        with self._lock:
+            wait = self._reserve()
+            if wait > max_wait:
+                self._tokens += 1
+                return False
+        if wait:
+            time.sleep(wait)
+        return True
+
+
+class AdaptiveLimiter:
+    def __init__(self, name: str, maximum: int, minimum: int = 1):
+        self.name = name
+        self.minimum = max(1, minimum)
+        self.maximum = max(self.minimum, maximum)
+        self._limit = float(self.maximum)
+        self._in_flight = 0
+        self._last_decrease = 0.0
+        self._condition = threading.Condition()
+
+    @property
+    def limit(self) -> int:
+        return int(self._limit)
+
+    def acquire(self, max_wait: float = MAX_WAIT) -> bool:
+        deadline = time.monotonic() + max_wait
+        with self._condition:
+            while self._in_flight >= int(self._limit):
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return False
+                self._condition.wait(remaining)
+            self._in_flight += 1
+            return True
+
+    def release(self, throttled: bool = False):
+        with self._condition:
+            self._in_flight -= 1
+            before = int(self._limit)
+            now = time.monotonic()
+            if throttled:
+                # Calls already in flight fail together; count that as one signal
+                if now - self._last_decrease > 1.0:
+                    self._limit = max(self.minimum, self._limit / 2)
+                    self._last_decrease = now
+            else:
+                self._limit = min(self.maximum, self._limit + 1 / self._limit)
+            after = int(self._limit)
+            self._condition.notify_all()
+        if after != before:
+            REGISTRY.inc("backend_concurrency_changes_total", backend=self.name,
+                         direction="up" if after > before else "down")
+            logger.info(f" {self.name} concurrency limit {before} -> {after}")
+
+
+class CircuitBreaker:
+    def __init__(self, name: str, failure_threshold: int = DEFAULT_BREAKER_FAILURES,
+                 reset_timeout: float = DEFAULT_BREAKER_RESET):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._probing = False
+        self._lock = threading.Lock()
+
+    def _set_state(self, state: str):
+        if state != self.state:
+            self.state = state
+            REGISTRY.inc("backend_breaker_transitions_total", backend=self.name, state=state)
+            logger.warning(f" {self.name} circuit breaker {state}")
+
+    def allow(self):
+        """Raise CircuitOpen unless a call may go through now"""
+        with self._lock:
+            if self.state == OPEN:
+                if time.monotonic() - self._opened_at < self.reset_timeout:
+                    raise CircuitOpen(f"{self.name} circuit open")
+                self._set_state(HALF_OPEN)
+            if self.state == HALF_OPEN:
+                if self._probing:
+                    raise CircuitOpen(f"{self.name} circuit half-open, probe in flight")
+                self._probing = True
+
+    def record_success(self):
+        with self._lock:
+            self._failures = 0
+            self._probing = False
+            self._set_state(CLOSED)
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            if self.state == HALF_OPEN or self._failures >= self.failure_threshold:
+                self._probing = False
+                self._opened_at = time.monotonic()
+                self._set_state(OPEN)
+
+    def cancel_probe(self):
+        """Give back a half-open probe that was allowed but never sent"""
+        with self._lock:
+            self._probing = False
+
+    def retry_in(self) -> float:
+        """Seconds until the breaker lets a probe through (0 when closed)"""
+        with self._lock:
+            if self.state != OPEN:
+                return 0.0
+            return max(0.0, self.reset_timeout - (time.monotonic() - self._opened_at))
+
+
+def _is_throttle(error: Exception) -> bool:
+    if isinstance(error, (Throttled, TimeoutError)):
+        return True
+    status = getattr(getattr(error, "response", None), "status_code", None)
+    return status in (429, 503) or "timeout" in type(error).__name__.lower()
+
+
+class BackendGuard:
+    def __init__(self, name: str, rate: float = DEFAULT_RATE, burst: int = DEFAULT_BURST,
+                 max_concurrency: int = DEFAULT_MAX_CONCURRENCY,
+                 failure_threshold: int = DEFAULT_BREAKER_FAILURES,
+                 reset_timeout: float = DEFAULT_BREAKER_RESET, max_wait: float = MAX_WAIT):
+        self.name = name
+        self.bucket = TokenBucket(rate, burst)
+        self.limiter = AdaptiveLimiter(name, max_concurrency)
+        self.breaker = CircuitBreaker(name, failure_threshold, reset_timeout)
+        self.max_wait = max_wait
+
+    @contextmanager
+    def attempt(self):
+        """
+        Guard one backend call.
+
+        Raises CircuitOpen or RateLimited without running the block; errors
+        raised inside the block count as failures (429/503/timeouts also
+        shrink the concurrency limit).
+        """
+        try:
+            self.breaker.allow()
+        except CircuitOpen:
+            REGISTRY.inc("backend_throttled_total", backend=self.name, reason="circuit_open")
+            raise
+        if not self.bucket.acquire(self.max_wait) or not self.limiter.acquire(self.max_wait):
+            self.breaker.cancel_probe()
+            REGISTRY.inc("backend_throttled_total", backend=self.name, reason="rate_limited")
+            raise RateLimited(f"{self.name}: no capacity within {self.max_wait:.0f}s")
+        try:
+            yield
+        except Exception as e:
+            throttled = _is_throttle(e)
+            self.limiter.release(throttled=throttled)
+            self.breaker.record_failure()
+            if throttled:
+                REGISTRY.inc("backend_throttled_total", backend=self.name, reason="backend")
+            raise
+        self.limiter.release()
+        self.breaker.record_success()
+
+    def call(self, fn: Callable, *args, **kwargs):
+        with self.attempt():
+            return fn(*args, **kwargs)
+
+    def stats(self) -> Dict:
+        return {"state": self.breaker.state, "retry_in": self.breaker.retry_in(),
+                "concurrency": self.limiter.limit, "rate": self.bucket.rate}
+
+
+_guards: Dict[str, BackendGuard] = {}
+_guards_lock = threading.Lock()
+
+
+def _setting(name: str, key: str, default, kind=float):
+    return kind(os.getenv(f"{name.upper()}_{key}", default))
+
+
+def get_guard(name: str) -> BackendGuard:
+    """Return the shared guard for a backend, configured from the environment"""
+    with _guards_lock:
+        guard = _guards.get(name)
+        if guard is None:
+            guard = _guards[name] = BackendGuard(
+                name,
+                rate=_setting(name, "RATE", DEFAULT_RATE),
+                burst=_setting(name, "BURST", DEFAULT_BURST, int),
+                max_concurrency=_setting(name, "MAX_CONCURRENCY", DEFAULT_MAX_CONCURRENCY, int),
+                failure_threshold=_setting(name, "BREAKER_FAILURES", DEFAULT_BREAKER_FAILURES, int),
+                reset_timeout=_setting(name, "BREAKER_RESET", DEFAULT_BREAKER_RESET),
+            )
+        return guard